@@ -1,8 +1,14 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from agents import *
+from speculation import PIPELINED, SpeculativeTests
+from model_selector import ADAPTIVE_MODELS, get_model_selector, parse_quality_score
 
 class AgentChain:
-    def __init__(self):
+    def __init__(self, max_workers: int = 4, stream: bool = STREAM_OUTPUT, pipelined: bool = PIPELINED,
+                 adaptive: bool = ADAPTIVE_MODELS):
         self.agents = {
             'code': CodeGenerationAgent(),
             'test': TestGenerationAgent(),
@@ -10,40 +16,116 @@ class AgentChain:
             'docs': DocumentationAgent(),
             'validation': ValidationAgent()
         }
-    
+        self.max_workers = max_workers
+        self.stream = stream
+        # Pipelined mode streams the code agent and starts test generation on its prefix
+        self.pipelined = pipelined
+        self.metrics = {}
+        self.errors = {}
+        # Statistics are only collected and persisted when models are selected adaptively
+        self.adaptive = adaptive
+
+        if adaptive:
+            selector = get_model_selector()
+            for agent in self.agents.values():
+                agent.model_decision = selector.select(agent.role)
+                agent.model = agent.model_decision['model']
+                agent.record_stats = True
+
+    def _resolve_tests(self, speculation, run_agent, show_kept, final_code: str):
+        """Keep the speculative tests when the public API is unchanged, otherwise re-issue"""
+        if speculation.future is not None:
+            result = speculation.resolve(final_code)
+            if result is not None:
+                if show_kept:
+                    show_kept('test', self.agents['test'], result)
+                return result
+        return run_agent('test', self.agents['test'], [final_code])
+
+    def _schedule(self, user_requirement: str, run_agent, on_complete=None, show_kept=None):
+        """Run every agent as soon as its declared inputs are available"""
+        results = {'requirement': user_requirement}
+        pending = dict(self.agents)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            speculation = SpeculativeTests(self.agents['test']) if self.pipelined else None
+
+            try:
+                while pending or running:
+                    for key, agent in list(pending.items()):
+                        if all(name in results for name in agent.inputs):
+                            args = [results[name] for name in agent.inputs]
+                            if speculation and key == 'code':
+                                future = executor.submit(run_agent, key, agent, args, speculation.feed)
+                            elif speculation and key == 'test':
+                                future = executor.submit(
+                                    self._resolve_tests, speculation, run_agent, show_kept, results['code']
+                                )
+                            else:
+                                future = executor.submit(run_agent, key, agent, args)
+                            running[future] = key
+                            del pending[key]
+
+                    if not running:
+                        raise ValueError(f"Unresolvable agent inputs: {sorted(pending)}")
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key = running.pop(future)
+                        results[key] = future.result()
+                        if on_complete:
+                            on_complete(key, len(results) - 1)
+            finally:
+                if speculation:
+                    speculation.close()
+
+        del results['requirement']
+
+        # The validation score is the quality signal for model selection
+        score = parse_quality_score(results.get('validation'))
+        if self.adaptive and score is not None:
+            get_model_selector().record_quality(
+                {agent.role: agent.model for agent in self.agents.values()}, score
+            )
+        # Per-agent time-to-first-token and duration
+        self.metrics = {key: agent.metrics for key, agent in self.agents.items()}
+        # Agents whose model call failed; their result holds the error text
+        self.errors = {key: agent.error for key, agent in self.agents.items() if agent.error}
+        return results
+
+    def run_chain(self, user_requirement: str):
+        """Execute the agent chain headlessly (no Streamlit calls)"""
+        return self._schedule(
+            user_requirement, lambda key, agent, args, on_text=None: agent.run(*args, on_text=on_text)
+        )
+
     def execute_chain(self, user_requirement: str, show_backend: bool = False):
-        """Execute the complete agent chain"""
-        
+        """Execute the agent chain in the Streamlit UI, running independent agents concurrently"""
+
         st.subheader("🔗 Agent Chain Execution")
         progress_bar = st.progress(0)
-        
-        results = {}
-        
-        # Step 1: Code Generation
-        progress_bar.progress(0.2)
-        results['code'] = self.agents['code'].execute(user_requirement, show_backend)
-        
-        # Step 2: Test Generation
-        progress_bar.progress(0.4)
-        results['test'] = self.agents['test'].execute(results['code'], show_backend)
-        
-        # Step 3: Requirements
-        progress_bar.progress(0.6)
-        results['requirements'] = self.agents['requirements'].execute(
-            results['code'], results['test'], show_backend
-        )
-        
-        # Step 4: Documentation
-        progress_bar.progress(0.8)
-        results['docs'] = self.agents['docs'].execute(
-            results['code'], results['test'], results['requirements'], show_backend
-        )
-        
-        # Step 5: Validation
-        progress_bar.progress(1.0)
-        results['validation'] = self.agents['validation'].execute(
-            results['code'], results['test'], results['requirements'], results['docs'], show_backend
-        )
-        
+
+        # One tab per agent keeps the (streamed) output grouped while agents overlap
+        tabs = st.tabs([f"{agent.icon} {agent.name}" for agent in self.agents.values()])
+        containers = dict(zip(self.agents, tabs))
+        ctx = get_script_run_ctx()
+
+        def run_agent(key, agent, args, on_text=None):
+            add_script_run_ctx(threading.current_thread(), ctx)
+            with containers[key]:
+                return agent.execute(*args, show_backend=show_backend, stream=self.stream, on_text=on_text)
+
+        def show_kept(key, agent, result):
+            add_script_run_ctx(threading.current_thread(), ctx)
+            with containers[key]:
+                st.write(f"{agent.icon} **{agent.name}** (using {agent.model}, started speculatively)")
+                agent.render(agent.last_prompt, result, show_backend)
+
+        def on_complete(key, completed):
+            progress_bar.progress(completed / len(self.agents))
+
+        results = self._schedule(user_requirement, run_agent, on_complete, show_kept)
+
         st.success("🎉 Agent chain completed!")
-        return results
\ No newline at end of file
+        return results
@@ -1,3 +1,12 @@
+from prompt_budget import PromptBudget
+
+def _fit_sections(budget: PromptBudget, template: str, sections: dict) -> dict:
+    """Apply the token budget (if any) to the sections of a prompt template"""
+    if budget is None:
+        return {name: text or "" for name, (kind, text) in sections.items()}
+    overhead = template.format(**{name: "" for name in sections})
+    return budget.fit(sections, overhead)
+
 def get_code_generation_prompt(user_requirement: str) -> str:
     """Prompt for Code Generation Agent"""
     return f"""You are a Senior Python Developer. Generate ONLY the Python code, no explanations.
@@ -13,9 +22,7 @@ Requirements:
 
 Return ONLY the Python code, nothing else."""
 
-def get_test_generation_prompt(main_code: str) -> str:
-    """Prompt for Test Generation Agent"""
-    return f"""You are a QA Testing Specialist. Generate ONLY the test code, no explanations.
+TEST_GENERATION_TEMPLATE = """You are a QA Testing Specialist. Generate ONLY the test code, no explanations.
 
 MAIN CODE TO TEST:
 {main_code}
@@ -29,29 +36,40 @@ Requirements:
 
 Return ONLY the test code as a complete test_*.py file, nothing else."""
 
-def get_requirements_prompt(main_code: str, test_code: str) -> str:
-    """Prompt for Requirements Generation Agent"""
-    return f"""You are a DevOps Engineer. Generate ONLY the requirements.txt content, no explanations.
+def get_test_generation_prompt(main_code: str, budget: PromptBudget = None) -> str:
+    """Prompt for Test Generation Agent"""
+    sections = _fit_sections(budget, TEST_GENERATION_TEMPLATE, {
+        'main_code': ('code', main_code)
+    })
+    return TEST_GENERATION_TEMPLATE.format(**sections)
+
+REQUIREMENTS_TEMPLATE = """You are a DevOps Engineer. Generate ONLY the requirements.txt content, no explanations.
 
 ANALYZE THIS CODE:
-Main Code: {main_code}
-Test Code: {test_code}
+Main Code: {main_code}{test_code}
 
 Requirements:
 - List all required packages with specific versions
-- Include development/testing dependencies
+- Include development/testing dependencies (tests are written with pytest)
 - One package per line
 
 Return ONLY the requirements.txt content, nothing else."""
 
-def get_readme_prompt(main_code: str, test_code: str, requirements: str) -> str:
-    """Prompt for README Generation Agent"""
-    return f"""You are a Technical Readme Writer. Generate ONLY the README.md content, no explanations and strictly no thinking process.
+def get_requirements_prompt(main_code: str, test_code: str = None, budget: PromptBudget = None) -> str:
+    """Prompt for Requirements Generation Agent (test code is optional)"""
+    sections = _fit_sections(budget, REQUIREMENTS_TEMPLATE, {
+        'main_code': ('code', main_code),
+        'test_code': ('code', test_code)
+    })
+    if sections['test_code']:
+        sections['test_code'] = f"\nTest Code: {sections['test_code']}"
+    return REQUIREMENTS_TEMPLATE.format(**sections)
+
+README_TEMPLATE = """You are a Technical Readme Writer. Generate ONLY the README.md content, no explanations and strictly no thinking process.
 
 PROJECT FILES:
 Main Code: {main_code}
-Test Code: {test_code}
-Requirements: {requirements}
+Test Code: {test_code}{requirements}
 
 Requirements:
 - Professional README.md in markdown format
@@ -62,9 +80,18 @@ Requirements:
 
 Return ONLY the complete README.md content, nothing else."""
 
-def get_validation_prompt(main_code: str, test_code: str, requirements: str, readme: str) -> str:
-    """Prompt for Final Validation Agent"""
-    return f"""You are a Senior Software Architect. Provide ONLY the assessment, no extra text.
+def get_readme_prompt(main_code: str, test_code: str, requirements: str = None, budget: PromptBudget = None) -> str:
+    """Prompt for README Generation Agent (requirements are optional)"""
+    sections = _fit_sections(budget, README_TEMPLATE, {
+        'main_code': ('code', main_code),
+        'test_code': ('tests', test_code),
+        'requirements': ('text', requirements)
+    })
+    if sections['requirements']:
+        sections['requirements'] = f"\nRequirements: {sections['requirements']}"
+    return README_TEMPLATE.format(**sections)
+
+VALIDATION_TEMPLATE = """You are a Senior Software Architect. Provide ONLY the assessment, no extra text.
 
 COMPLETE PROJECT REVIEW:
 Main Code: {main_code}
@@ -81,4 +108,37 @@ Provide structured assessment with:
 - Top 3 Strengths: [list]
 - Top 3 Improvements: [list]
 
-Return ONLY the structured assessment, nothing else."""
\ No newline at end of file
+Return ONLY the structured assessment, nothing else."""
+
+def get_validation_prompt(main_code: str, test_code: str, requirements: str, readme: str,
+                          budget: PromptBudget = None) -> str:
+    """Prompt for Final Validation Agent"""
+    sections = _fit_sections(budget, VALIDATION_TEMPLATE, {
+        'main_code': ('code', main_code),
+        'test_code': ('tests', test_code),
+        'requirements': ('text', requirements),
+        'readme': ('markdown', readme)
+    })
+    return VALIDATION_TEMPLATE.format(**sections)
+
+VALIDATION_NARRATIVE_TEMPLATE = """You are a Senior Software Architect. Provide ONLY the requested lists, no extra text.
+
+AUTOMATED REVIEW RESULTS:
+{assessment}
+
+MAIN CODE:
+{main_code}
+
+Based on the code and the automated results above, provide:
+- Top 3 Strengths: [list]
+- Top 3 Improvements: [list]
+
+Return ONLY these two lists, nothing else."""
+
+def get_validation_narrative_prompt(assessment: str, main_code: str, budget: PromptBudget = None) -> str:
+    """Prompt for the narrative part of validation when scores are computed locally"""
+    sections = _fit_sections(budget, VALIDATION_NARRATIVE_TEMPLATE, {
+        'assessment': ('text', assessment),
+        'main_code': ('code', main_code)
+    })
+    return VALIDATION_NARRATIVE_TEMPLATE.format(**sections)
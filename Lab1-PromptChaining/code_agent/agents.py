@@ -1,131 +1,219 @@
+import os
+import time
 import streamlit as st
-from snowflake_connection import call_cortex_complete
+from snowflake_connection import StreamError, call_cortex_complete, stream_cortex_complete
 from agent_prompts import *
+from prompt_budget import PromptBudget
+from local_validator import LOCAL_VALIDATION, analyze_project, format_assessment
+from model_selector import get_model_selector
 
 # Model configuration for each agent type
 AGENT_MODELS = {
-    'code_generation': 'claude-3-5-sonnet',    
-    'test_generation': 'llama4-maverick',  
-    'requirements': 'mixtral-8x7b',          
-    'documentation': 'llama4-scout',            
-    'validation': 'mistral-7b'              
+    'code_generation': 'claude-3-5-sonnet',
+    'test_generation': 'llama4-maverick',
+    'requirements': 'mixtral-8x7b',
+    'documentation': 'llama4-scout',
+    'validation': 'mistral-7b'
 }
 
-class CodeGenerationAgent:
-    def __init__(self):
-        self.name = "Code Generation Agent"
-        self.icon = "💻"
-        self.model = AGENT_MODELS['code_generation']
-        self.description = "Generates production-ready Python code"
-    
-    def execute(self, user_requirement: str, show_backend: bool = False):
-        st.write(f"{self.icon} **{self.name}** (using {self.model})")
-        prompt = get_code_generation_prompt(user_requirement)
-        
-        with st.spinner(f"{self.name} is working with {self.model}..."):
-            result = call_cortex_complete(prompt, self.model)
-        
+# Stream tokens into the UI as they arrive (uses the Cortex REST endpoint)
+STREAM_OUTPUT = os.getenv("CORTEX_STREAMING", "false").lower() == "true"
+
+class BaseAgent:
+    """Shared compute and rendering path for the chain agents"""
+
+    prompt_budget = None
+    metrics = None
+    last_prompt = None
+    model_decision = None
+    # Error text of the last model call (agents return it instead of raising)
+    error = None
+    # Feed call statistics to the model selector (set by AgentChain in adaptive mode)
+    record_stats = False
+
+    def build_prompt(self, *inputs) -> str:
+        raise NotImplementedError
+
+    def new_budget(self) -> PromptBudget:
+        """Create a token budget for this agent's model and keep it for the backend view"""
+        self.prompt_budget = PromptBudget(self.model)
+        return self.prompt_budget
+
+    def finalize(self, result: str) -> str:
+        """Post-process the model output into the agent's result"""
+        return result
+
+    def call_model(self, prompt: str) -> str:
+        """Blocking model call that records duration"""
+        start = time.time()
+        result = call_cortex_complete(prompt, self.model)
+        duration = time.time() - start
+        # Without streaming the first token arrives with the full response
+        self.metrics = {'streamed': False, 'ttft_s': duration, 'duration_s': duration}
+        self._record_call(duration, result)
+        return result
+
+    def stream_model(self, prompt: str, on_chunk):
+        """Streaming model call that records time-to-first-token and duration"""
+        start = time.time()
+        first_token = None
+        chunks = []
+        failed = False
+        try:
+            for chunk in stream_cortex_complete(prompt, self.model):
+                if first_token is None:
+                    first_token = time.time() - start
+                chunks.append(chunk)
+                on_chunk("".join(chunks))
+            result = "".join(chunks)
+        except StreamError as e:
+            # The partial output is dropped; downstream agents get the error like a failed blocking call
+            failed = True
+            result = str(e)
+            on_chunk(result)
+        duration = time.time() - start
+        self.metrics = {
+            'streamed': True,
+            'ttft_s': first_token if first_token is not None else duration,
+            'duration_s': duration
+        }
+        self._record_call(duration, result, failed)
+        return result
+
+    def _record_call(self, duration: float, result: str, failed: bool = False):
+        error = failed or not result or result.startswith(("Error with model", "Connection failed"))
+        self.error = (result or "Empty response") if error else None
+        if self.record_stats:
+            get_model_selector().record_call(self.role, self.model, duration, result, error)
+
+    def run(self, *inputs, on_text=None) -> str:
+        """Compute path: build the prompt and call the model, no UI (streams when on_text is given)"""
+        prompt = self.last_prompt = self.build_prompt(*inputs)
+        if on_text:
+            return self.finalize(self.stream_model(prompt, on_text))
+        return self.finalize(self.call_model(prompt))
+
+    def render(self, prompt: str, result: str, show_backend: bool = False):
+        """Render a finished agent call in Streamlit"""
         if show_backend:
             with st.expander(f"Backend: {self.name}", expanded=False):
                 st.write(f"**Model Used:** `{self.model}`")
+                if self.model_decision:
+                    st.write(f"**Model Selection:** {self.model_decision['reason']}")
+                    st.json(self.model_decision['candidates'], expanded=False)
+                if self.metrics:
+                    st.write(f"**Time to First Token:** {self.metrics['ttft_s']:.2f}s | "
+                             f"**Total:** {self.metrics['duration_s']:.2f}s")
+                if self.prompt_budget and self.prompt_budget.report:
+                    report = self.prompt_budget.report
+                    st.write(f"**Prompt Tokens:** ~{report['final_tokens']} / {report['budget']} "
+                             f"(saved ~{report['saved_tokens']})")
                 st.code(prompt, language="text")
                 st.code(result[:200] + "...", language="text")
-        
+
         st.success(f"✅ {self.name} completed")
+
+    def execute(self, *inputs, show_backend: bool = False, stream: bool = STREAM_OUTPUT, on_text=None):
+        """UI path: run the agent inside Streamlit status widgets"""
+        st.write(f"{self.icon} **{self.name}** (using {self.model})")
+        prompt = self.last_prompt = self.build_prompt(*inputs)
+
+        if stream or on_text:
+            placeholder = st.empty()
+
+            def show(text):
+                placeholder.code(text, language="text")
+                if on_text:
+                    on_text(text)
+
+            result = self.finalize(self.stream_model(prompt, show))
+        else:
+            with st.spinner(f"{self.name} is working with {self.model}..."):
+                result = self.finalize(self.call_model(prompt))
+
+        self.render(prompt, result, show_backend)
         return result
 
-class TestGenerationAgent:
+class CodeGenerationAgent(BaseAgent):
+    def __init__(self):
+        self.name = "Code Generation Agent"
+        self.icon = "💻"
+        self.model = AGENT_MODELS['code_generation']
+        self.role = 'code_generation'
+        self.description = "Generates production-ready Python code"
+        self.inputs = ['requirement']
+
+    def build_prompt(self, user_requirement: str) -> str:
+        return get_code_generation_prompt(user_requirement)
+
+class TestGenerationAgent(BaseAgent):
     def __init__(self):
         self.name = "Test Generation Agent"
         self.icon = "🧪"
         self.model = AGENT_MODELS['test_generation']
+        self.role = 'test_generation'
         self.description = "Creates comprehensive test suites"
-    
-    def execute(self, main_code: str, show_backend: bool = False):
-        st.write(f"{self.icon} **{self.name}** (using {self.model})")
-        prompt = get_test_generation_prompt(main_code)
-        
-        with st.spinner(f"{self.name} is working with {self.model}..."):
-            result = call_cortex_complete(prompt, self.model)
-        
-        if show_backend:
-            with st.expander(f"Backend: {self.name}", expanded=False):
-                st.write(f"**Model Used:** `{self.model}`")
-                st.code(prompt, language="text")
-                st.code(result[:200] + "...", language="text")
-        
-        st.success(f"✅ {self.name} completed")
-        return result
+        self.inputs = ['code']
+
+    def build_prompt(self, main_code: str) -> str:
+        return get_test_generation_prompt(main_code, budget=self.new_budget())
 
-class RequirementsAgent:
+class RequirementsAgent(BaseAgent):
     def __init__(self):
         self.name = "Requirements Agent"
         self.icon = "📦"
         self.model = AGENT_MODELS['requirements']
+        self.role = 'requirements'
         self.description = "Analyzes dependencies and creates requirements.txt"
-    
-    def execute(self, main_code: str, test_code: str, show_backend: bool = False):
-        st.write(f"{self.icon} **{self.name}** (using {self.model})")
-        prompt = get_requirements_prompt(main_code, test_code)
-        
-        with st.spinner(f"{self.name} is working with {self.model}..."):
-            result = call_cortex_complete(prompt, self.model)
-        
-        if show_backend:
-            with st.expander(f"Backend: {self.name}", expanded=False):
-                st.write(f"**Model Used:** `{self.model}`")
-                st.code(prompt, language="text")
-                st.code(result[:200] + "...", language="text")
-        
-        st.success(f"✅ {self.name} completed")
-        return result
+        self.inputs = ['code']
+
+    def build_prompt(self, main_code: str) -> str:
+        return get_requirements_prompt(main_code, budget=self.new_budget())
 
-class DocumentationAgent:
+class DocumentationAgent(BaseAgent):
     def __init__(self):
         self.name = "Documentation Agent"
         self.icon = "📚"
         self.model = AGENT_MODELS['documentation']
+        self.role = 'documentation'
         self.description = "Writes comprehensive documentation"
-    
-    def execute(self, main_code: str, test_code: str, requirements: str, show_backend: bool = False):
-        st.write(f"{self.icon} **{self.name}** (using {self.model})")
-        prompt = get_readme_prompt(main_code, test_code, requirements)
-        
-        with st.spinner(f"{self.name} is working with {self.model}..."):
-            result = call_cortex_complete(prompt, self.model)
-        
-        if show_backend:
-            with st.expander(f"Backend: {self.name}", expanded=False):
-                st.write(f"**Model Used:** `{self.model}`")
-                st.code(prompt, language="text")
-                st.code(result[:200] + "...", language="text")
-        
-        st.success(f"✅ {self.name} completed")
-        return result
+        self.inputs = ['code', 'test']
 
-class ValidationAgent:
-    def __init__(self):
+    def build_prompt(self, main_code: str, test_code: str) -> str:
+        return get_readme_prompt(main_code, test_code, budget=self.new_budget())
+
+class ValidationAgent(BaseAgent):
+    def __init__(self, use_local: bool = LOCAL_VALIDATION):
         self.name = "Validation Agent"
         self.icon = "✅"
         self.model = AGENT_MODELS['validation']
+        self.role = 'validation'
         self.description = "Reviews and validates the complete project"
-    
-    def execute(self, main_code: str, test_code: str, requirements: str, readme: str, show_backend: bool = False):
-        st.write(f"{self.icon} **{self.name}** (using {self.model})")
-        prompt = get_validation_prompt(main_code, test_code, requirements, readme)
-        
-        with st.spinner(f"{self.name} is working with {self.model}..."):
-            result = call_cortex_complete(prompt, self.model)
-        
-        if show_backend:
-            with st.expander(f"Backend: {self.name}", expanded=False):
-                st.write(f"**Model Used:** `{self.model}`")
-                st.code(prompt, language="text")
-                st.code(result[:200] + "...", language="text")
-        
-        st.success(f"✅ {self.name} completed")
-        return result
+        self.inputs = ['code', 'test', 'requirements', 'docs']
+        self.use_local = use_local
+        self.local_report = None
+        self.assessment = None
+
+    def build_prompt(self, main_code: str, test_code: str, requirements: str, readme: str) -> str:
+        if not self.use_local:
+            return get_validation_prompt(main_code, test_code, requirements, readme, budget=self.new_budget())
+
+        # Scores come from local analysis; the model only writes strengths/improvements
+        self.local_report = analyze_project(main_code, test_code, requirements, readme)
+        self.assessment = format_assessment(self.local_report)
+        return get_validation_narrative_prompt(self.assessment, main_code, budget=self.new_budget())
+
+    def finalize(self, result: str) -> str:
+        if not self.use_local:
+            return result
+        return f"{self.assessment}\n{result}"
+
+    def render(self, prompt: str, result: str, show_backend: bool = False):
+        if show_backend and self.local_report:
+            with st.expander(f"Local Analysis: {self.name}", expanded=False):
+                st.json(self.local_report)
+        super().render(prompt, result, show_backend)
 
 def get_agent_model(agent_type: str) -> str:
     """Get the recommended model for an agent type"""
-    return AGENT_MODELS.get(agent_type, 'claude-3-5-sonnet')
\ No newline at end of file
+    return AGENT_MODELS.get(agent_type, 'claude-3-5-sonnet')
@@ -1,6 +1,11 @@
 import streamlit as st
 import os
 from agent_chain import AgentChain
+from agents import STREAM_OUTPUT
+from speculation import PIPELINED, get_speculation_stats
+from model_selector import ADAPTIVE_MODELS
+from snowflake_connection import get_pool_stats
+from response_cache import get_response_cache
 
 # Page config
 st.set_page_config(
@@ -34,6 +39,11 @@ SNOWFLAKE_SCHEMA=your_schema
     with st.sidebar:
         st.header("⚙️ Settings")
         show_backend = st.toggle("Show Backend Process", True)
+        cache = get_response_cache()
+        cache.enabled = st.toggle("Use Response Cache", cache.enabled)
+        stream_output = st.toggle("Stream Agent Output", STREAM_OUTPUT)
+        pipelined = st.toggle("Pipelined Test Generation", PIPELINED)
+        adaptive = st.toggle("Adaptive Model Selection", ADAPTIVE_MODELS)
         
         st.header("🤖 Agent Chain")
         st.write("1. 💻 Code Generation")
@@ -42,6 +52,29 @@ SNOWFLAKE_SCHEMA=your_schema
         st.write("4. 📚 Documentation")
         st.write("5. ✅ Validation")
         
+        st.header("🔌 Connection Pool")
+        pool_stats = get_pool_stats()
+        st.write(f"Hits: {pool_stats['hits']} | Misses: {pool_stats['misses']}")
+        st.write(f"Hit rate: {pool_stats['hit_rate']:.0%}")
+        st.write(f"Avg wait: {pool_stats['avg_wait_ms']:.1f} ms ({pool_stats['waits']} waits)")
+        st.write(f"Idle: {pool_stats['idle']} / {pool_stats['size']}")
+        
+        if cache.enabled:
+            st.header("🗄️ Response Cache")
+            cache_stats = cache.get_stats()
+            st.write(f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']}")
+            st.write(f"Hit rate: {cache_stats['hit_rate']:.0%}")
+            st.write(f"Entries: {cache_stats['entries']} ({cache_stats['bytes'] / 1024:.1f} KB)")
+            if st.button("Clear Cache"):
+                cache.clear()
+        
+        if pipelined:
+            st.header("⏩ Speculative Tests")
+            spec_stats = get_speculation_stats()
+            st.write(f"Kept: {spec_stats['kept']} | Re-issued: {spec_stats['reissued']}")
+            st.write(f"Keep rate: {spec_stats['keep_rate']:.0%}")
+            st.write(f"Avg head start: {spec_stats['avg_lead_time_s']:.1f}s")
+        
         if st.button("Clear Results"):
             st.session_state.results = {}
             st.rerun()
@@ -79,7 +112,7 @@ SNOWFLAKE_SCHEMA=your_schema
             st.write("🚀 Starting agent chain...")
             
             # Execute chain
-            chain = AgentChain()
+            chain = AgentChain(stream=stream_output, pipelined=pipelined, adaptive=adaptive)
             results = chain.execute_chain(user_input, show_backend)
             
             # Store results
@@ -0,0 +1,151 @@
+"""
+Headless batch mode for the code generation chain
+
+Usage:
+    python batch.py requirements.jsonl --output-dir batch_output --workers 4
+
+Each input line is either a JSON string or an object with a "requirement"
+field and an optional "id". The five artifacts for every item are written to
+<output-dir>/<id>/ and a throughput/latency summary is printed at the end.
+"""
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agent_chain import AgentChain
+from snowflake_connection import get_connection_pool, get_pool_stats
+
+# File written for each chain output
+ARTIFACT_FILES = {
+    'code': 'main.py',
+    'test': 'test_main.py',
+    'requirements': 'requirements.txt',
+    'docs': 'README.md',
+    'validation': 'review.md'
+}
+
+def load_requirements(path: str) -> list:
+    """Read (id, requirement) pairs from a JSONL file"""
+    items = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {'requirement': record}
+            item_id = str(record.get('id', f"item_{line_no:04d}"))
+            # Keep ids usable as directory names
+            item_id = re.sub(r"[^A-Za-z0-9_.-]", "_", item_id)
+            # Two items with one id would overwrite each other's artifacts
+            if item_id in seen:
+                raise ValueError(f"Duplicate item id {item_id!r} on line {line_no} of {path}")
+            seen.add(item_id)
+            items.append((item_id, record['requirement']))
+    return items
+
+def write_artifacts(output_dir: str, item_id: str, results: dict):
+    """Write the chain outputs for one item"""
+    item_dir = os.path.join(output_dir, item_id)
+    os.makedirs(item_dir, exist_ok=True)
+    for key, filename in ARTIFACT_FILES.items():
+        with open(os.path.join(item_dir, filename), "w", encoding="utf-8") as f:
+            f.write(results.get(key, ""))
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_batch(input_path: str, output_dir: str, workers: int = 4, agent_workers: int = 4) -> dict:
+    """
+    Run the agent chain for every requirement in a JSONL file
+
+    Args:
+        input_path: JSONL file of requirements
+        output_dir: Directory that receives one folder of artifacts per item
+        workers: Number of chains running at the same time
+        agent_workers: Concurrent agents inside each chain
+
+    Returns:
+        Summary dict with throughput and latency statistics
+    """
+    items = load_requirements(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Every concurrent agent call needs its own pooled connection
+    pool = get_connection_pool()
+    pool.size = max(pool.size, workers * agent_workers)
+
+    latencies = []
+    failures = {}
+
+    def run_item(item_id, requirement):
+        start = time.time()
+        chain = AgentChain(max_workers=agent_workers)
+        results = chain.run_chain(requirement)
+        write_artifacts(output_dir, item_id, results)
+        # Agents return error text instead of raising, so check their status
+        if chain.errors:
+            raise RuntimeError("; ".join(f"{key}: {error[:200]}" for key, error in chain.errors.items()))
+        return time.time() - start
+
+    batch_start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_item, item_id, requirement): item_id for item_id, requirement in items}
+        for future in as_completed(futures):
+            item_id = futures[future]
+            try:
+                latency = future.result()
+                latencies.append(latency)
+                print(f"✅ {item_id} ({latency:.1f}s)")
+            except Exception as e:
+                failures[item_id] = str(e)
+                print(f"❌ {item_id}: {e}")
+    wall_time = time.time() - batch_start
+
+    summary = {
+        'items': len(items),
+        'succeeded': len(latencies),
+        'failed': len(failures),
+        'failures': failures,
+        'workers': workers,
+        'wall_time_s': wall_time,
+        'throughput_per_min': len(latencies) / wall_time * 60 if wall_time else 0.0,
+        'latency_mean_s': sum(latencies) / len(latencies) if latencies else 0.0,
+        'latency_p50_s': _percentile(latencies, 50),
+        'latency_p95_s': _percentile(latencies, 95),
+        'latency_max_s': max(latencies) if latencies else 0.0,
+        'connection_pool': get_pool_stats()
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def print_summary(summary: dict):
+    print("\n📊 Batch Summary")
+    print(f"Items: {summary['items']} (succeeded {summary['succeeded']}, failed {summary['failed']})")
+    print(f"Wall time: {summary['wall_time_s']:.1f}s with {summary['workers']} workers")
+    print(f"Throughput: {summary['throughput_per_min']:.2f} items/min")
+    print(f"Latency: mean {summary['latency_mean_s']:.1f}s | p50 {summary['latency_p50_s']:.1f}s | "
+          f"p95 {summary['latency_p95_s']:.1f}s | max {summary['latency_max_s']:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the code generation chain over a JSONL file of requirements")
+    parser.add_argument("input", help="JSONL file with one requirement per line")
+    parser.add_argument("--output-dir", default="batch_output", help="Directory for generated artifacts")
+    parser.add_argument("--workers", type=int, default=4, help="Chains running concurrently")
+    parser.add_argument("--agent-workers", type=int, default=4, help="Concurrent agents per chain")
+    args = parser.parse_args()
+
+    summary = run_batch(args.input, args.output_dir, args.workers, args.agent_workers)
+    print_summary(summary)
+
+if __name__ == "__main__":
+    main()
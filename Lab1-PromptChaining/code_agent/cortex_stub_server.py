@@ -0,0 +1,67 @@
+"""
+Local stand-in for the Cortex REST complete endpoint
+
+Streams an echo of the prompt back as server-sent events so streaming can be
+exercised without Snowflake:
+
+    python cortex_stub_server.py --port 8765 --chunk-delay 0.05
+    SNOWFLAKE_CORTEX_URL=http://localhost:8765 streamlit run app.py
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class CortexStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    chunk_size = 20
+    chunk_delay = 0.05
+    first_token_delay = 0.2
+
+    def do_POST(self):
+        if not self.path.endswith("/api/v2/cortex/inference:complete"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        text = f"[{request.get('model', 'stub')}] {prompt[:500]}"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        time.sleep(self.first_token_delay)
+        for start in range(0, len(text), self.chunk_size):
+            event = {"choices": [{"delta": {"content": text[start:start + self.chunk_size]}}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n")
+            time.sleep(self.chunk_delay)
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _write_chunk(self, data: str):
+        body = data.encode("utf-8")
+        self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port: int = 8765, chunk_delay: float = 0.05, first_token_delay: float = 0.2):
+    """Start the stub server (blocking)"""
+    CortexStubHandler.chunk_delay = chunk_delay
+    CortexStubHandler.first_token_delay = first_token_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), CortexStubHandler)
+    print(f"Cortex stub listening on http://127.0.0.1:{port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Cortex REST complete endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    args = parser.parse_args()
+    serve(args.port, args.chunk_delay, args.first_token_delay)
@@ -0,0 +1,317 @@
+import ast
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from dotenv import load_dotenv
+from prompt_budget import strip_code_fences
+
+# Load environment variables
+load_dotenv()
+
+# "local" computes scores here and asks the model only for the narrative; "llm" uses the full prompt
+LOCAL_VALIDATION = os.getenv("VALIDATION_MODE", "local").lower() == "local"
+
+# Running the generated tests executes model-written code, so it is opt-in.
+# With VALIDATION_TEST_IMAGE set the tests run in a throwaway container without
+# network access; otherwise they run on the host in a temporary directory with a
+# timeout, which isolates the file system and interpreter state but is not a
+# security boundary.
+RUN_GENERATED_TESTS = os.getenv("VALIDATION_RUN_TESTS", "false").lower() == "true"
+# Docker image with python and pytest installed
+TEST_IMAGE = os.getenv("VALIDATION_TEST_IMAGE", "")
+TEST_TIMEOUT = float(os.getenv("VALIDATION_TEST_TIMEOUT", "30"))
+MAX_TEST_PROCESSES = int(os.getenv("VALIDATION_MAX_TEST_PROCESSES", "2"))
+
+_test_slots = threading.BoundedSemaphore(MAX_TEST_PROCESSES)
+
+# Import names whose PyPI distribution is named differently
+IMPORT_TO_PACKAGE = {
+    'bs4': 'beautifulsoup4',
+    'cv2': 'opencv-python',
+    'dateutil': 'python-dateutil',
+    'dotenv': 'python-dotenv',
+    'jwt': 'pyjwt',
+    'PIL': 'pillow',
+    'sklearn': 'scikit-learn',
+    'yaml': 'pyyaml'
+}
+
+BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler,
+                ast.With, ast.AsyncWith, ast.Assert, ast.comprehension, ast.IfExp)
+
+def _parse(source: str):
+    """Parse source, returning (tree, error message)"""
+    try:
+        return ast.parse(strip_code_fences(source or "")), None
+    except SyntaxError as e:
+        return None, f"line {e.lineno}: {e.msg}"
+
+def cyclomatic_complexity(node) -> int:
+    """McCabe complexity: 1 + decision points inside the function"""
+    complexity = 1
+    for child in ast.walk(node):
+        if isinstance(child, BRANCH_NODES):
+            complexity += 1
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+    return complexity
+
+def _functions(tree) -> dict:
+    """Public functions and methods by qualified name"""
+    functions = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions[node.name] = node
+        elif isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    functions[f"{node.name}.{item.name}"] = item
+    return {
+        name: node for name, node in functions.items()
+        if not name.split(".")[-1].startswith("_") and name != "main"
+    }
+
+def _imported_modules(tree) -> set:
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.add(node.module.split(".")[0])
+    return modules
+
+def _requirement_names(requirements: str) -> set:
+    names = set()
+    for line in (requirements or "").splitlines():
+        line = line.split("#")[0].strip()
+        match = re.match(r"([A-Za-z0-9_.\-]+)", line)
+        if match and not line.startswith("-"):
+            names.add(match.group(1).lower().replace("_", "-"))
+    return names
+
+def _untested_functions(functions: dict, test_tree) -> list:
+    """Functions never referenced by name in the test file"""
+    referenced = set()
+    test_names = []
+    for node in ast.walk(test_tree):
+        if isinstance(node, ast.Name):
+            referenced.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            referenced.add(node.attr)
+        elif isinstance(node, ast.alias):
+            referenced.add(node.name.split(".")[-1])
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test_"):
+            test_names.append(node.name[len("test_"):])
+
+    shorts = {name.split(".")[-1] for name in functions}
+    # test_add_expense_negative covers add_expense even when called through a fixture;
+    # the longest matching function name wins, so it does not also cover add
+    for test_name in test_names:
+        matches = [short for short in shorts if test_name == short or test_name.startswith(short + "_")]
+        if matches:
+            referenced.add(max(matches, key=len))
+    return [name for name in functions if name.split(".")[-1] not in referenced]
+
+def _local_modules(test_tree, defined: set) -> list:
+    """Modules the tests import generated names from (the code under test)"""
+    modules = []
+    imported = {}
+    for node in ast.walk(test_tree):
+        if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            if any(alias.name in defined for alias in node.names):
+                modules.append(node.module.split(".")[0])
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if "." not in alias.name:
+                    imported[alias.asname or alias.name] = alias.name
+    # "import mymodule" counts when the tests use mymodule.<generated name>
+    for node in ast.walk(test_tree):
+        if (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+                and node.value.id in imported and node.attr in defined):
+            modules.append(imported[node.value.id])
+    return modules
+
+def _pytest_command(workdir: str, container: str) -> list:
+    pytest = ["python", "-m", "pytest", "-q", "--tb=no", "-p", "no:cacheprovider", "test_generated.py"]
+    if not TEST_IMAGE:
+        return [sys.executable] + pytest[1:]
+    return [
+        "docker", "run", "--rm", "--name", container, "--network", "none",
+        "--memory", "512m", "--cpus", "1", "--pids-limit", "128",
+        "-e", "PYTHONDONTWRITEBYTECODE=1", "-v", f"{workdir}:/work:ro", "-w", "/work",
+        TEST_IMAGE
+    ] + pytest
+
+def run_generated_tests(main_code: str, test_code: str, module_names: list) -> dict:
+    """Run the generated pytest file against the generated code in a subprocess"""
+    with _test_slots, tempfile.TemporaryDirectory(prefix="codegen_validation_") as workdir:
+        for module in module_names or ["main"]:
+            with open(os.path.join(workdir, f"{module}.py"), "w", encoding="utf-8") as f:
+                f.write(strip_code_fences(main_code))
+        with open(os.path.join(workdir, "test_generated.py"), "w", encoding="utf-8") as f:
+            f.write(strip_code_fences(test_code))
+
+        # The docker client keeps the caller's environment (DOCKER_HOST, config)
+        env = None if TEST_IMAGE else {'PATH': os.environ.get('PATH', ''), 'PYTHONPATH': workdir, 'HOME': workdir}
+        container = f"codegen_validation_{uuid.uuid4().hex[:12]}"
+        try:
+            completed = subprocess.run(
+                _pytest_command(workdir, container),
+                cwd=workdir, env=env, capture_output=True, text=True, timeout=TEST_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            if TEST_IMAGE:
+                # Killing the docker client leaves the container running
+                subprocess.run(["docker", "kill", container], capture_output=True)
+            return {'ran': True, 'timed_out': True, 'passed': 0, 'failed': 0, 'errors': 0, 'summary': "timed out"}
+
+    output = completed.stdout.strip().splitlines()
+    summary = output[-1] if output else completed.stderr.strip()[-200:]
+    counts = {key: int(num) for num, key in re.findall(r"(\d+) (passed|failed|error)", summary)}
+    return {
+        'ran': True,
+        'timed_out': False,
+        'passed': counts.get('passed', 0),
+        'failed': counts.get('failed', 0),
+        'errors': counts.get('error', 0),
+        'summary': summary
+    }
+
+def analyze_project(main_code: str, test_code: str, requirements: str, readme: str,
+                    run_tests: bool = RUN_GENERATED_TESTS) -> dict:
+    """Compute local validation signals for the generated project"""
+    code_tree, code_error = _parse(main_code)
+    test_tree, test_error = _parse(test_code)
+    report = {
+        'code_syntax_error': code_error,
+        'test_syntax_error': test_error,
+        'functions': 0,
+        'docstring_coverage': 0.0,
+        'complexity': {},
+        'untested_functions': [],
+        'missing_requirements': [],
+        'readme_sections': [],
+        'tests': {'ran': False}
+    }
+
+    stdlib = set(sys.stdlib_module_names)
+    local_modules = []
+    if code_tree:
+        functions = _functions(code_tree)
+        report['functions'] = len(functions)
+        report['complexity'] = {name: cyclomatic_complexity(node) for name, node in functions.items()}
+        documented = sum(1 for node in functions.values() if ast.get_docstring(node))
+        report['docstring_coverage'] = documented / len(functions) if functions else 1.0
+
+        if test_tree:
+            report['untested_functions'] = _untested_functions(functions, test_tree)
+            defined = {name.split(".")[0] for name in functions} | {
+                node.name for node in code_tree.body if isinstance(node, ast.ClassDef)
+            }
+            local_modules = _local_modules(test_tree, defined)
+
+        third_party = set()
+        for tree in (code_tree, test_tree):
+            if tree:
+                third_party |= _imported_modules(tree) - stdlib
+        third_party -= set(local_modules) | {"main"}
+        declared = _requirement_names(requirements)
+        report['missing_requirements'] = sorted(
+            module for module in third_party
+            if IMPORT_TO_PACKAGE.get(module, module).lower().replace("_", "-") not in declared
+        )
+
+    headings = [line.lstrip("#").strip().lower() for line in (readme or "").splitlines() if line.startswith("#")]
+    report['readme_sections'] = [
+        section for section in ("installation", "usage", "test")
+        if any(section in heading for heading in headings)
+    ]
+
+    if run_tests and code_tree and test_tree:
+        report['tests'] = run_generated_tests(main_code, test_code, sorted(set(local_modules)))
+
+    report['scores'] = score_report(report)
+    return report
+
+def score_report(report: dict) -> dict:
+    """Turn local signals into 0-10 scores"""
+    if report['code_syntax_error']:
+        code_score = 0.0
+    else:
+        complexities = list(report['complexity'].values())
+        high = sum(1 for c in complexities if c > 10)
+        code_score = 6.0 + 3.0 * report['docstring_coverage'] + (1.0 if not high else 0.0)
+        code_score -= min(3.0, high)
+
+    tests = report['tests']
+    if report['test_syntax_error'] or not report['functions']:
+        test_score = 0.0 if report['test_syntax_error'] else 5.0
+    else:
+        tested = 1 - len(report['untested_functions']) / report['functions']
+        test_score = 6.0 * tested
+        if tests.get('ran'):
+            total = tests['passed'] + tests['failed'] + tests['errors']
+            test_score += 4.0 * (tests['passed'] / total) if total else 0.0
+        else:
+            test_score += 2.0
+
+    docs_score = 4.0 + 2.0 * len(report['readme_sections'])
+    overall = round((code_score * 0.4 + test_score * 0.4 + docs_score * 0.2), 1)
+
+    tests_ok = not tests.get('ran') or (tests['failed'] == 0 and tests['errors'] == 0 and not tests['timed_out'])
+    ready = (
+        not report['code_syntax_error'] and not report['test_syntax_error']
+        and not report['missing_requirements'] and tests_ok and overall >= 7
+    )
+    return {
+        'overall': overall,
+        'code': round(code_score, 1),
+        'tests': round(test_score, 1),
+        'docs': round(docs_score, 1),
+        'production_ready': ready
+    }
+
+def format_assessment(report: dict) -> str:
+    """Structured assessment in the same layout the validation prompt asks the model for"""
+    scores = report['scores']
+
+    if report['code_syntax_error']:
+        code_quality = f"Syntax error ({report['code_syntax_error']})"
+    else:
+        complexities = report['complexity']
+        worst = max(complexities.items(), key=lambda item: item[1]) if complexities else None
+        code_quality = (
+            f"{scores['code']}/10 - {report['functions']} public functions, "
+            f"{report['docstring_coverage']:.0%} with docstrings"
+        )
+        if worst:
+            code_quality += f", max complexity {worst[1]} ({worst[0]})"
+
+    tests = report['tests']
+    if report['test_syntax_error']:
+        coverage = f"Test file has a syntax error ({report['test_syntax_error']})"
+    else:
+        coverage = f"{scores['tests']}/10 - "
+        untested = report['untested_functions']
+        coverage += f"untested: {', '.join(untested)}" if untested else "every public function is referenced"
+        if tests.get('ran'):
+            coverage += f"; pytest: {tests['summary']}"
+
+    sections = report['readme_sections']
+    documentation = f"{scores['docs']}/10 - README covers {', '.join(sections) if sections else 'none of installation/usage/testing'}"
+
+    readiness = 'Ready' if scores['production_ready'] else 'Not Ready'
+    if report['missing_requirements']:
+        readiness += f" (imports missing from requirements: {', '.join(report['missing_requirements'])})"
+
+    return "\n".join([
+        f"- Overall Quality Score: {scores['overall']}/10",
+        f"- Code Quality: {code_quality}",
+        f"- Test Coverage: {coverage}",
+        f"- Documentation: {documentation}",
+        f"- Production Readiness: {readiness}"
+    ])
@@ -0,0 +1,199 @@
+import json
+import os
+import random
+import re
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Pick each agent's model from measured latency and quality instead of AGENT_MODELS alone
+ADAPTIVE_MODELS = os.getenv("ADAPTIVE_MODELS", "false").lower() == "true"
+MODEL_SLO_P95_SECONDS = float(os.getenv("MODEL_SLO_P95_SECONDS", "30"))
+MODEL_QUALITY_FLOOR = float(os.getenv("MODEL_QUALITY_FLOOR", "6.0"))
+MODEL_MAX_ERROR_RATE = float(os.getenv("MODEL_MAX_ERROR_RATE", "0.2"))
+MODEL_MIN_SAMPLES = int(os.getenv("MODEL_MIN_SAMPLES", "5"))
+MODEL_EXPLORATION_RATE = float(os.getenv("MODEL_EXPLORATION_RATE", "0.1"))
+MODEL_STATS_PATH = os.getenv("MODEL_STATS_PATH", ".model_stats.json")
+
+# Models each agent role may use; the first entry is the default
+MODEL_CANDIDATES = {
+    'code_generation': ['claude-3-5-sonnet', 'llama4-maverick', 'mistral-large2'],
+    'test_generation': ['llama4-maverick', 'claude-3-5-sonnet', 'llama4-scout'],
+    'requirements': ['mixtral-8x7b', 'mistral-7b', 'llama4-scout'],
+    'documentation': ['llama4-scout', 'llama4-maverick', 'mixtral-8x7b'],
+    'validation': ['mistral-7b', 'mixtral-8x7b', 'llama4-scout']
+}
+
+WINDOW = 100
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a sequence"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def parse_quality_score(validation: str):
+    """Extract the overall X/10 score from a validation assessment"""
+    match = re.search(r"Overall Quality Score:\s*\**\s*([\d.]+)\s*/\s*10", validation or "")
+    return float(match.group(1)) if match else None
+
+class ModelStats:
+    """Rolling latency, error, output size and quality samples for one role/model pair"""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=WINDOW)
+        self.errors = deque(maxlen=WINDOW)
+        self.output_chars = deque(maxlen=WINDOW)
+        self.quality = deque(maxlen=WINDOW)
+
+    def summary(self) -> dict:
+        calls = len(self.errors)
+        return {
+            'calls': calls,
+            'p50_s': round(percentile(self.latencies, 50), 2),
+            'p95_s': round(percentile(self.latencies, 95), 2),
+            'error_rate': round(sum(self.errors) / calls, 3) if calls else 0.0,
+            'avg_output_chars': int(sum(self.output_chars) / len(self.output_chars)) if self.output_chars else 0,
+            'avg_quality': round(sum(self.quality) / len(self.quality), 2) if self.quality else None
+        }
+
+    def to_dict(self) -> dict:
+        return {name: list(getattr(self, name)) for name in ('latencies', 'errors', 'output_chars', 'quality')}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        stats = cls()
+        for name, values in data.items():
+            getattr(stats, name).extend(values)
+        return stats
+
+class ModelSelector:
+    """Chooses the fastest model per agent role that meets the latency SLO and quality floor"""
+
+    def __init__(self, candidates: dict = None, slo_p95: float = MODEL_SLO_P95_SECONDS,
+                 quality_floor: float = MODEL_QUALITY_FLOOR, path: str = MODEL_STATS_PATH):
+        self.candidates = candidates or MODEL_CANDIDATES
+        self.slo_p95 = slo_p95
+        self.quality_floor = quality_floor
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._load()
+
+    def _get(self, role: str, model: str) -> ModelStats:
+        return self._stats.setdefault((role, model), ModelStats())
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for key, data in json.load(f).items():
+                    role, model = key.split("|", 1)
+                    self._stats[(role, model)] = ModelStats.from_dict(data)
+        except (OSError, ValueError):
+            self._stats = {}
+
+    def save(self):
+        """Persist samples so selections survive restarts"""
+        if not self.path:
+            return
+        # Concurrent chains save too; write a whole file and swap it in under the lock
+        with self._lock:
+            data = {f"{role}|{model}": stats.to_dict() for (role, model), stats in self._stats.items()}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def record_call(self, role: str, model: str, latency: float, output: str, error: bool):
+        with self._lock:
+            stats = self._get(role, model)
+            stats.latencies.append(latency)
+            stats.errors.append(1 if error else 0)
+            stats.output_chars.append(len(output or ""))
+
+    def record_quality(self, models: dict, score: float):
+        """Attribute a validation score to the models that produced the project"""
+        with self._lock:
+            for role, model in models.items():
+                if role != 'validation':
+                    self._get(role, model).quality.append(score)
+        self.save()
+
+    def _assess(self, summary: dict) -> tuple:
+        """(eligible, reason) for a measured model"""
+        if summary['p95_s'] > self.slo_p95:
+            return False, f"p95 {summary['p95_s']}s over SLO {self.slo_p95}s"
+        if summary['error_rate'] > MODEL_MAX_ERROR_RATE:
+            return False, f"error rate {summary['error_rate']:.0%}"
+        if summary['avg_quality'] is not None and summary['avg_quality'] < self.quality_floor:
+            return False, f"quality {summary['avg_quality']} below floor {self.quality_floor}"
+        return True, "meets SLO and quality floor"
+
+    def select(self, role: str) -> dict:
+        """
+        Choose a model for an agent role
+
+        Returns:
+            Decision dict with the chosen model, the reason and per-candidate statistics
+        """
+        candidates = self.candidates.get(role, [])
+        with self._lock:
+            summaries = {model: self._get(role, model).summary() for model in candidates}
+
+        measured, unmeasured = [], []
+        assessments = {}
+        for model in candidates:
+            summary = summaries[model]
+            if summary['calls'] < MODEL_MIN_SAMPLES:
+                unmeasured.append(model)
+                assessments[model] = "not enough samples"
+                continue
+            eligible, reason = self._assess(summary)
+            assessments[model] = reason
+            if eligible:
+                measured.append(model)
+
+        default = candidates[0]
+        if unmeasured and random.random() < MODEL_EXPLORATION_RATE:
+            model, reason = random.choice(unmeasured), "exploring model with too few samples"
+        elif measured:
+            model = min(measured, key=lambda m: summaries[m]['p50_s'])
+            reason = "fastest model meeting SLO and quality floor"
+            if model != default and default not in measured:
+                reason = f"failover from {default} ({assessments[default]})"
+        elif default in unmeasured:
+            model, reason = default, "default model (still collecting samples)"
+        elif unmeasured:
+            model, reason = unmeasured[0], f"failover from {default} ({assessments[default]}) to unmeasured model"
+        else:
+            # Nothing qualifies: take the lowest p95 to bound the damage
+            model = min(candidates, key=lambda m: summaries[m]['p95_s'])
+            reason = "no model meets the SLO and quality floor; lowest p95"
+
+        return {
+            'role': role,
+            'model': model,
+            'reason': reason,
+            'slo_p95_s': self.slo_p95,
+            'quality_floor': self.quality_floor,
+            'candidates': {m: dict(summaries[m], status=assessments[m]) for m in candidates}
+        }
+
+_selector = None
+_selector_lock = threading.Lock()
+
+def get_model_selector() -> ModelSelector:
+    """Get the process-wide model selector"""
+    global _selector
+    if _selector is None:
+        with _selector_lock:
+            if _selector is None:
+                _selector = ModelSelector()
+    return _selector
@@ -0,0 +1,179 @@
+import ast
+import os
+import re
+
+# Prompt token budget per model (input side). Override all with PROMPT_TOKEN_BUDGET in .env
+MODEL_TOKEN_BUDGETS = {
+    'claude-3-5-sonnet': 16000,
+    'llama4-maverick': 12000,
+    'mixtral-8x7b': 8000,
+    'llama4-scout': 8000,
+    'mistral-7b': 6000
+}
+DEFAULT_TOKEN_BUDGET = 8000
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English and code)"""
+    return (len(text) + 3) // 4 if text else 0
+
+def get_token_budget(model: str) -> int:
+    """Prompt token budget for a model"""
+    override = os.getenv("PROMPT_TOKEN_BUDGET")
+    if override:
+        return int(override)
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+def strip_code_fences(text: str) -> str:
+    """Remove markdown ``` fences that models often wrap code in"""
+    match = re.search(r"```(?:python|py)?\s*\n(.*?)```", text, re.DOTALL)
+    return match.group(1) if match else text
+
+# --- Compact views -------------------------------------------------------
+
+def _signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+def _outline(code: str, with_docstrings: bool) -> str:
+    tree = ast.parse(strip_code_fences(code))
+    lines = []
+
+    def add_def(node, indent):
+        doc = ast.get_docstring(node) if with_docstrings else None
+        if doc:
+            lines.append(f"{indent}{_signature(node)}:")
+            lines.append(f'{indent}    """{doc.strip().splitlines()[0]}"""')
+        else:
+            lines.append(f"{indent}{_signature(node)}: ...")
+
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            lines.append(ast.unparse(node))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            add_def(node, "")
+        elif isinstance(node, ast.ClassDef):
+            bases = f"({', '.join(ast.unparse(b) for b in node.bases)})" if node.bases else ""
+            lines.append(f"class {node.name}{bases}:")
+            doc = ast.get_docstring(node) if with_docstrings else None
+            if doc:
+                lines.append(f'    """{doc.strip().splitlines()[0]}"""')
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    add_def(item, "    ")
+    return "\n".join(lines)
+
+def code_outline(code: str) -> str:
+    """Imports plus function/class signatures with first docstring lines"""
+    return _outline(code, with_docstrings=True)
+
+def code_signatures(code: str) -> str:
+    """Imports plus bare function/class signatures"""
+    return _outline(code, with_docstrings=False)
+
+def test_names(test_code: str) -> str:
+    """List of test functions and test classes in a pytest file"""
+    tree = ast.parse(strip_code_fences(test_code))
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test"):
+            names.append(node.name)
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            names.append(node.name)
+    return f"{len(names)} tests:\n" + "\n".join(f"- {name}" for name in names)
+
+def markdown_outline(markdown: str) -> str:
+    """Markdown headings with the first line of text under each"""
+    lines = []
+    take_next = False
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            lines.append(stripped)
+            take_next = True
+        elif take_next and stripped:
+            lines.append(stripped)
+            take_next = False
+    return "\n".join(lines)
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Hard truncation used only when every compact view is still too large"""
+    limit = max(tokens, 0) * 4
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "\n... [truncated]"
+
+# Compact views to try for each section kind, from most to least detailed
+SECTION_VIEWS = {
+    'code': [code_outline, code_signatures],
+    'tests': [test_names],
+    'markdown': [markdown_outline],
+    'text': []
+}
+
+class PromptBudget:
+    """Fits prompt sections into a model's token budget using compact derived views"""
+
+    def __init__(self, model: str, budget: int = None):
+        self.model = model
+        self.budget = budget if budget is not None else get_token_budget(model)
+        self.report = {}
+
+    def fit(self, sections: dict, overhead: str = "") -> dict:
+        """
+        Shrink sections until the prompt fits the budget
+
+        Args:
+            sections: name -> (kind, text) where kind is a key of SECTION_VIEWS
+            overhead: fixed prompt text (instructions) counted against the budget
+
+        Returns:
+            name -> text to embed in the prompt
+        """
+        available = self.budget - estimate_tokens(overhead)
+        texts = {name: text or "" for name, (kind, text) in sections.items()}
+        views = {name: list(SECTION_VIEWS[kind]) for name, (kind, text) in sections.items()}
+        used_view = {name: 'full' for name in sections}
+        full_tokens = {name: estimate_tokens(text) for name, text in texts.items()}
+
+        def total():
+            return sum(estimate_tokens(text) for text in texts.values())
+
+        # Step the largest section down to its next view until everything fits
+        while total() > available:
+            candidates = [name for name in texts if views[name]]
+            if not candidates:
+                break
+            name = max(candidates, key=lambda n: estimate_tokens(texts[n]))
+            view = views[name].pop(0)
+            try:
+                compact = view(sections[name][1] or "")
+            except SyntaxError:
+                continue
+            if estimate_tokens(compact) < estimate_tokens(texts[name]):
+                texts[name] = compact
+                used_view[name] = view.__name__
+
+        # Last resort: truncate the largest sections
+        while total() > available:
+            name = max(texts, key=lambda n: estimate_tokens(texts[n]))
+            excess = total() - available
+            truncated = truncate_to_tokens(texts[name], estimate_tokens(texts[name]) - excess - 10)
+            if len(truncated) >= len(texts[name]):
+                break
+            texts[name] = truncated
+            used_view[name] = 'truncated'
+
+        final_tokens = {name: estimate_tokens(text) for name, text in texts.items()}
+        self.report = {
+            'model': self.model,
+            'budget': self.budget,
+            'full_tokens': sum(full_tokens.values()) + estimate_tokens(overhead),
+            'final_tokens': sum(final_tokens.values()) + estimate_tokens(overhead),
+            'sections': {
+                name: {'view': used_view[name], 'full': full_tokens[name], 'final': final_tokens[name]}
+                for name in texts
+            }
+        }
+        self.report['saved_tokens'] = self.report['full_tokens'] - self.report['final_tokens']
+        return texts
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Cache settings (override in .env)
+CACHE_ENABLED = os.getenv("CORTEX_CACHE_ENABLED", "false").lower() == "true"
+CACHE_PATH = os.getenv("CORTEX_CACHE_PATH", ".cortex_cache.sqlite3")
+CACHE_TTL = float(os.getenv("CORTEX_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("CORTEX_CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("CORTEX_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+class ResponseCache:
+    """SQLite-backed LLM response cache keyed by a hash of model and prompt"""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 enabled: bool = CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._initialized = False
+
+    def _create_schema(self, db):
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_last_accessed ON responses(last_accessed)")
+
+    @contextmanager
+    def _connect(self):
+        # The database file is only created once the cache is actually used
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                if not self._initialized:
+                    self._create_schema(db)
+                    self._initialized = True
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        """Content address for a model/prompt pair"""
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str):
+        """Return the cached response, or None on a miss or expired entry"""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        with self._lock, self._connect() as db:
+            row = db.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                db.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+                self.stats['hits'] += 1
+                return row[0]
+            if row:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats['evictions'] += 1
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, model: str, prompt: str, response: str):
+        """Store a response and evict least recently used entries over the limits"""
+        key = self.make_key(model, prompt)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            self.stats['writes'] += 1
+            self._evict(db, now)
+
+    def _evict(self, db, now: float):
+        expired = db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        self.stats['evictions'] += expired
+
+        count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Walk from least recently used until both limits are satisfied
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_accessed ASC").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.stats['evictions'] += len(victims)
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM responses")
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters plus current cache size"""
+        with self._lock, self._connect() as db:
+            entries, total = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = entries
+        stats['bytes'] = total
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -1,10 +1,27 @@
 import snowflake.connector
+import json
 import os
+import threading
+import time
+import requests
 from dotenv import load_dotenv
+from response_cache import get_response_cache
 
 # Load environment variables
 load_dotenv()
 
+# Connection pool settings (override in .env)
+POOL_SIZE = int(os.getenv("SNOWFLAKE_POOL_SIZE", "5"))
+POOL_IDLE_TIMEOUT = float(os.getenv("SNOWFLAKE_POOL_IDLE_TIMEOUT", "300"))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("SNOWFLAKE_POOL_ACQUIRE_TIMEOUT", "60"))
+
+# Cortex REST endpoint used for streaming (point at cortex_stub_server.py for local runs)
+CORTEX_REST_URL = os.getenv(
+    "SNOWFLAKE_CORTEX_URL",
+    f"https://{os.getenv('SNOWFLAKE_ACCOUNT', '')}.snowflakecomputing.com"
+)
+CORTEX_STREAM_TIMEOUT = float(os.getenv("SNOWFLAKE_CORTEX_STREAM_TIMEOUT", "300"))
+
 def get_snowflake_connection():
     """Get Snowflake connection using environment variables"""
     try:
@@ -21,38 +38,265 @@ def get_snowflake_connection():
         print(f"Connection failed: {e}")
         return None
 
-def call_cortex_complete(prompt: str, model: str = 'claude-3-5-sonnet') -> str:
+class ConnectionPool:
+    """Thread-safe pool of Snowflake connections shared by all agents"""
+
+    def __init__(self, size: int = POOL_SIZE, idle_timeout: float = POOL_IDLE_TIMEOUT,
+                 acquire_timeout: float = POOL_ACQUIRE_TIMEOUT, connect=get_snowflake_connection):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self._connect = connect
+        self._idle = []          # list of (conn, last_used) tuples
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'discarded': 0,
+            'waits': 0,
+            'wait_time': 0.0
+        }
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        """Check that an idle connection can be reused"""
+        if time.time() - last_used > self.idle_timeout:
+            return False
+        try:
+            return not conn.is_closed()
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Borrow a connection, opening a new one only when no healthy idle one exists"""
+        start = time.time()
+        stale = []
+        conn = None
+
+        with self._cond:
+            waited = False
+            while True:
+                while self._idle:
+                    candidate, last_used = self._idle.pop()
+                    if self._is_healthy(candidate, last_used):
+                        conn = candidate
+                        break
+                    stale.append(candidate)
+                    self.stats['discarded'] += 1
+
+                if conn is not None:
+                    self.stats['hits'] += 1
+                    break
+
+                if self._in_use < self.size:
+                    self.stats['misses'] += 1
+                    break
+
+                # Pool exhausted - wait for a connection to be released
+                waited = True
+                remaining = self.acquire_timeout - (time.time() - start)
+                if remaining <= 0 or not self._cond.wait(timeout=remaining):
+                    break
+
+            if waited:
+                self.stats['waits'] += 1
+                self.stats['wait_time'] += time.time() - start
+
+            if conn is None and self._in_use >= self.size:
+                acquired = False
+            else:
+                self._in_use += 1
+                acquired = True
+
+        for candidate in stale:
+            self._close(candidate)
+
+        if not acquired:
+            return None
+
+        if conn is None:
+            # Open the new connection outside the lock so other threads are not blocked
+            conn = self._connect()
+            if conn is None:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        """Return a borrowed connection to the pool"""
+        with self._cond:
+            self._in_use -= 1
+            if not discard and len(self._idle) < self.size:
+                self._idle.append((conn, time.time()))
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._close(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def get_stats(self) -> dict:
+        """Pool counters plus current occupancy"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._in_use
+            stats['size'] = self.size
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        stats['avg_wait_ms'] = (stats['wait_time'] / stats['waits'] * 1000) if stats['waits'] else 0.0
+        return stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool() -> ConnectionPool:
+    """Get the process-wide connection pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def get_pool_stats() -> dict:
+    """Hit/miss/wait counters for the shared connection pool"""
+    return get_connection_pool().get_stats()
+
+def call_cortex_complete(prompt: str, model: str = 'claude-3-5-sonnet', bypass_cache: bool = False) -> str:
     """
     Call Snowflake Cortex Complete function with specified model
-    
+
     Args:
         prompt: The prompt to send to the model
         model: The model to use (default: claude-3-5-sonnet)
-    
+        bypass_cache: Skip the response cache lookup and always call the model
+
     Returns:
         Generated response from the model
     """
-    conn = get_snowflake_connection()
+    cache = get_response_cache()
+    if cache.enabled and not bypass_cache:
+        cached = cache.get(model, prompt)
+        if cached is not None:
+            return cached
+
+    result, ok = _complete(prompt, model)
+
+    # Only successful completions are worth replaying
+    if cache.enabled and ok:
+        cache.put(model, prompt, result)
+    return result
+
+def _complete(prompt: str, model: str):
+    """Run COMPLETE on a pooled connection, returning (text, succeeded)"""
+    pool = get_connection_pool()
+    conn = pool.acquire()
     if not conn:
-        return "Connection failed"
-    
+        return "Connection failed", False
+
+    broken = False
     try:
         cursor = conn.cursor()
-        
+
         # Escape single quotes
         escaped_prompt = prompt.replace("'", "''")
-        
+
         query = f"""
         SELECT SNOWFLAKE.CORTEX.COMPLETE(
             '{model}',
             '{escaped_prompt}'
         ) as result
         """
-        
+
         cursor.execute(query)
         result = cursor.fetchone()
-        return result[0] if result else "No result"
+        cursor.close()
+        return (result[0], True) if result else ("No result", False)
     except Exception as e:
-        return f"Error with model {model}: {e}"
+        # Do not hand a possibly broken session to the next agent
+        broken = True
+        return f"Error with model {model}: {e}", False
     finally:
-        conn.close()
\ No newline at end of file
+        pool.release(conn, discard=broken)
+
+class StreamError(Exception):
+    """A streamed completion failed; the message has the same form as call_cortex_complete errors"""
+
+def _parse_stream_event(data: str) -> str:
+    """Extract the text delta from one server-sent event payload"""
+    event = json.loads(data)
+    choices = event.get("choices") or [{}]
+    delta = choices[0].get("delta") or {}
+    return delta.get("content") or delta.get("text") or ""
+
+def stream_cortex_complete(prompt: str, model: str = 'claude-3-5-sonnet', bypass_cache: bool = False):
+    """
+    Stream a Cortex completion through the REST complete endpoint
+
+    Args:
+        prompt: The prompt to send to the model
+        model: The model to use (default: claude-3-5-sonnet)
+        bypass_cache: Skip the response cache lookup and always call the model
+
+    Yields:
+        Text chunks as they arrive
+
+    Raises:
+        StreamError: The request or the stream failed (possibly after some chunks)
+    """
+    cache = get_response_cache()
+    if cache.enabled and not bypass_cache:
+        cached = cache.get(model, prompt)
+        if cached is not None:
+            yield cached
+            return
+
+    headers = {
+        "Authorization": f"Bearer {os.getenv('SNOWFLAKE_PASSWORD')}",  # PAT token
+        "X-Snowflake-Authorization-Token-Type": "PROGRAMMATIC_ACCESS_TOKEN",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": True
+    }
+
+    chunks = []
+    try:
+        with requests.post(
+            f"{CORTEX_REST_URL}/api/v2/cortex/inference:complete",
+            headers=headers, json=payload, stream=True, timeout=(10, CORTEX_STREAM_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                text = _parse_stream_event(data)
+                if text:
+                    chunks.append(text)
+                    yield text
+    except Exception as e:
+        # Raised rather than yielded, so a failure after some chunks is not mistaken for more text
+        raise StreamError(f"Error with model {model}: {e}") from e
+
+    if cache.enabled and chunks:
+        cache.put(model, prompt, "".join(chunks))
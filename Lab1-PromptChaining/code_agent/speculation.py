@@ -0,0 +1,160 @@
+import ast
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Start test generation on the streamed code prefix before the code agent finishes
+PIPELINED = os.getenv("CORTEX_PIPELINED", "false").lower() == "true"
+# Complete public definitions needed before speculating (the __main__ guard always triggers)
+MIN_DEFINITIONS = int(os.getenv("PIPELINE_MIN_DEFINITIONS", "3"))
+
+# Top-level lines that continue the previous statement rather than starting a new one
+CONTINUATION_PREFIXES = ("else", "elif", "except", "finally", ")", "]", "}", "#", "@")
+
+_stats_lock = threading.Lock()
+SPECULATION_STATS = {'started': 0, 'kept': 0, 'reissued': 0, 'lead_time_s': 0.0}
+
+def _strip_open_fence(text: str) -> str:
+    """Drop markdown fences from possibly incomplete streamed code"""
+    lines = text.split("\n")
+    if lines and lines[0].lstrip().startswith("```"):
+        lines = lines[1:]
+    for i, line in enumerate(lines):
+        if line.strip().startswith("```"):
+            lines = lines[:i]
+            break
+    return "\n".join(lines)
+
+def complete_prefix(text: str):
+    """
+    Longest prefix of streamed code made of complete top-level statements
+
+    A top-level statement is complete once the next one has started, so the
+    prefix ends at the last line that begins at column 0.
+    """
+    lines = _strip_open_fence(text).split("\n")
+    # The final line may still be streaming
+    for i in range(len(lines) - 2, 0, -1):
+        line = lines[i]
+        if line and not line[0].isspace() and not line.startswith(CONTINUATION_PREFIXES):
+            prefix = "\n".join(lines[:i])
+            try:
+                return prefix, ast.parse(prefix), line
+            except SyntaxError:
+                return None
+    return None
+
+def public_signatures(code) -> set:
+    """Signatures of public top-level functions, classes and their public methods (main excluded)"""
+    tree = code if isinstance(code, ast.AST) else ast.parse(_strip_open_fence(code))
+    signatures = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("_"):
+            # The entry point is not part of the API the tests exercise
+            if node.name == "main":
+                continue
+            signatures.add(f"{node.name}({ast.unparse(node.args)})")
+        elif isinstance(node, ast.ClassDef) and not node.name.startswith("_"):
+            signatures.add(f"class {node.name}")
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and (
+                    not item.name.startswith("_") or item.name == "__init__"
+                ):
+                    signatures.add(f"{node.name}.{item.name}({ast.unparse(item.args)})")
+    return signatures
+
+class SpeculativeTests:
+    """Starts test generation on a streamed code prefix and decides whether to keep it"""
+
+    def __init__(self, test_agent, min_definitions: int = MIN_DEFINITIONS):
+        # Own executor, so the chain's pool never waits for a discarded speculative run
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.test_agent = test_agent
+        # Separate instance so a re-issued run does not race the speculative one
+        self.speculative_agent = type(test_agent)()
+        self.speculative_agent.model = test_agent.model
+        self.speculative_agent.record_stats = test_agent.record_stats
+        self.min_definitions = min_definitions
+        self.future = None
+        self.prefix_signatures = None
+        self.started_at = None
+        self._last_checked = 0
+        self._lock = threading.Lock()
+
+    def feed(self, text: str):
+        """Streaming callback for the code agent"""
+        if self.future is not None:
+            return
+        # Only re-parse once a new line has arrived
+        line_count = text.count("\n")
+        if line_count == self._last_checked:
+            return
+        self._last_checked = line_count
+
+        found = complete_prefix(text)
+        if not found:
+            return
+        prefix, tree, next_line = found
+        signatures = public_signatures(tree)
+        definitions = sum(1 for s in signatures if "." not in s.split("(")[0])
+        if not next_line.startswith("if __name__") and definitions < self.min_definitions:
+            return
+
+        with self._lock:
+            if self.future is None:
+                self.prefix_signatures = signatures
+                self.started_at = time.time()
+                self.future = self.executor.submit(self.speculative_agent.run, prefix)
+                with _stats_lock:
+                    SPECULATION_STATS['started'] += 1
+
+    def resolve(self, final_code: str):
+        """
+        Return the speculative tests if the final code kept the same public API
+
+        Returns:
+            Test code, or None when the caller must re-issue test generation
+        """
+        code_done = time.time()
+        try:
+            final_signatures = public_signatures(final_code)
+        except SyntaxError:
+            final_signatures = None
+
+        if final_signatures is not None and final_signatures == self.prefix_signatures:
+            try:
+                result = self.future.result()
+            except Exception:
+                result = None
+            if result is not None and not result.startswith(("Error", "Connection failed")):
+                with _stats_lock:
+                    SPECULATION_STATS['kept'] += 1
+                    SPECULATION_STATS['lead_time_s'] += code_done - self.started_at
+                for attr in ('last_prompt', 'metrics', 'prompt_budget'):
+                    setattr(self.test_agent, attr, getattr(self.speculative_agent, attr))
+                return result
+
+        self.future.cancel()
+        # Re-issue right away instead of waiting for the discarded run
+        self.close()
+        with _stats_lock:
+            SPECULATION_STATS['reissued'] += 1
+        return None
+
+    def close(self):
+        """Release the speculative worker; a run still in flight finishes in the background"""
+        self.executor.shutdown(wait=False)
+
+def get_speculation_stats() -> dict:
+    """How often speculative test generation was kept"""
+    with _stats_lock:
+        stats = dict(SPECULATION_STATS)
+    decided = stats['kept'] + stats['reissued']
+    stats['keep_rate'] = stats['kept'] / decided if decided else 0.0
+    stats['avg_lead_time_s'] = stats['lead_time_s'] / stats['kept'] if stats['kept'] else 0.0
+    return stats
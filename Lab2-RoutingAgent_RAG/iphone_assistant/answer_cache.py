@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Semantic answer cache settings (override in .env)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", ".answer_cache.sqlite3")
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Seconds an answer stays valid per tool: news goes stale fast, review analysis slowly
+ANSWER_CACHE_TTL = {
+    'NEWS_AGENT': int(os.getenv("ANSWER_CACHE_TTL_NEWS", "900")),
+    'RAG_AGENT': int(os.getenv("ANSWER_CACHE_TTL_RAG", "604800"))
+}
+DEFAULT_TTL = 3600
+
+# Store answers depend on the origin location, which query embeddings do not
+# separate reliably ("nearest store to Boston" vs "... to Cambridge")
+UNCACHED_TOOLS = ('MAPS_AGENT',)
+
+class AnswerCache:
+    """
+    Semantic cache of final responses keyed by query embedding
+
+    A lookup returns the closest unexpired answer whose cosine similarity to
+    the new question exceeds the threshold; each tool has its own TTL.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, threshold: float = ANSWER_CACHE_THRESHOLD,
+                 ttl: dict = None, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 enabled: bool = ANSWER_CACHE_ENABLED):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = {**ANSWER_CACHE_TTL, **(ttl or {})}
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'invalidated': 0}
+        self._initialized = False
+
+    def _create_schema(self, db):
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                tool TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                tool_output TEXT NOT NULL,
+                final_response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_answers_tool ON answers(tool)")
+
+    @contextmanager
+    def _connect(self):
+        # The database file is only created once the cache is actually used
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                if not self._initialized:
+                    self._create_schema(db)
+                    self._initialized = True
+                yield db
+        finally:
+            db.close()
+
+    def ttl_for(self, tool: str) -> int:
+        return self.ttl.get(tool, DEFAULT_TTL)
+
+    def lookup(self, query_vector: list):
+        """
+        Closest unexpired cached answer for a query vector
+
+        Returns:
+            Dict with query, selected_tool, tool_output, final_response, similarity
+            and age_s, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock, self._connect() as db:
+            rows = db.execute("SELECT id, query, tool, vector, created_at FROM answers").fetchall()
+            rows = [row for row in rows
+                    if row[2] not in UNCACHED_TOOLS and now - row[4] <= self.ttl_for(row[2])]
+            best = None
+            if rows:
+                query = np.asarray(query_vector, dtype=np.float32)
+                matrix = np.stack([np.frombuffer(row[3], dtype=np.float32) for row in rows])
+                norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+                scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+                i = int(np.argmax(scores))
+                if scores[i] >= self.threshold:
+                    best = (rows[i], float(scores[i]))
+            if best is None:
+                self.stats['misses'] += 1
+                return None
+            (entry_id, query_text, tool, _, created_at), similarity = best
+            tool_output, final_response = db.execute(
+                "SELECT tool_output, final_response FROM answers WHERE id = ?", (entry_id,)
+            ).fetchone()
+            db.execute("UPDATE answers SET hits = hits + 1 WHERE id = ?", (entry_id,))
+            self.stats['hits'] += 1
+        return {
+            'query': query_text,
+            'selected_tool': tool,
+            'tool_output': tool_output,
+            'final_response': final_response,
+            'similarity': similarity,
+            'age_s': now - created_at
+        }
+
+    def store(self, query_text: str, query_vector: list, tool: str, tool_output: str, final_response: str):
+        """Save an answer, dropping expired entries and the oldest ones over the limit"""
+        if not self.enabled or tool in UNCACHED_TOOLS:
+            return
+        now = time.time()
+        blob = array('f', query_vector).tobytes()
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT INTO answers (query, tool, vector, tool_output, final_response, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (query_text, tool, blob, tool_output, final_response, now)
+            )
+            self.stats['writes'] += 1
+            for cached_tool, in db.execute("SELECT DISTINCT tool FROM answers").fetchall():
+                db.execute("DELETE FROM answers WHERE tool = ? AND created_at < ?",
+                           (cached_tool, now - self.ttl_for(cached_tool)))
+            db.execute("""
+                DELETE FROM answers WHERE id NOT IN (
+                    SELECT id FROM answers ORDER BY created_at DESC LIMIT ?
+                )
+            """, (self.max_entries,))
+
+    def invalidate(self, tool: str = None, older_than: float = None) -> int:
+        """
+        Drop cached answers, e.g. after the review table or store data changes
+
+        Args:
+            tool: Only answers produced by this tool (all tools when None)
+            older_than: Only answers created before this Unix timestamp
+
+        Returns:
+            Number of answers removed
+        """
+        clauses, params = [], []
+        if tool is not None:
+            clauses.append("tool = ?")
+            params.append(tool)
+        if older_than is not None:
+            clauses.append("created_at < ?")
+            params.append(older_than)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock, self._connect() as db:
+            removed = db.execute(f"DELETE FROM answers{where}", params).rowcount
+            self.stats['invalidated'] += removed
+        return removed
+
+    def clear(self) -> int:
+        """Remove every cached answer"""
+        return self.invalidate()
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters plus cached answers per tool"""
+        with self._lock, self._connect() as db:
+            per_tool = dict(db.execute("SELECT tool, COUNT(*) FROM answers GROUP BY tool").fetchall())
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = sum(per_tool.values())
+        stats['by_tool'] = per_tool
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    """Get the process-wide semantic answer cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
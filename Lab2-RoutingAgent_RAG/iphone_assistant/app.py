@@ -1,6 +1,11 @@
 import streamlit as st
 import os
 from routing_chain import RoutingChain
+from query_classifier import get_router_stats, evaluate_held_out, retrain_query_classifier
+from speculative_tools import SPECULATIVE_TOOLS, get_speculation_stats
+from embedding_cache import get_embedding_cache
+from answer_cache import get_answer_cache
+from http_client import get_http_stats, clear_http_cache
 
 # Page config
 st.set_page_config(
@@ -48,7 +53,64 @@ SNOWFLAKE_SCHEMA=PUBLIC
         st.write("")
         st.write("**Response Synthesizer**")
         st.write("↓ Natural language response")
-        
+
+        st.header("⚡ Local Router")
+        router_stats = get_router_stats()
+        st.metric("LLM-free decisions", f"{router_stats['local_share']:.0%}",
+                  help=f"{router_stats['local']} of {router_stats['decisions']} queries routed without the LLM")
+        if st.button("Retrain & Evaluate Router"):
+            evaluation = evaluate_held_out(retrain_query_classifier())
+            if evaluation['held_out']:
+                st.write(f"**Held-out LLM decisions:** {evaluation['held_out']}")
+                st.write(f"**Answered locally:** {evaluation['local_share']:.0%}")
+                if evaluation['agreement_local'] is not None:
+                    st.write(f"**Agreement when confident:** {evaluation['agreement_local']:.0%}")
+                st.write(f"**Agreement overall:** {evaluation['agreement_all']:.0%}")
+            else:
+                st.info("No held-out router decisions logged yet (set ROUTER_DECISION_LOG to collect them)")
+
+        st.header("🧮 Query Embedding Cache")
+        embedding_stats = get_embedding_cache().get_stats()
+        st.metric("Hit rate", f"{embedding_stats['hit_rate']:.0%}",
+                  help=f"{embedding_stats['hits']} hits, {embedding_stats['misses']} misses, "
+                       f"{embedding_stats['entries']} cached vectors")
+        if st.button("Clear Embedding Cache"):
+            get_embedding_cache().clear()
+            st.rerun()
+
+        st.header("💾 Answer Cache")
+        answer_cache = get_answer_cache()
+        if answer_cache.enabled:
+            answer_stats = answer_cache.get_stats()
+            st.metric("Hit rate", f"{answer_stats['hit_rate']:.0%}",
+                      help=f"{answer_stats['hits']} hits, {answer_stats['misses']} misses, "
+                           f"{answer_stats['entries']} cached answers")
+            for tool, count in answer_stats['by_tool'].items():
+                st.write(f"{tool}: {count} answers (TTL {answer_cache.ttl_for(tool) / 60:.0f} min)")
+            invalidate_tool = st.selectbox("Invalidate answers from", ["All tools", "RAG_AGENT", "NEWS_AGENT"])
+            if st.button("Invalidate Answers"):
+                answer_cache.invalidate(None if invalidate_tool == "All tools" else invalidate_tool)
+                st.rerun()
+        else:
+            st.caption("Disabled (ANSWER_CACHE_ENABLED=false)")
+
+        st.header("🌐 External API Cache")
+        for endpoint, stats in get_http_stats().items():
+            st.write(f"**{endpoint}:** {stats['hit_rate']:.0%} hits · {stats['requests']} requests "
+                     f"({stats['avg_s']:.2f}s avg) · {stats['errors']} errors")
+        if st.button("Clear API Cache"):
+            clear_http_cache()
+            st.rerun()
+
+        if SPECULATIVE_TOOLS:
+            st.header("🔮 Speculative Retrieval")
+            st.caption(f"Enabled for: {', '.join(SPECULATIVE_TOOLS)}")
+            for tool, stats in get_speculation_stats().items():
+                st.write(f"**{tool}**")
+                st.write(f"Committed {stats['committed']} / discarded {stats['discarded']}")
+                st.write(f"Avg saved: {stats['avg_saved_s']:.2f}s · Avg wasted: {stats['avg_wasted_s']:.2f}s")
+                st.write(f"Wasted calls: {stats['wasted_llm_calls']} LLM, {stats['wasted_api_calls']} API")
+
         if st.button("Clear Chat History"):
             st.session_state.chat_history = []
             st.session_state.routing_results = {}
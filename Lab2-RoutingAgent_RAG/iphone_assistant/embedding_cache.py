@@ -0,0 +1,124 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Query embedding cache settings (override in .env)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "5000"))
+
+def normalize_query(text: str) -> str:
+    """Cache key text: case, whitespace and trailing punctuation do not change the question"""
+    return re.sub(r"\s+", " ", text.lower()).strip().rstrip("?!. ")
+
+class EmbeddingCache:
+    """SQLite-backed query embedding store keyed by model and normalized query text, with LRU eviction"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 enabled: bool = EMBEDDING_CACHE_ENABLED):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._initialized = False
+
+    def _create_schema(self, db):
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                query TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (model, query)
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_accessed ON embeddings(last_accessed)")
+
+    @contextmanager
+    def _connect(self):
+        # The database file is only created once the cache is actually used
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                if not self._initialized:
+                    self._create_schema(db)
+                    self._initialized = True
+                yield db
+        finally:
+            db.close()
+
+    def get(self, model: str, query_text: str):
+        """Return the cached vector as a list of floats, or None on a miss"""
+        if not self.enabled:
+            return None
+        key = normalize_query(query_text)
+        with self._lock, self._connect() as db:
+            row = db.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND query = ?", (model, key)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            db.execute(
+                "UPDATE embeddings SET last_accessed = ? WHERE model = ? AND query = ?", (time.time(), model, key)
+            )
+            self.stats['hits'] += 1
+        return array('f', row[0]).tolist()
+
+    def put(self, model: str, query_text: str, vector: list):
+        """Store a vector (as float32) and evict least recently used entries over the limit"""
+        if not self.enabled:
+            return
+        now = time.time()
+        blob = array('f', vector).tobytes()
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)",
+                (model, normalize_query(query_text), blob, now, now)
+            )
+            self.stats['writes'] += 1
+            count = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                evicted = db.execute("""
+                    DELETE FROM embeddings WHERE rowid IN (
+                        SELECT rowid FROM embeddings ORDER BY last_accessed ASC LIMIT ?
+                    )
+                """, (count - self.max_entries,)).rowcount
+                self.stats['evictions'] += evicted
+
+    def clear(self):
+        """Remove every cached vector"""
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM embeddings")
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters plus current entry count"""
+        with self._lock, self._connect() as db:
+            entries = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = entries
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide query embedding cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
@@ -0,0 +1,49 @@
+import json
+import os
+import re
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Let each tool agent write the customer reply in the same call as its analysis
+FUSED_ANSWERS = os.getenv("FUSED_ANSWERS", "false").lower() == "true"
+
+FUSED_INSTRUCTIONS = """
+
+Then write the reply to the customer as a friendly Customer Service Representative
+for iPhone support. Base it only on your analysis and answer the question
+"{user_query}" directly and conversationally.
+
+Return ONLY a JSON object with two string fields, no additional text:
+{{"analysis": "<the structured analysis>", "answer": "<the customer response>"}}"""
+
+def fuse_prompt(analysis_prompt: str, user_query: str) -> str:
+    """Extend a tool's analysis prompt so the same call also writes the customer reply"""
+    # The tool prompts end with a "Return ONLY ..." line that the JSON instruction replaces
+    base = re.split(r"\n\s*Return ONLY", analysis_prompt)[0].rstrip()
+    return base + FUSED_INSTRUCTIONS.format(user_query=user_query)
+
+def _as_text(value) -> str:
+    if isinstance(value, dict):
+        return "\n".join(f"- {key}: {_as_text(item)}" for key, item in value.items())
+    if isinstance(value, list):
+        return "\n".join(f"- {_as_text(item)}" for item in value)
+    return str(value).strip()
+
+def parse_fused_response(text: str) -> tuple:
+    """
+    Split a fused response into (analysis, answer)
+
+    Returns (text, None) when the model did not return the JSON object, so the
+    caller can fall back to the synthesizer.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1])
+            if isinstance(data, dict) and data.get('answer'):
+                return _as_text(data.get('analysis', "")), _as_text(data['answer'])
+        except json.JSONDecodeError:
+            pass
+    return text, None
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# API hosts (point these at a local stub server for offline runs)
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com").rstrip("/")
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+
+# Connect and read timeouts in seconds, retries with exponential backoff for transient failures
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "1000"))
+
+# Base URL and response TTL (seconds) per endpoint: news changes fast, store locations rarely
+ENDPOINTS = {
+    'news': {'base_url': SERPAPI_BASE_URL, 'ttl': int(os.getenv("HTTP_CACHE_TTL_NEWS", "600"))},
+    'places': {'base_url': GOOGLE_MAPS_BASE_URL, 'ttl': int(os.getenv("HTTP_CACHE_TTL_PLACES", "259200"))},
+    'directions': {'base_url': GOOGLE_MAPS_BASE_URL, 'ttl': int(os.getenv("HTTP_CACHE_TTL_DIRECTIONS", "3600"))}
+}
+
+# Credentials are left out of cache keys
+SECRET_PARAMS = {'key', 'api_key'}
+
+class ResponseCache:
+    """In-memory TTL cache of decoded JSON responses with LRU eviction"""
+
+    def __init__(self, max_entries: int = HTTP_CACHE_MAX_ENTRIES, enabled: bool = HTTP_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: tuple, data, ttl: int):
+        if not self.enabled or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, endpoint: str = None):
+        """Drop cached responses for one endpoint, or all of them"""
+        with self._lock:
+            for key in [k for k in self._entries if endpoint is None or k[0] == endpoint]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+def _new_session() -> requests.Session:
+    """Keep-alive session whose GETs retry on connection errors, 429 and 5xx"""
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=len(ENDPOINTS), pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+_session = None
+_cache = ResponseCache()
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+HTTP_STATS = {name: {'requests': 0, 'cache_hits': 0, 'errors': 0, 'total_s': 0.0} for name in ENDPOINTS}
+
+def get_http_session() -> requests.Session:
+    """Get the process-wide pooled session"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _new_session()
+    return _session
+
+def get_json(endpoint: str, path: str, params: dict) -> tuple:
+    """
+    GET an endpoint path and decode the JSON body, serving fresh responses from the cache
+
+    Args:
+        endpoint: Key of ENDPOINTS ('news', 'places' or 'directions')
+        path: URL path below the endpoint's base URL
+        params: Query parameters
+
+    Returns:
+        (status_code, data); data is None unless the status is 200. Timeouts and
+        connection errors still raise once the retries are used up.
+    """
+    config = ENDPOINTS[endpoint]
+    key = (endpoint, path, tuple(sorted((k, str(v)) for k, v in params.items() if k not in SECRET_PARAMS)))
+    data = _cache.get(key)
+    if data is not None:
+        with _stats_lock:
+            HTTP_STATS[endpoint]['cache_hits'] += 1
+        return 200, data
+
+    start = time.perf_counter()
+    try:
+        response = get_http_session().get(config['base_url'] + path, params=params,
+                                          timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    except requests.RequestException:
+        with _stats_lock:
+            HTTP_STATS[endpoint]['errors'] += 1
+        raise
+    finally:
+        with _stats_lock:
+            HTTP_STATS[endpoint]['requests'] += 1
+            HTTP_STATS[endpoint]['total_s'] += time.perf_counter() - start
+
+    if response.status_code != 200:
+        with _stats_lock:
+            HTTP_STATS[endpoint]['errors'] += 1
+        return response.status_code, None
+    data = response.json()
+    # Google reports quota and key problems in the body of a 200 response; SerpAPI uses "error"
+    if not (isinstance(data, dict) and (data.get('error') or data.get('status') not in (None, 'OK', 'ZERO_RESULTS'))):
+        _cache.put(key, data, config['ttl'])
+    return 200, data
+
+def clear_http_cache(endpoint: str = None):
+    """Invalidate cached responses for one endpoint, or all of them"""
+    _cache.clear(endpoint)
+
+def get_http_stats() -> dict:
+    """Per-endpoint request, cache hit and error counts with hit rate and average latency"""
+    with _stats_lock:
+        stats = {name: dict(values) for name, values in HTTP_STATS.items()}
+    for values in stats.values():
+        lookups = values['requests'] + values['cache_hits']
+        values['hit_rate'] = values['cache_hits'] / lookups if lookups else 0.0
+        values['avg_s'] = values['total_s'] / values['requests'] if values['requests'] else 0.0
+    return stats
@@ -1,7 +1,13 @@
 import streamlit as st
-import requests
 import os
+from concurrent.futures import ThreadPoolExecutor
 from snowflake_connection import call_cortex_complete
+from http_client import get_json
+from fused_answer import fuse_prompt, parse_fused_response
+from template_formatter import TEMPLATE_FORMATTING, format_maps_result
+
+# Stores returned by Places; directions to all of them are fetched at once and ranked by transit time
+MAPS_CANDIDATE_STORES = int(os.getenv("MAPS_CANDIDATE_STORES", "5"))
 
 class MapsAgent:
     def __init__(self):
@@ -9,19 +15,35 @@ class MapsAgent:
         self.model = "llama4-maverick"
         self.icon = "🗺️"
         self.maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+        # Calls made by retrieve(), charged as waste when a speculative retrieval is discarded
+        self.retrieval_cost = {'llm_calls': 1, 'api_calls': 1}
+        # Customer reply from the last fused call (None when the synthesizer must write it)
+        self.last_answer = None
         
-    def execute(self, user_query: str, show_backend: bool = False) -> str:
-        """Find Apple Store locations and transit directions using Google Maps API"""
-        
-        # Step 1: Extract location from user query
-        location_extraction_prompt = f"""You are a Location Extraction Specialist. Extract location information from this query.
+    def _location_extraction_prompt(self, user_query: str) -> str:
+        return f"""You are a Location Extraction Specialist. Extract location information from this query.
 
 User query: {user_query}
 
 Extract the origin location. If no specific location mentioned, assume "Northeastern University, Boston, MA".
 Return ONLY the origin location, no additional text."""
-
-        origin_location = call_cortex_complete(location_extraction_prompt, self.model)
+        
+    def retrieve(self, user_query: str) -> tuple:
+        """Retrieval stage: origin extraction and Places lookup (no Streamlit calls)"""
+        # Step 1: Extract location from user query
+        origin_location = call_cortex_complete(self._location_extraction_prompt(user_query), self.model)
+        
+        # Step 2: Find Apple Stores using Google Places API
+        store_data = self._find_apple_stores(origin_location)
+        return origin_location, store_data
+        
+    def execute(self, user_query: str, show_backend: bool = False, retrieved: tuple = None, fused: bool = False) -> str:
+        """Find Apple Store locations and transit directions (fused: also write the customer reply in the same call)"""
+        self.last_answer = None
+        
+        # Steps 1-2 may already have run speculatively while the router decided
+        origin_location, store_data = retrieved if retrieved is not None else self.retrieve(user_query)
+        location_extraction_prompt = self._location_extraction_prompt(user_query)
         
         if show_backend:
             st.write(f"{self.icon} **{self.name}** (Google Maps API)")
@@ -31,9 +53,6 @@ Return ONLY the origin location, no additional text."""
         else:
             st.write(f"{self.icon} **{self.name}** (Google Maps API)")
         
-        # Step 2: Find Apple Stores using Google Places API
-        store_data = self._find_apple_stores(origin_location)
-        
         if show_backend:
             with st.expander("🔧 Maps Agent - Step 2: Google Places API", expanded=False):
                 st.write("**Google Places API Call:**")
@@ -41,25 +60,33 @@ Return ONLY the origin location, no additional text."""
                 st.write("**Store Results:**")
                 st.text_area("Places API Results:", str(store_data)[:500] + "..." if len(str(store_data)) > 500 else str(store_data), height=150)
         
-        # Step 3: Get transit directions to nearest store
-        if isinstance(store_data, list) and len(store_data) > 0 and isinstance(store_data[0], dict):
-            directions_data = self._get_transit_directions(origin_location, store_data[0])
-        else:
-            directions_data = "No stores found for directions"
+        # Step 3: Get transit directions to every candidate store concurrently, nearest first
+        stores = [store for store in store_data if isinstance(store, dict)] if isinstance(store_data, list) else []
+        ranked_routes = self._rank_stores_by_transit(origin_location, stores) if stores else []
+        directions_data = self._summarize_routes(ranked_routes) if ranked_routes else "No stores found for directions"
         
         if show_backend:
             with st.expander("🔧 Maps Agent - Step 3: Google Directions API", expanded=False):
-                st.write("**Google Directions API Call:**")
-                st.code(f"Mode: transit, From: {origin_location}, To: {store_data[0] if store_data else 'N/A'}", language="text")
-                st.write("**Transit Directions:**")
-                st.text_area("Directions API Results:", str(directions_data)[:500] + "..." if len(str(directions_data)) > 500 else str(directions_data), height=150)
+                st.write(f"**Google Directions API Calls:** {len(stores)} in parallel")
+                st.code(f"Mode: transit, From: {origin_location}, To: each candidate store", language="text")
+                st.write("**Stores Ranked by Transit Time:**")
+                st.text_area("Directions API Results:", directions_data, height=150)
+        
+        # Step 4: Render complete results with a template; only missing data needs the LLM
+        templated = format_maps_result(origin_location, ranked_routes) if TEMPLATE_FORMATTING else None
+        if templated is not None:
+            if show_backend:
+                with st.expander("🔧 Maps Agent - Step 4: Template Formatting", expanded=False):
+                    st.write("**Rendered from the ranked routes (no LLM call):**")
+                    st.text_area("Location Analysis Output:", templated, height=200)
+            st.success(f"✅ {self.name} completed location analysis")
+            return templated
         
-        # Step 4: Format the results using Cortex
         formatting_prompt = f"""You are a Transit Navigation Specialist. Format this location and transit information for the customer.
 
 User query: {user_query}
-Store information: {store_data}
-Transit directions: {directions_data}
+Apple Stores ranked by public transit time from {origin_location} (the first is the nearest):
+{directions_data}
 
 Provide structured location information:
 - Store Location: [Store name, address, and contact details]
@@ -68,9 +95,13 @@ Provide structured location information:
 - Additional Info: [Store hours or helpful tips]
 
 Return ONLY the structured location information, no additional text."""
+        if fused:
+            formatting_prompt = fuse_prompt(formatting_prompt, user_query)
 
         with st.spinner(f"{self.icon} Maps Agent formatting directions..."):
             maps_result = call_cortex_complete(formatting_prompt, self.model)
+        if fused:
+            maps_result, self.last_answer = parse_fused_response(maps_result)
         
         if show_backend:
             with st.expander("🔧 Maps Agent - Step 4: Response Formatting", expanded=False):
@@ -78,6 +109,9 @@ Return ONLY the structured location information, no additional text."""
                 st.code(formatting_prompt, language="text")
                 st.write("**Formatted Result:**")
                 st.text_area("Location Analysis Output:", maps_result, height=200)
+                if self.last_answer:
+                    st.write("**Customer Answer (same call):**")
+                    st.text_area("Fused Answer:", self.last_answer, height=150)
         
         st.success(f"✅ {self.name} completed location analysis")
         return maps_result
@@ -88,23 +122,21 @@ Return ONLY the structured location information, no additional text."""
             return ["Google Maps API key not configured"]
         
         try:
-            url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
             params = {
                 "query": f"Apple Store near {location}",
                 "key": self.maps_api_key,
                 "type": "store"
             }
             
-            response = requests.get(url, params=params)
+            status_code, data = get_json('places', "/maps/api/place/textsearch/json", params)
             
-            if response.status_code != 200:
-                return [f"Places API Error: HTTP {response.status_code}"]
+            if status_code != 200:
+                return [f"Places API Error: HTTP {status_code}"]
             
-            data = response.json()
             stores = []
             
             if "results" in data:
-                for store in data["results"][:2]:  # Get top 2 stores
+                for store in data["results"][:MAPS_CANDIDATE_STORES]:
                     store_info = {
                         "name": store.get("name", "Apple Store"),
                         "address": store.get("formatted_address", "Address not available"),
@@ -118,14 +150,37 @@ Return ONLY the structured location information, no additional text."""
         except Exception as e:
             return [f"Error finding stores: {str(e)}"]
     
-    def _get_transit_directions(self, origin: str, destination_store: dict) -> str:
-        """Get transit directions using Google Directions API"""
+    def _rank_stores_by_transit(self, origin: str, stores: list) -> list:
+        """
+        Fetch transit directions to all stores at once and order them by trip duration
+
+        Returns:
+            (store, directions) pairs; stores without a route come last
+        """
+        with ThreadPoolExecutor(max_workers=len(stores)) as executor:
+            routes = list(executor.map(lambda store: self._get_transit_directions(origin, store), stores))
+        ranked = list(zip(stores, routes))
+        ranked.sort(key=lambda pair: pair[1]['duration_s'] if isinstance(pair[1], dict) else float('inf'))
+        return ranked
+    
+    def _summarize_routes(self, ranked_routes: list) -> str:
+        """One line per store, nearest first, for the formatting prompt"""
+        lines = []
+        for i, (store, route) in enumerate(ranked_routes, 1):
+            line = f"{i}. {store['name']}, {store['address']} (rating {store['rating']})"
+            if isinstance(route, dict):
+                line += f": {route['duration']} by transit, {route['distance']}, {route['steps_count']} steps"
+            else:
+                line += f": {route}"
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def _get_transit_directions(self, origin: str, destination_store: dict):
+        """Get transit directions using Google Directions API (a dict on success, an error message otherwise)"""
         if not self.maps_api_key:
             return "Google Maps API key not configured"
         
         try:
-            url = "https://maps.googleapis.com/maps/api/directions/json"
-            
             destination = destination_store.get("address", destination_store.get("name", "Apple Store"))
             
             params = {
@@ -135,12 +190,10 @@ Return ONLY the structured location information, no additional text."""
                 "key": self.maps_api_key
             }
             
-            response = requests.get(url, params=params)
-            
-            if response.status_code != 200:
-                return f"Directions API Error: HTTP {response.status_code}"
+            status_code, data = get_json('directions', "/maps/api/directions/json", params)
             
-            data = response.json()
+            if status_code != 200:
+                return f"Directions API Error: HTTP {status_code}"
             
             if data["status"] != "OK":
                 return f"Directions not found: {data.get('status', 'Unknown error')}"
@@ -152,13 +205,14 @@ Return ONLY the structured location information, no additional text."""
                 
                 transit_info = {
                     "duration": leg["duration"]["text"],
+                    "duration_s": leg["duration"]["value"],
                     "distance": leg["distance"]["text"],
                     "start_address": leg["start_address"],
                     "end_address": leg["end_address"],
                     "steps_count": len(leg["steps"])
                 }
                 
-                return str(transit_info)
+                return transit_info
             else:
                 return "No transit routes found"
                 
@@ -1,7 +1,9 @@
 import streamlit as st
-import requests
 import os
 from snowflake_connection import call_cortex_complete
+from http_client import get_json
+from fused_answer import fuse_prompt, parse_fused_response
+from template_formatter import TEMPLATE_FORMATTING, format_news_result
 
 class NewsAgent:
     def __init__(self):
@@ -9,27 +11,41 @@ class NewsAgent:
         self.model = "mixtral-8x7b"
         self.icon = "📰"
         self.serpapi_key = os.getenv("SERPAPI_API_KEY")
+        # Calls made by retrieve(), charged as waste when a speculative retrieval is discarded
+        self.retrieval_cost = {'llm_calls': 1, 'api_calls': 1}
+        # Customer reply from the last fused call (None when the synthesizer must write it)
+        self.last_answer = None
         
-    def execute(self, user_query: str, show_backend: bool = False) -> str:
-        """Get latest iPhone news using SerpAPI"""
-        
-        if show_backend:
-            st.write(f"{self.icon} **{self.name}** (SerpAPI)")
-        else:
-            st.write(f"{self.icon} **{self.name}** (SerpAPI)")
-        
-        # Step 1: Extract search terms from user query
-        search_extraction_prompt = f"""You are a Search Query Specialist. Extract iPhone-related search keywords from this query.
+    def _search_extraction_prompt(self, user_query: str) -> str:
+        return f"""You are a Search Query Specialist. Extract iPhone-related search keywords from this query.
 
 User query: {user_query}
 
 Extract search terms for finding recent iPhone news and information.
 Return ONLY the search keywords, no additional text."""
-
-        search_terms = call_cortex_complete(search_extraction_prompt, self.model)
+        
+    def retrieve(self, user_query: str) -> tuple:
+        """Retrieval stage: search term extraction and SerpAPI fetch (no Streamlit calls)"""
+        # Step 1: Extract search terms from user query
+        search_terms = call_cortex_complete(self._search_extraction_prompt(user_query), self.model)
         
         # Step 2: Call SerpAPI for recent news
         news_data = self._fetch_news_from_serpapi(search_terms)
+        return search_terms, news_data
+        
+    def execute(self, user_query: str, show_backend: bool = False, retrieved: tuple = None, fused: bool = False) -> str:
+        """Get latest iPhone news using SerpAPI (fused: also write the customer reply in the same call)"""
+        self.last_answer = None
+        
+        if show_backend:
+            st.write(f"{self.icon} **{self.name}** (SerpAPI)")
+        else:
+            st.write(f"{self.icon} **{self.name}** (SerpAPI)")
+        
+        # Steps 1-2 may already have run speculatively while the router decided
+        search_terms, news_data = retrieved if retrieved is not None else self.retrieve(user_query)
+        search_extraction_prompt = self._search_extraction_prompt(user_query)
+        news_text = self._news_text(news_data)
         
         if show_backend:
             with st.expander("🔧 News Agent - Backend Process", expanded=False):
@@ -39,13 +55,22 @@ Return ONLY the search keywords, no additional text."""
                 st.write("**Step 2: SerpAPI Call**")
                 st.code(f"SerpAPI Query: iPhone {search_terms} news recent", language="text")
                 st.write("**Raw News Data:**")
-                st.text_area("SerpAPI Results:", str(news_data)[:500] + "..." if len(str(news_data)) > 500 else str(news_data), height=150)
+                st.text_area("SerpAPI Results:", news_text[:500] + "..." if len(news_text) > 500 else news_text, height=150)
+        
+        # Step 3: Render complete results with a template; only missing data needs the LLM
+        templated = format_news_result(search_terms, news_data) if TEMPLATE_FORMATTING else None
+        if templated is not None:
+            if show_backend:
+                with st.expander("🔧 News Agent - Step 3: Template Formatting", expanded=False):
+                    st.write("**Rendered from the SerpAPI results (no LLM call):**")
+                    st.text_area("News Analysis Output:", templated, height=200)
+            st.success(f"✅ {self.name} completed news analysis")
+            return templated
         
-        # Step 3: Analyze and structure the news data
         analysis_prompt = f"""You are an iPhone News Analyst. Analyze this news data and provide structured summary.
 
 Search query: {user_query}
-News data from web: {news_data}
+News data from web: {news_text}
 
 Provide structured news summary:
 - Latest Updates: [Recent iPhone developments from the data]
@@ -53,9 +78,13 @@ Provide structured news summary:
 - Source Summary: [Brief summary of news sources]
 
 Return ONLY the structured news summary, no additional text."""
+        if fused:
+            analysis_prompt = fuse_prompt(analysis_prompt, user_query)
 
         with st.spinner(f"{self.icon} News Agent analyzing latest information..."):
             news_result = call_cortex_complete(analysis_prompt, self.model)
+        if fused:
+            news_result, self.last_answer = parse_fused_response(news_result)
         
         if show_backend:
             with st.expander("🔧 News Agent - Backend Process", expanded=False):
@@ -63,12 +92,21 @@ Return ONLY the structured news summary, no additional text."""
                 st.code(analysis_prompt, language="text")
                 st.write("**Generated News Analysis:**")
                 st.text_area("News Analysis Output:", news_result, height=200)
+                if self.last_answer:
+                    st.write("**Customer Answer (same call):**")
+                    st.text_area("Fused Answer:", self.last_answer, height=150)
         
         st.success(f"✅ {self.name} completed news analysis")
         return news_result
     
-    def _fetch_news_from_serpapi(self, search_terms: str) -> str:
-        """Fetch news using SerpAPI"""
+    def _news_text(self, news_data) -> str:
+        """Results as one line per article for prompts and display"""
+        if isinstance(news_data, list):
+            return " | ".join(f"Title: {article['title']} - {article['snippet']}" for article in news_data)
+        return str(news_data)
+    
+    def _fetch_news_from_serpapi(self, search_terms: str):
+        """Fetch news using SerpAPI (a list of article dicts, or an error message)"""
         if not self.serpapi_key:
             return "SerpAPI key not configured"
         
@@ -85,21 +123,25 @@ Return ONLY the structured news summary, no additional text."""
                 "hl": "en"
             }
             
-            response = requests.get("https://serpapi.com/search", params=params)
+            status_code, data = get_json('news', "/search", params)
             
-            if response.status_code != 200:
-                return f"SerpAPI Error: HTTP {response.status_code}"
+            if status_code != 200:
+                return f"SerpAPI Error: HTTP {status_code}"
             
-            data = response.json()
-            news_snippets = []
+            articles = []
             
             # Extract news snippets
             if "organic_results" in data:
                 for result in data["organic_results"][:5]:
                     if "snippet" in result:
-                        news_snippets.append(f"Title: {result.get('title', 'No title')} - {result['snippet']}")
+                        articles.append({
+                            "title": result.get("title", "No title"),
+                            "snippet": result["snippet"],
+                            "source": result.get("source", ""),
+                            "date": result.get("date", "")
+                        })
             
-            return " | ".join(news_snippets) if news_snippets else "No recent news found"
+            return articles if articles else "No recent news found"
             
         except Exception as e:
             return f"Error fetching news: {str(e)}"
\ No newline at end of file
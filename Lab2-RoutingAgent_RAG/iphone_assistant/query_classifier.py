@@ -0,0 +1,239 @@
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Answer from the local classifier when it is confident, otherwise ask the router LLM
+LOCAL_ROUTER = os.getenv("ROUTER_LOCAL_CLASSIFIER", "true").lower() == "true"
+CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.4"))
+# Opt-in: LLM-routed queries are logged verbatim here and become training data
+DECISION_LOG_PATH = os.getenv("ROUTER_DECISION_LOG", "")
+# Once the log grows past this size its oldest half is dropped
+DECISION_LOG_MAX_BYTES = int(os.getenv("ROUTER_DECISION_LOG_MAX_BYTES", str(1024 * 1024)))
+# Every Nth logged decision is held out of training to measure agreement with the LLM
+HOLDOUT_EVERY = int(os.getenv("ROUTER_HOLDOUT_EVERY", "5"))
+
+HASH_BUCKETS = 2 ** 18
+
+# Labelled examples so the classifier works before any decisions are logged
+SEED_EXAMPLES = {
+    'RAG_AGENT': [
+        "What do customers say about iPhone 15 battery life?",
+        "Are there any camera quality issues with iPhone 15 Pro?",
+        "How good is the iPhone display according to reviews?",
+        "Do users complain about overheating?",
+        "Is the iPhone 16 worth buying, what are the pros and cons?",
+        "How is the performance and speed of the A17 chip for gaming?",
+        "What do reviewers think of Face ID and build quality?",
+        "Is the battery draining fast after a few months of use?",
+        "How does the iPhone camera perform in low light?",
+        "What are common problems people report with the iPhone?"
+    ],
+    'NEWS_AGENT': [
+        "What's the latest news about iPhone 17?",
+        "What are recent iPhone software updates?",
+        "When is the next iPhone release date?",
+        "Did Apple announce anything new at the event?",
+        "What new features are coming in iOS 19?",
+        "Any rumors about the foldable iPhone?",
+        "What was announced at WWDC this year?",
+        "Latest iPhone price changes and launch news",
+        "Has Apple released a new security update recently?",
+        "What is new with Apple this week?"
+    ],
+    'MAPS_AGENT': [
+        "How do I get to the Apple Store in Boston using public transport?",
+        "Where's the nearest Apple Store from Northeastern University?",
+        "What are the Apple Store hours in Cambridge?",
+        "Find an Apple Store near me",
+        "Directions to the closest Apple retail location",
+        "Which Apple Store is closest to downtown?",
+        "How far is the Apple Store from Back Bay station?",
+        "Is there an Apple Store open on Sunday near Boylston Street?",
+        "Where can I get my iPhone repaired in person nearby?",
+        "What's the best route by subway to an Apple Store?"
+    ]
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def _features(text: str) -> Counter:
+    """Hashed word unigrams, bigrams and character trigrams"""
+    words = TOKEN_PATTERN.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return Counter(zlib.crc32(gram.encode("utf-8")) % HASH_BUCKETS for gram in grams)
+
+def _normalize(vector: dict) -> dict:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {k: v / norm for k, v in vector.items()} if norm else vector
+
+class LocalQueryClassifier:
+    """TF-IDF weighted hashed n-grams with one centroid per tool"""
+
+    def __init__(self, examples: dict = None):
+        self.train(examples or SEED_EXAMPLES)
+
+    def train(self, examples: dict):
+        """Fit IDF weights and per-tool centroids from {tool: [queries]}"""
+        documents = [(label, _features(text)) for label, texts in examples.items() for text in texts]
+        df = Counter()
+        for _, features in documents:
+            df.update(features.keys())
+        total = len(documents)
+        self.idf = {bucket: math.log((1 + total) / (1 + count)) + 1 for bucket, count in df.items()}
+
+        centroids = {}
+        for label, features in documents:
+            centroid = centroids.setdefault(label, Counter())
+            for bucket, weight in self._vectorize(features).items():
+                centroid[bucket] += weight
+        self.centroids = {label: _normalize(centroid) for label, centroid in centroids.items()}
+
+    def _vectorize(self, features: Counter) -> dict:
+        # Unseen n-grams carry no information about any class
+        return _normalize({
+            bucket: (1 + math.log(count)) * self.idf[bucket]
+            for bucket, count in features.items() if bucket in self.idf
+        })
+
+    def predict(self, query: str) -> tuple:
+        """
+        Score a query against each tool centroid
+
+        Returns:
+            (tool, confidence, scores) where confidence is the relative margin
+            between the best and second-best cosine similarity
+        """
+        vector = self._vectorize(_features(query))
+        scores = {
+            label: sum(weight * centroid.get(bucket, 0.0) for bucket, weight in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+        ranked = sorted(scores.values(), reverse=True)
+        best = max(scores, key=scores.get)
+        top, second = ranked[0], ranked[1] if len(ranked) > 1 else 0.0
+        confidence = (top - second) / top if top > 0 else 0.0
+        return best, confidence, scores
+
+_log_lock = threading.Lock()
+
+def log_decision(query: str, tool: str, path: str = DECISION_LOG_PATH,
+                 max_bytes: int = DECISION_LOG_MAX_BYTES):
+    """Append an LLM router decision to the training log, if one is configured"""
+    if not path:
+        return
+    with _log_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({'query': query, 'tool': tool}) + "\n")
+        if max_bytes and os.path.getsize(path) > max_bytes:
+            _truncate_log(path)
+
+def _truncate_log(path: str):
+    """Keep only the newest half of the logged decisions"""
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines[len(lines) // 2:])
+
+def load_decisions(path: str = DECISION_LOG_PATH) -> list:
+    if not path or not os.path.exists(path):
+        return []
+    decisions = []
+    with _log_lock, open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('tool') in SEED_EXAMPLES:
+                decisions.append((record['query'], record['tool']))
+    return decisions
+
+def split_decisions(decisions: list, holdout_every: int = HOLDOUT_EVERY) -> tuple:
+    """(training, held_out) split of logged decisions"""
+    train = [d for i, d in enumerate(decisions) if (i + 1) % holdout_every]
+    held_out = [d for i, d in enumerate(decisions) if not (i + 1) % holdout_every]
+    return train, held_out
+
+def build_classifier(path: str = DECISION_LOG_PATH) -> LocalQueryClassifier:
+    """Train on the seed examples plus the training share of logged decisions"""
+    examples = {label: list(texts) for label, texts in SEED_EXAMPLES.items()}
+    train, _ = split_decisions(load_decisions(path))
+    for query, tool in train:
+        examples[tool].append(query)
+    return LocalQueryClassifier(examples)
+
+def evaluate_held_out(classifier: LocalQueryClassifier, threshold: float = CONFIDENCE_THRESHOLD,
+                      path: str = DECISION_LOG_PATH) -> dict:
+    """
+    Compare the classifier with logged LLM decisions it was not trained on
+
+    Returns:
+        Held-out size, share answered locally at the threshold, and agreement
+        with the LLM on those and on all held-out queries
+    """
+    _, held_out = split_decisions(load_decisions(path))
+    confident = agreed_confident = agreed_all = 0
+    for query, tool in held_out:
+        predicted, confidence, _ = classifier.predict(query)
+        agreed_all += predicted == tool
+        if confidence >= threshold:
+            confident += 1
+            agreed_confident += predicted == tool
+    size = len(held_out)
+    return {
+        'held_out': size,
+        'local_share': confident / size if size else 0.0,
+        'agreement_local': agreed_confident / confident if confident else None,
+        'agreement_all': agreed_all / size if size else None
+    }
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+def get_query_classifier() -> LocalQueryClassifier:
+    """Get the process-wide classifier, trained on first use"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = build_classifier()
+    return _classifier
+
+def retrain_query_classifier() -> LocalQueryClassifier:
+    """Rebuild the classifier to pick up newly logged decisions"""
+    global _classifier
+    classifier = build_classifier()
+    with _classifier_lock:
+        _classifier = classifier
+    return classifier
+
+_stats_lock = threading.Lock()
+ROUTER_STATS = {'decisions': 0, 'local': 0, 'llm': 0, 'deferred_agreed': 0}
+
+def record_routing(method: str, local_agreed: bool = False):
+    """Count a routing decision made locally or by the LLM"""
+    with _stats_lock:
+        ROUTER_STATS['decisions'] += 1
+        ROUTER_STATS[method] += 1
+        if method == 'llm' and local_agreed:
+            ROUTER_STATS['deferred_agreed'] += 1
+
+def get_router_stats() -> dict:
+    """Share of routing decisions that skipped the LLM"""
+    with _stats_lock:
+        stats = dict(ROUTER_STATS)
+    stats['local_share'] = stats['local'] / stats['decisions'] if stats['decisions'] else 0.0
+    # How often the low-confidence local guess matched the LLM anyway
+    stats['deferred_agreement'] = stats['deferred_agreed'] / stats['llm'] if stats['llm'] else None
+    return stats
@@ -1,35 +1,48 @@
 import streamlit as st
 from snowflake_connection import execute_rag_query, call_cortex_complete
+from fused_answer import fuse_prompt, parse_fused_response
 
 class RAGAgent:
     def __init__(self):
         self.name = "Review Analysis Specialist"
         self.model = "claude-3-5-sonnet"
         self.icon = "📊"
+        # Calls made by retrieve(), charged as waste when a speculative retrieval is discarded
+        self.retrieval_cost = {'llm_calls': 0, 'api_calls': 1}
+        # Customer reply from the last fused call (None when the synthesizer must write it)
+        self.last_answer = None
         
-    def execute(self, user_query: str, show_backend: bool = False) -> str:
-        """Execute RAG query on iPhone reviews"""
+    def retrieve(self, user_query: str) -> str:
+        """Retrieval stage: vector search over the reviews (no Streamlit calls)"""
+        return execute_rag_query(user_query)
         
-        # Step 1: Retrieve relevant reviews using vector similarity
-        retrieved_reviews = execute_rag_query(user_query)
+    def execute(self, user_query: str, show_backend: bool = False, retrieved: str = None, fused: bool = False) -> str:
+        """Execute RAG query on iPhone reviews (fused: also write the customer reply in the same call)"""
+        self.last_answer = None
+        
+        # Step 1: Retrieve relevant reviews using vector similarity (unless already fetched speculatively)
+        retrieved_reviews = retrieved if retrieved is not None else self.retrieve(user_query)
         
         if show_backend:
             st.write(f"{self.icon} **{self.name}** (RAG + Vector Search)")
             with st.expander("🔧 RAG Agent - Step 1: Vector Search", expanded=False):
-                st.write("**Query Embedding Process:**")
+                st.write("**Query Embedding Process:** (skipped when the vector is in the local embedding cache)")
                 st.code(f"SNOWFLAKE.CORTEX.EMBED_TEXT_1024('snowflake-arctic-embed-l-v2.0', '{user_query}')")
                 st.write("**Vector Similarity Query:**")
-                st.code(f"""
+                st.code("""
 WITH user_query AS (
-    SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_1024('snowflake-arctic-embed-l-v2.0', '{user_query}') as query_embedding
+    SELECT PARSE_JSON(:query_embedding)::ARRAY::VECTOR(FLOAT, 1024) as query_embedding
 ),
-relevant_reviews AS (
-    SELECT REVIEWTITLE, REVIEWDESCRIPTION, RATINGSCORE,
-           VECTOR_COSINE_SIMILARITY(REVIEW_EMBEDDINGS::VECTOR(FLOAT, 1024), query_embedding) AS similarity
+scored_reviews AS (
+    SELECT REVIEW_ID, REVIEWTITLE, RATINGSCORE,
+           VECTOR_COSINE_SIMILARITY(REVIEW_EMBEDDINGS::VECTOR(FLOAT, 1024), query_embedding) AS SIMILARITY,
+           REVIEWDESCRIPTION
     FROM LAB_DB.PUBLIC.IPHONE_TABLE
-    ORDER BY similarity DESC LIMIT 5
-)""", language="sql")
-                st.write("**Retrieved Reviews:**")
+)
+SELECT * FROM scored_reviews
+WHERE SIMILARITY > :min_score
+ORDER BY SIMILARITY DESC LIMIT :fetch_size""", language="sql")
+                st.write("**Retrieved Reviews:** (highest scores first, packed into the context token budget)")
                 st.text_area("Raw Retrieved Data:", retrieved_reviews[:500] + "..." if len(retrieved_reviews) > 500 else retrieved_reviews, height=150)
         else:
             st.write(f"{self.icon} **{self.name}** (RAG + Vector Search)")
@@ -48,9 +61,13 @@ Provide structured analysis:
 - Overall Rating Trend: [Rating pattern from reviews]
 
 Return ONLY the structured analysis, no additional text."""
+        if fused:
+            analysis_prompt = fuse_prompt(analysis_prompt, user_query)
 
         with st.spinner(f"{self.icon} RAG Agent analyzing reviews..."):
             analysis_result = call_cortex_complete(analysis_prompt, self.model)
+        if fused:
+            analysis_result, self.last_answer = parse_fused_response(analysis_result)
         
         if show_backend:
             with st.expander("🔧 RAG Agent - Step 2: Analysis Generation", expanded=False):
@@ -59,6 +76,9 @@ Return ONLY the structured analysis, no additional text."""
                 st.write("**Model Used:** claude-3-5-sonnet")
                 st.write("**Analysis Result:**")
                 st.text_area("Generated Analysis:", analysis_result, height=200)
+                if self.last_answer:
+                    st.write("**Customer Answer (same call):**")
+                    st.text_area("Fused Answer:", self.last_answer, height=150)
         
         st.success(f"✅ {self.name} completed RAG analysis")
         return analysis_result
\ No newline at end of file
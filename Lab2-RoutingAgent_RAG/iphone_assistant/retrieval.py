@@ -0,0 +1,53 @@
+import os
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Reviews fetched per RAG question and the prompt tokens they may fill
+RAG_FETCH_SIZE = int(os.getenv("RAG_FETCH_SIZE", "8"))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+
+# A review cut shorter than this is dropped instead of truncated
+MIN_PARTIAL_TOKENS = 30
+
+@dataclass
+class ReviewHit:
+    """One retrieved review with its similarity score"""
+
+    id: str
+    title: str
+    rating: int
+    score: float
+    text: str
+
+    def format(self, text: str = None) -> str:
+        return f"{self.title} (Rating: {self.rating}) - {self.text if text is None else text}"
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+def pack_context(hits: list, token_budget: int = RAG_CONTEXT_TOKENS, separator: str = " | ") -> str:
+    """
+    Join the best-scoring reviews until the token budget is full
+
+    The last review that does not fit whole is truncated if enough budget is
+    left for it to be useful; everything after it is dropped.
+    """
+    parts = []
+    remaining = token_budget
+    for hit in sorted(hits, key=lambda h: h.score, reverse=True):
+        entry = hit.format()
+        cost = estimate_tokens(entry) + (estimate_tokens(separator) if parts else 0)
+        if cost <= remaining:
+            parts.append(entry)
+            remaining -= cost
+            continue
+        prefix_tokens = estimate_tokens(hit.format(""))
+        room = remaining - prefix_tokens - (estimate_tokens(separator) if parts else 0)
+        if room >= MIN_PARTIAL_TOKENS:
+            parts.append(hit.format(hit.text[:room * 4].rsplit(" ", 1)[0] + "..."))
+        break
+    return separator.join(parts)
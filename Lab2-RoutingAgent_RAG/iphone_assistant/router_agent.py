@@ -1,14 +1,42 @@
 import streamlit as st
 from snowflake_connection import call_cortex_complete
+from query_classifier import (
+    LOCAL_ROUTER, CONFIDENCE_THRESHOLD, get_query_classifier, log_decision, record_routing
+)
 
 class RouterAgent:
-    def __init__(self):
+    def __init__(self, use_local: bool = LOCAL_ROUTER, threshold: float = CONFIDENCE_THRESHOLD):
         self.name = "Query Classification Specialist"
         self.model = "claude-3-5-sonnet"
+        # Confident local predictions skip the LLM call entirely
+        self.use_local = use_local
+        self.threshold = threshold
+        self.last_decision = {}
+        
+    def needs_llm(self, user_query: str) -> bool:
+        """Whether classify_query will have to ask the LLM for this query"""
+        if not self.use_local:
+            return True
+        _, confidence, _ = get_query_classifier().predict(user_query)
+        return confidence < self.threshold
         
     def classify_query(self, user_query: str, show_backend: bool = False) -> str:
         """Classify user query and route to appropriate tool"""
         
+        local_tool = None
+        if self.use_local:
+            local_tool, confidence, scores = get_query_classifier().predict(user_query)
+            self.last_decision = {'method': 'local', 'tool': local_tool, 'confidence': confidence, 'scores': scores}
+            if confidence >= self.threshold:
+                record_routing('local')
+                if show_backend:
+                    st.write("🔍 **Router Agent Classification**")
+                    with st.expander("Router Agent Backend", expanded=False):
+                        st.write("**Method:** local n-gram classifier (no LLM call)")
+                        st.write(f"**Confidence:** {confidence:.2f} (threshold {self.threshold})")
+                        st.write("**Centroid similarity:**", {tool: round(score, 3) for tool, score in scores.items()})
+                return local_tool
+        
         prompt = f"""You are a Query Classification Specialist for iPhone customer support.
 
 Available tools:
@@ -25,6 +53,9 @@ RAG_AGENT or NEWS_AGENT or MAPS_AGENT"""
             st.write("🔍 **Router Agent Classification**")
             with st.expander("Router Agent Backend", expanded=False):
                 st.write(f"**Model:** {self.model}")
+                if local_tool:
+                    st.write(f"**Local classifier:** {local_tool} at confidence "
+                             f"{self.last_decision['confidence']:.2f}, below {self.threshold}; asking the LLM")
                 st.code(prompt, language="text")
         
         with st.spinner("🔄 Router Agent analyzing query..."):
@@ -39,9 +70,15 @@ RAG_AGENT or NEWS_AGENT or MAPS_AGENT"""
         valid_tools = ['RAG_AGENT', 'NEWS_AGENT', 'MAPS_AGENT']
         
         if result in valid_tools:
+            # LLM decisions become training data for the local classifier
+            log_decision(user_query, result)
+            record_routing('llm', local_agreed=result == local_tool)
+            self.last_decision = {**self.last_decision, 'method': 'llm', 'tool': result}
             return result
         else:
             # Default fallback if router gives unexpected output
+            record_routing('llm')
+            self.last_decision = {**self.last_decision, 'method': 'llm', 'tool': 'RAG_AGENT'}
             return 'RAG_AGENT'
             
     def display_routing_decision(self, selected_tool: str):
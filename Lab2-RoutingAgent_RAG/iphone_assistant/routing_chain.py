@@ -3,22 +3,47 @@ from router_agent import RouterAgent
 from rag_agent import RAGAgent
 from news_agent import NewsAgent
 from map_agent import MapsAgent
-from snowflake_connection import call_cortex_complete
+from snowflake_connection import call_cortex_complete, get_query_embedding
+from speculative_tools import SPECULATIVE_TOOLS, SpeculativeRetrieval
+from answer_cache import get_answer_cache
+from fused_answer import FUSED_ANSWERS
+
+# Tool outputs and responses starting with these are failures and never cached
+UNCACHEABLE_PREFIXES = (
+    "Connection failed", "Error", "RAG query error", "SerpAPI", "Places API Error",
+    "Directions API Error", "Google Maps API key", "Tool not found"
+)
 
 class RoutingChain:
-    def __init__(self):
+    def __init__(self, speculative_tools: list = None, fused: bool = None):
         self.router = RouterAgent()
         self.tools = {
             'RAG_AGENT': RAGAgent(),
             'NEWS_AGENT': NewsAgent(), 
             'MAPS_AGENT': MapsAgent()
         }
+        # Tools whose retrieval runs concurrently with the router LLM call
+        self.speculative_tools = SPECULATIVE_TOOLS if speculative_tools is None else speculative_tools
+        # Tools write the customer reply themselves, skipping the synthesizer call
+        self.fused = FUSED_ANSWERS if fused is None else fused
         
     def execute_routing_chain(self, user_query: str, show_backend: bool = False):
         """Execute complete routing chain: Router -> Tool -> Synthesizer"""
         
         st.subheader("🔀 Routing Agent Workflow")
         
+        # Serve near-duplicate questions from the semantic answer cache
+        answer_cache = get_answer_cache()
+        query_vector = self._embed_for_cache(user_query) if answer_cache.enabled else None
+        cached = answer_cache.lookup(query_vector) if query_vector is not None else None
+        if cached:
+            return self._cached_result(cached, show_backend)
+        
+        # Speculatively start tool retrieval while the router LLM decides
+        speculation = SpeculativeRetrieval(self.tools, self.speculative_tools)
+        if speculation.enabled and self.router.needs_llm(user_query):
+            speculation.start(user_query)
+        
         # Step 1: Router classifies the query
         st.write("**Step 1: Query Classification**")
         selected_tool = self.router.classify_query(user_query, show_backend)
@@ -26,19 +51,63 @@ class RoutingChain:
         
         # Step 2: Execute the selected tool
         st.write("**Step 2: Specialized Tool Execution**")
+        retrieved = speculation.commit(selected_tool)
+        if retrieved is not None:
+            st.caption("⚡ Retrieval started speculatively while the router was deciding")
         if selected_tool in self.tools:
-            tool_output = self.tools[selected_tool].execute(user_query, show_backend)
+            tool = self.tools[selected_tool]
+            tool_output = tool.execute(user_query, show_backend, retrieved=retrieved, fused=self.fused)
+            fused_answer = tool.last_answer
         else:
             tool_output = "Tool not found"
+            fused_answer = None
             
-        # Step 3: Synthesize final response
+        # Step 3: Synthesize final response (already written by the tool in fused mode)
         st.write("**Step 3: Response Synthesis**")
-        final_response = self._synthesize_response(user_query, selected_tool, tool_output, show_backend)
+        if fused_answer:
+            st.caption("⚡ Answer written by the tool in the same call as its analysis")
+            final_response = fused_answer
+        else:
+            final_response = self._synthesize_response(user_query, selected_tool, tool_output, show_backend)
+        
+        if query_vector is not None and selected_tool in self.tools \
+                and not tool_output.startswith(UNCACHEABLE_PREFIXES) \
+                and not final_response.startswith(UNCACHEABLE_PREFIXES):
+            answer_cache.store(user_query, query_vector, selected_tool, tool_output, final_response)
         
         return {
             'selected_tool': selected_tool,
             'tool_output': tool_output,
-            'final_response': final_response
+            'final_response': final_response,
+            'speculative_retrieval': retrieved is not None,
+            'fused': bool(fused_answer),
+            'cached': False
+        }
+    
+    def _embed_for_cache(self, user_query: str):
+        """Query vector for the answer cache (shared with RAG retrieval via the embedding cache)"""
+        try:
+            return get_query_embedding(user_query)
+        except Exception:
+            return None
+    
+    def _cached_result(self, cached: dict, show_backend: bool = False):
+        """Show and return an answer served from the semantic cache"""
+        minutes = cached['age_s'] / 60
+        st.success(f"⚡ Answered from cache: similar to \"{cached['query']}\" "
+                   f"(similarity {cached['similarity']:.2f}, {minutes:.0f} min old)")
+        if show_backend:
+            with st.expander("🔧 Answer Cache - Backend Process", expanded=False):
+                st.write(f"**Original Tool:** {cached['selected_tool']}")
+                st.write(f"**TTL for this tool:** {get_answer_cache().ttl_for(cached['selected_tool']) / 60:.0f} min")
+                st.text_area("Cached Tool Output:", cached['tool_output'][:500], height=100)
+        return {
+            'selected_tool': cached['selected_tool'],
+            'tool_output': cached['tool_output'],
+            'final_response': cached['final_response'],
+            'speculative_retrieval': False,
+            'fused': False,
+            'cached': True
         }
     
     def _synthesize_response(self, user_query: str, selected_tool: str, tool_output: str, show_backend: bool = False):
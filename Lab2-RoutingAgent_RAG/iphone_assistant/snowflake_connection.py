@@ -1,10 +1,16 @@
 import snowflake.connector
+import json
 import os
 from dotenv import load_dotenv
+from embedding_cache import get_embedding_cache
+from vector_index import RETRIEVAL_BACKEND, ID_EXPRESSION, get_vector_index
+from retrieval import RAG_FETCH_SIZE, RAG_CONTEXT_TOKENS, ReviewHit, pack_context
 
 # Load environment variables
 load_dotenv()
 
+EMBED_MODEL = 'snowflake-arctic-embed-l-v2.0'
+
 def get_snowflake_connection():
     """Get Snowflake connection using PAT token"""
     try:
@@ -47,51 +53,127 @@ def call_cortex_complete(prompt: str, model: str = 'claude-3-5-sonnet') -> str:
     finally:
         conn.close()
 
-def execute_rag_query(query_text: str, similarity_threshold: float = 0.3) -> str:
-    """Execute RAG query on iPhone reviews table"""
-    conn = get_snowflake_connection()
+def _parse_vector(value) -> list:
+    """VECTOR results arrive as a list or as a JSON array string depending on the connector"""
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+def get_query_embedding(query_text: str, conn=None) -> list:
+    """Embed a query with EMBED_TEXT_1024, reusing the cached vector for repeated questions"""
+    cache = get_embedding_cache()
+    vector = cache.get(EMBED_MODEL, query_text)
+    if vector is not None:
+        return vector
+
+    own_conn = conn is None
+    conn = conn or get_snowflake_connection()
     if not conn:
-        return "Connection failed"
-    
+        raise ConnectionError("Connection failed")
     try:
         cursor = conn.cursor()
-        escaped_query = query_text.replace("'", "''")
-        
-        rag_query = f"""
+        cursor.execute(
+            "SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_1024(%s, %s) AS query_embedding",
+            (EMBED_MODEL, query_text)
+        )
+        vector = _parse_vector(cursor.fetchone()[0])
+    finally:
+        if own_conn:
+            conn.close()
+
+    cache.put(EMBED_MODEL, query_text, vector)
+    return vector
+
+def _search_local(query_embedding: list, fetch_size: int, min_score: float,
+                  min_rating: float, max_rating: float) -> list:
+    """Top-k reviews from the local vector index"""
+    index = get_vector_index()
+    mask = index.rating_mask(min_rating, max_rating)
+    matches = index.search(query_embedding, k=fetch_size, min_score=min_score, mask=mask)[0]
+    hits = []
+    for row, score in matches:
+        review = index.review(row)
+        hits.append(ReviewHit(review['id'], review['title'], review['rating'], score, review['text']))
+    return hits
+
+def _search_warehouse(conn, query_embedding: list, fetch_size: int, min_score: float,
+                      min_rating: float, max_rating: float) -> list:
+    """Top-k reviews from IPHONE_TABLE, filtering by rating before scoring"""
+    params = {'embedding': json.dumps(query_embedding), 'min_score': min_score, 'fetch_size': fetch_size}
+    filters = ""
+    if min_rating is not None:
+        filters += " AND RATINGSCORE >= %(min_rating)s"
+        params['min_rating'] = min_rating
+    if max_rating is not None:
+        filters += " AND RATINGSCORE <= %(max_rating)s"
+        params['max_rating'] = max_rating
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
         WITH user_query AS (
-            SELECT '{escaped_query}' as search_text,
-                   SNOWFLAKE.CORTEX.EMBED_TEXT_1024('snowflake-arctic-embed-l-v2.0', '{escaped_query}') as query_embedding
+            SELECT PARSE_JSON(%(embedding)s)::ARRAY::VECTOR(FLOAT, 1024) AS query_embedding
         ),
-        relevant_reviews AS (
+        scored_reviews AS (
             SELECT
+                {ID_EXPRESSION} AS REVIEW_ID,
                 REVIEWTITLE,
-                REVIEWDESCRIPTION,
                 RATINGSCORE,
-                VECTOR_COSINE_SIMILARITY(
-                    REVIEW_EMBEDDINGS::VECTOR(FLOAT, 1024),
-                    uq.query_embedding
-                ) AS similarity_score
+                VECTOR_COSINE_SIMILARITY(REVIEW_EMBEDDINGS::VECTOR(FLOAT, 1024), uq.query_embedding) AS SIMILARITY,
+                REVIEWDESCRIPTION
             FROM LAB_DB.PUBLIC.IPHONE_TABLE it
             CROSS JOIN user_query uq
-            WHERE REVIEW_EMBEDDINGS IS NOT NULL
-              AND VECTOR_COSINE_SIMILARITY(REVIEW_EMBEDDINGS::VECTOR(FLOAT, 1024), uq.query_embedding) > {similarity_threshold}
-            ORDER BY similarity_score DESC
-            LIMIT 5
+            WHERE REVIEW_EMBEDDINGS IS NOT NULL{filters}
         )
-        SELECT 
-            LISTAGG(REVIEWTITLE || ' (Rating: ' || RATINGSCORE || ') - ' || REVIEWDESCRIPTION, ' | ') 
-            WITHIN GROUP (ORDER BY similarity_score DESC) as retrieved_reviews
-        FROM relevant_reviews
-        """
-        
-        cursor.execute(rag_query)
-        result = cursor.fetchone()
-        return result[0] if result and result[0] else "No relevant reviews found"
-    except Exception as e:
-        return f"RAG query error: {e}"
+        SELECT REVIEW_ID, REVIEWTITLE, RATINGSCORE, SIMILARITY, REVIEWDESCRIPTION
+        FROM scored_reviews
+        WHERE SIMILARITY > %(min_score)s
+        ORDER BY SIMILARITY DESC
+        LIMIT %(fetch_size)s
+    """, params)
+    return [
+        ReviewHit(str(review_id), title, rating, float(score), text)
+        for review_id, title, rating, score, text in cursor.fetchall()
+    ]
+
+def search_reviews(query_text: str, fetch_size: int = RAG_FETCH_SIZE, min_score: float = 0.3,
+                   min_rating: float = None, max_rating: float = None) -> list:
+    """
+    Retrieve the reviews most similar to a query
+
+    Args:
+        query_text: Question to embed
+        fetch_size: Maximum number of reviews returned
+        min_score: Minimum cosine similarity
+        min_rating, max_rating: Optional inclusive rating range
+
+    Returns:
+        ReviewHit rows in descending similarity order
+    """
+    if RETRIEVAL_BACKEND == "local" and get_vector_index().available:
+        # The warehouse is only touched on an embedding cache miss
+        query_embedding = get_query_embedding(query_text)
+        return _search_local(query_embedding, fetch_size, min_score, min_rating, max_rating)
+
+    conn = get_snowflake_connection()
+    if not conn:
+        raise ConnectionError("Connection failed")
+    try:
+        # Step 1: query vector (cached locally, so repeat questions skip EMBED_TEXT_1024)
+        query_embedding = get_query_embedding(query_text, conn)
+        # Step 2: similarity search with the vector as a bound parameter
+        return _search_warehouse(conn, query_embedding, fetch_size, min_score, min_rating, max_rating)
     finally:
         conn.close()
 
+def execute_rag_query(query_text: str, similarity_threshold: float = 0.3,
+                      token_budget: int = RAG_CONTEXT_TOKENS) -> str:
+    """Execute RAG query on iPhone reviews table, packing the best reviews into a token budget"""
+    try:
+        hits = search_reviews(query_text, min_score=similarity_threshold)
+    except ConnectionError:
+        return "Connection failed"
+    except Exception as e:
+        return f"RAG query error: {e}"
+    return pack_context(hits, token_budget) or "No relevant reviews found"
+
 def test_connection():
     """Test Snowflake connection"""
     conn = get_snowflake_connection()
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Tools whose retrieval stage starts while the router is still deciding, e.g. "RAG_AGENT,MAPS_AGENT".
+# Empty disables speculation; enable a tool only when its saved latency is worth the wasted calls.
+SPECULATIVE_TOOLS = [
+    tool.strip().upper() for tool in os.getenv("SPECULATIVE_TOOLS", "").split(",") if tool.strip()
+]
+
+_stats_lock = threading.Lock()
+SPECULATION_STATS = {}
+
+def _tool_stats(tool: str) -> dict:
+    return SPECULATION_STATS.setdefault(tool, {
+        'started': 0, 'committed': 0, 'discarded': 0,
+        'saved_s': 0.0, 'wasted_s': 0.0, 'wasted_llm_calls': 0, 'wasted_api_calls': 0
+    })
+
+class SpeculativeRetrieval:
+    """Runs the retrieval stage of several tools while the router decides, keeping only the chosen one"""
+
+    def __init__(self, tools: dict, enabled: list = None):
+        self.tools = tools
+        self.enabled = [name for name in (SPECULATIVE_TOOLS if enabled is None else enabled) if name in tools]
+        self.executor = None
+        self.futures = {}
+        self.timings = {}
+
+    def _timed(self, name: str, user_query: str):
+        start = time.time()
+        try:
+            return self.tools[name].retrieve(user_query)
+        finally:
+            self.timings[name] = (start, time.time())
+
+    def start(self, user_query: str):
+        """Launch retrieval for every enabled tool"""
+        if not self.enabled:
+            return
+        self.executor = ThreadPoolExecutor(max_workers=len(self.enabled))
+        for name in self.enabled:
+            self.futures[name] = self.executor.submit(self._timed, name, user_query)
+        with _stats_lock:
+            for name in self.enabled:
+                _tool_stats(name)['started'] += 1
+
+    def commit(self, selected_tool: str):
+        """
+        Keep the selected tool's retrieval and discard the rest
+
+        Returns:
+            The retrieved data, or None when the tool was not speculated or its retrieval failed
+        """
+        if not self.futures:
+            return None
+        decided = time.time()
+        retrieved = None
+        future = self.futures.pop(selected_tool, None)
+        if future is not None:
+            try:
+                retrieved = future.result()
+            except Exception:
+                retrieved = None
+            start, end = self.timings[selected_tool]
+            # Without speculation the whole retrieval would have started after the decision
+            saved = (end - start) - max(0.0, end - decided)
+            with _stats_lock:
+                stats = _tool_stats(selected_tool)
+                stats['committed'] += 1
+                stats['saved_s'] += saved
+
+        for name, future in self.futures.items():
+            if future.cancel():
+                self._discard(name, ran=False)
+            else:
+                future.add_done_callback(lambda _, name=name: self._discard(name))
+        self.futures = {}
+        # Discarded retrievals finish in the background; their results are ignored
+        self.executor.shutdown(wait=False)
+        return retrieved
+
+    def _discard(self, name: str, ran: bool = True):
+        with _stats_lock:
+            stats = _tool_stats(name)
+            stats['discarded'] += 1
+            if not ran:
+                return
+            start, end = self.timings[name]
+            cost = getattr(self.tools[name], 'retrieval_cost', {})
+            stats['wasted_s'] += end - start
+            stats['wasted_llm_calls'] += cost.get('llm_calls', 0)
+            stats['wasted_api_calls'] += cost.get('api_calls', 0)
+
+def get_speculation_stats() -> dict:
+    """Per-tool saved latency and wasted work from speculative retrieval"""
+    with _stats_lock:
+        stats = {tool: dict(values) for tool, values in SPECULATION_STATS.items()}
+    for values in stats.values():
+        values['avg_saved_s'] = values['saved_s'] / values['committed'] if values['committed'] else 0.0
+        values['avg_wasted_s'] = values['wasted_s'] / values['discarded'] if values['discarded'] else 0.0
+    return stats
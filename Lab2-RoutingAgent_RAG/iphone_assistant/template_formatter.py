@@ -0,0 +1,62 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Render complete Maps/News API results with templates instead of an LLM formatting call
+TEMPLATE_FORMATTING = os.getenv("TEMPLATE_FORMATTING", "true").lower() == "true"
+
+ROUTE_FIELDS = ('duration', 'distance', 'start_address', 'end_address', 'steps_count')
+
+def format_maps_result(origin: str, ranked_routes: list):
+    """
+    Structured location answer from stores ranked by transit time
+
+    Returns None when the nearest store has no usable route, so the caller
+    falls back to the LLM formatter.
+    """
+    if not ranked_routes:
+        return None
+    store, route = ranked_routes[0]
+    if not isinstance(route, dict) or any(not route.get(field) for field in ROUTE_FIELDS):
+        return None
+    if not store.get('name') or not store.get('address'):
+        return None
+
+    alternatives = [
+        f"{other['name']} ({other_route['duration']})"
+        for other, other_route in ranked_routes[1:3] if isinstance(other_route, dict)
+    ]
+    rating = f", rated {store['rating']}" if isinstance(store.get('rating'), (int, float)) else ""
+    lines = [
+        f"- Store Location: {store['name']}, {store['address']}{rating}",
+        f"- Transit Directions: {route['steps_count']}-step public transit route from "
+        f"{route['start_address']} to {route['end_address']}",
+        f"- Travel Time: {route['duration']} by public transit ({route['distance']})",
+        "- Additional Info: Check the store's hours before you go"
+        + (f"; other nearby stores: {', '.join(alternatives)}" if alternatives else "")
+    ]
+    return "\n".join(lines)
+
+def format_news_result(search_terms: str, articles: list):
+    """
+    Structured news summary from SerpAPI results
+
+    Returns None when there are no results or any result lacks a title or
+    snippet, so the caller falls back to the LLM formatter.
+    """
+    if not isinstance(articles, list) or not articles:
+        return None
+    if any(not article.get('title') or not article.get('snippet') for article in articles):
+        return None
+
+    sources = sorted({article['source'] for article in articles if article.get('source')})
+    lines = ["- Latest Updates: " + "; ".join(article['title'] for article in articles[:3])]
+    lines.append("- Key Information:")
+    for article in articles:
+        date = f" ({article['date']})" if article.get('date') else ""
+        lines.append(f"  - {article['title']}{date}: {article['snippet']}")
+    lines.append(f"- Source Summary: {len(articles)} web results for \"{search_terms.strip()}\""
+                 + (f" from {', '.join(sources)}" if sources else ""))
+    return "\n".join(lines)
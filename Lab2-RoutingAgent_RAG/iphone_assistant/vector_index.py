@@ -0,0 +1,306 @@
+"""
+Local copy of IPHONE_TABLE review embeddings for warehouse-free retrieval
+
+The sync job exports REVIEW_EMBEDDINGS and review metadata into a float32
+matrix stored as a memory-mapped .npy file (rows L2-normalized, so cosine
+similarity is a dot product). When a watermark column is configured, later
+syncs fetch only rows past the stored watermark:
+
+    python vector_index.py --sync           # incremental (full on first run)
+    python vector_index.py --sync --full    # re-export everything
+
+Incremental syncs need VECTOR_INDEX_ID_COLUMN to name a real key column, so a
+re-exported (edited) review replaces its old copy; reviews deleted from the
+table are pruned by comparing the index against the table's current ids.
+"""
+import argparse
+import json
+import os
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# "local" answers RAG retrieval from the index below; "warehouse" runs the similarity scan in Snowflake
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "warehouse").lower()
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", ".vector_index")
+# Monotonic column (e.g. a load timestamp) for incremental syncs; empty re-exports the table each sync
+WATERMARK_COLUMN = os.getenv("VECTOR_INDEX_WATERMARK_COLUMN", "")
+# Key column of the review table; required with a watermark column, because a content
+# hash changes when a review is edited and the old copy would never be replaced
+ID_COLUMN = os.getenv("VECTOR_INDEX_ID_COLUMN", "")
+# Without a watermark every sync re-exports the table, so a content hash is enough
+ID_EXPRESSION = ID_COLUMN or "SHA1(REVIEWTITLE || '|' || REVIEWDESCRIPTION)"
+# Coarse IVF partitions (0 = exact search) and how many of them each query probes
+IVF_LISTS = int(os.getenv("VECTOR_INDEX_IVF_LISTS", "0"))
+IVF_PROBES = int(os.getenv("VECTOR_INDEX_IVF_PROBES", "4"))
+
+DIMENSIONS = 1024
+FETCH_BATCH = 1000
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+def _kmeans(vectors: np.ndarray, lists: int, iterations: int = 10, seed: int = 0) -> tuple:
+    """Spherical k-means returning (centroids, assignment per row)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(lists):
+            members = vectors[assignments == i]
+            if len(members):
+                centroids[i] = members.sum(axis=0)
+        centroids = _normalize_rows(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+class LocalVectorIndex:
+    """Memory-mapped review embeddings with exact or IVF top-k search"""
+
+    def __init__(self, directory: str = VECTOR_INDEX_DIR):
+        self.directory = directory
+        self.vectors = None
+        self.metadata = {'ids': [], 'titles': [], 'ratings': [], 'texts': []}
+        self.state = {'watermark': None, 'rows': 0}
+        self.centroids = None
+        self.assignments = None
+        self.load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def available(self) -> bool:
+        return self.vectors is not None and len(self.vectors) > 0
+
+    def load(self):
+        """Map the index files written by the last sync"""
+        if not os.path.exists(self._path("state.json")):
+            return
+        with open(self._path("state.json"), encoding="utf-8") as f:
+            self.state = json.load(f)
+        with open(self._path("metadata.json"), encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.vectors = np.load(self._path("embeddings.npy"), mmap_mode="r")
+        if os.path.exists(self._path("ivf_centroids.npy")) and self.state.get('ivf_lists'):
+            self.centroids = np.load(self._path("ivf_centroids.npy"))
+            self.assignments = np.load(self._path("ivf_assignments.npy"))
+        else:
+            self.centroids = self.assignments = None
+
+    def _save(self, vectors: np.ndarray, metadata: dict, state: dict, ivf_lists: int):
+        """Write new files beside the old ones and swap them in, so readers never see a partial index"""
+        os.makedirs(self.directory, exist_ok=True)
+        np.save(self._path("embeddings.tmp.npy"), vectors)
+        with open(self._path("metadata.tmp.json"), "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+
+        state['ivf_lists'] = 0
+        if ivf_lists and len(vectors) >= ivf_lists * 4:
+            centroids, assignments = _kmeans(vectors, ivf_lists)
+            np.save(self._path("ivf_centroids.tmp.npy"), centroids)
+            np.save(self._path("ivf_assignments.tmp.npy"), assignments)
+            os.replace(self._path("ivf_centroids.tmp.npy"), self._path("ivf_centroids.npy"))
+            os.replace(self._path("ivf_assignments.tmp.npy"), self._path("ivf_assignments.npy"))
+            state['ivf_lists'] = ivf_lists
+
+        os.replace(self._path("embeddings.tmp.npy"), self._path("embeddings.npy"))
+        os.replace(self._path("metadata.tmp.json"), self._path("metadata.json"))
+        with open(self._path("state.tmp.json"), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(self._path("state.tmp.json"), self._path("state.json"))
+        self.load()
+
+    def sync(self, conn, full: bool = False, watermark_column: str = WATERMARK_COLUMN,
+             ivf_lists: int = IVF_LISTS, id_column: str = ID_COLUMN) -> dict:
+        """
+        Export new review embeddings from Snowflake into the local index
+
+        Returns:
+            Rows fetched, rows pruned, rows in the index and the new watermark
+        """
+        if watermark_column and not id_column:
+            raise ValueError("Incremental syncs need VECTOR_INDEX_ID_COLUMN set to the review table's key column")
+        incremental = bool(watermark_column) and not full and self.available
+        watermark_select = f", {watermark_column} AS WATERMARK" if watermark_column else ", NULL AS WATERMARK"
+        where = "WHERE REVIEW_EMBEDDINGS IS NOT NULL"
+        params = {}
+        if incremental and self.state.get('watermark') is not None:
+            where += f" AND {watermark_column} > %(watermark)s"
+            params['watermark'] = self.state['watermark']
+        order = f"ORDER BY {watermark_column}" if watermark_column else ""
+
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {id_column or ID_EXPRESSION} AS REVIEW_ID, REVIEWTITLE, RATINGSCORE, REVIEWDESCRIPTION,
+                   REVIEW_EMBEDDINGS::VECTOR(FLOAT, {DIMENSIONS}) AS EMBEDDING{watermark_select}
+            FROM LAB_DB.PUBLIC.IPHONE_TABLE
+            {where}
+            {order}
+        """, params or None)
+
+        ids, titles, ratings, texts, batches = [], [], [], [], []
+        watermark = self.state.get('watermark') if incremental else None
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            vectors = []
+            for review_id, title, rating, text, embedding, row_watermark in rows:
+                ids.append(str(review_id))
+                titles.append(title)
+                ratings.append(rating)
+                texts.append(text)
+                vectors.append(json.loads(embedding) if isinstance(embedding, str) else embedding)
+                if row_watermark is not None:
+                    watermark = str(row_watermark)
+            batches.append(_normalize_rows(np.asarray(vectors, dtype=np.float32)))
+        fetched = np.concatenate(batches) if batches else np.zeros((0, DIMENSIONS), dtype=np.float32)
+
+        pruned = 0
+        if incremental:
+            # Rows re-exported under an existing id replace the old copy, and ids no
+            # longer in the table (deleted reviews) are dropped
+            replaced = set(ids)
+            current = self._current_ids(conn, id_column)
+            keep = [i for i, review_id in enumerate(self.metadata['ids'])
+                    if review_id not in replaced and review_id in current]
+            pruned = len(self.metadata['ids']) - len(keep) - len(replaced & set(self.metadata['ids']))
+            vectors = np.concatenate([np.asarray(self.vectors)[keep], fetched])
+            metadata = {key: [values[i] for i in keep] for key, values in self.metadata.items()}
+        else:
+            vectors = fetched
+            metadata = {key: [] for key in self.metadata}
+        for key, values in (('ids', ids), ('titles', titles), ('ratings', ratings), ('texts', texts)):
+            metadata[key].extend(values)
+
+        if incremental and not ids and not pruned:
+            return {'fetched': 0, 'pruned': 0, 'rows': len(self.vectors), 'watermark': watermark}
+        self._save(vectors, metadata, {'watermark': watermark, 'rows': len(vectors)}, ivf_lists)
+        return {'fetched': len(ids), 'pruned': pruned, 'rows': len(vectors), 'watermark': watermark}
+
+    @staticmethod
+    def _current_ids(conn, id_column: str) -> set:
+        """Ids of every review with an embedding (a key-only scan)"""
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {id_column} AS REVIEW_ID
+            FROM LAB_DB.PUBLIC.IPHONE_TABLE
+            WHERE REVIEW_EMBEDDINGS IS NOT NULL
+        """)
+        current = set()
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                return current
+            current.update(str(row[0]) for row in rows)
+
+    def _candidates(self, query: np.ndarray, probes: int):
+        """Row indices in the IVF lists closest to the query"""
+        nearest = np.argsort(self.centroids @ query)[::-1][:probes]
+        return np.flatnonzero(np.isin(self.assignments, nearest))
+
+    def rating_mask(self, min_rating: float = None, max_rating: float = None):
+        """Boolean row filter for a rating range, or None when unfiltered"""
+        if min_rating is None and max_rating is None:
+            return None
+        ratings = np.asarray([np.nan if r is None else float(r) for r in self.metadata['ratings']])
+        mask = ~np.isnan(ratings)
+        if min_rating is not None:
+            mask &= ratings >= min_rating
+        if max_rating is not None:
+            mask &= ratings <= max_rating
+        return mask
+
+    def search(self, query_vectors, k: int = 5, min_score: float = None, probes: int = IVF_PROBES,
+               mask=None) -> list:
+        """
+        Top-k reviews for one or more query vectors
+
+        Args:
+            query_vectors: A single vector or a (queries x dimensions) batch
+            k: Results per query
+            min_score: Drop results with cosine similarity at or below this value
+            mask: Optional boolean array selecting the rows that may be returned
+
+        Returns:
+            Per query, a list of (row, score) pairs in descending score order
+        """
+        queries = _normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        if not self.available:
+            return [[] for _ in queries]
+
+        results = []
+        if self.centroids is None:
+            rows = np.arange(len(self.vectors)) if mask is None else np.flatnonzero(mask)
+            vectors = np.asarray(self.vectors) if mask is None else np.asarray(self.vectors[rows])
+            # One matmul scores every query against every review
+            scores = queries @ vectors.T
+            for row_scores in scores:
+                results.append(self._top_k(rows, row_scores, k, min_score))
+        else:
+            for query in queries:
+                rows = self._candidates(query, probes)
+                if mask is not None:
+                    rows = rows[mask[rows]]
+                results.append(self._top_k(rows, np.asarray(self.vectors[rows]) @ query, k, min_score))
+        return results
+
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int, min_score: float) -> list:
+        if len(scores) > k:
+            best = np.argpartition(-scores, k)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return [
+            (int(rows[i]), float(scores[i])) for i in best
+            if min_score is None or scores[i] > min_score
+        ]
+
+    def review(self, row: int) -> dict:
+        return {key[:-1]: self.metadata[key][row] for key in ('ids', 'titles', 'ratings', 'texts')}
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_vector_index() -> LocalVectorIndex:
+    """Get the process-wide local vector index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LocalVectorIndex()
+    return _index
+
+if __name__ == "__main__":
+    from snowflake_connection import get_snowflake_connection
+
+    parser = argparse.ArgumentParser(description="Sync IPHONE_TABLE review embeddings into the local vector index")
+    parser.add_argument("--sync", action="store_true", help="Fetch new rows from Snowflake")
+    parser.add_argument("--full", action="store_true", help="Re-export every row instead of rows past the watermark")
+    args = parser.parse_args()
+
+    if args.sync and WATERMARK_COLUMN and not ID_COLUMN:
+        raise SystemExit("Set VECTOR_INDEX_ID_COLUMN to the review table's key column for incremental syncs")
+
+    index = get_vector_index()
+    if args.sync:
+        conn = get_snowflake_connection()
+        if not conn:
+            raise SystemExit("Connection failed")
+        try:
+            result = index.sync(conn, full=args.full)
+            print(result)
+        finally:
+            conn.close()
+        if result['fetched'] or result.get('pruned'):
+            # New, changed or deleted reviews make cached review analyses stale
+            from answer_cache import get_answer_cache
+            print(f"Invalidated {get_answer_cache().invalidate('RAG_AGENT')} cached review answers")
+    print(f"{index.state.get('rows', 0)} reviews indexed in {index.directory} "
+          f"(watermark {index.state.get('watermark')}, IVF lists {index.state.get('ivf_lists', 0)})")
@@ -1,5 +1,6 @@
+import asyncio
 import streamlit as st
-from utils.snowflake_connection import execute_feature_search, call_cortex_complete
+from utils.snowflake_connection import execute_feature_search, call_cortex_complete, acall_cortex_complete
 
 class FeatureAgent:
     def __init__(self):
@@ -7,20 +8,9 @@ class FeatureAgent:
         self.icon = "🔍"
         self.model = "claude-3-5-sonnet"
         
-    def execute(self, user_query: str, show_backend: bool = False) -> str:
-        """Extract features using RAG vector search"""
-        
-        if show_backend:
-            with st.expander("🔧 Feature Agent - Backend Process", expanded=False):
-                st.write("**Method:** Vector Similarity Search")
-                st.write("**Search Query:**")
-                st.code(f"Extract iPhone features mentioned in: {user_query}", language="text")
-        
-        # Use vector search to find feature-related reviews
-        feature_reviews = execute_feature_search(user_query)
-        
+    def _extraction_prompt(self, feature_reviews: str, user_query: str) -> str:
         # Extract and categorize features using LLM
-        extraction_prompt = f"""You are a Feature Extraction Specialist. Analyze these iPhone reviews and extract mentioned features.
+        return f"""You are a Feature Extraction Specialist. Analyze these iPhone reviews and extract mentioned features.
 
 Reviews: {feature_reviews}
 
@@ -34,16 +24,52 @@ Extract and categorize features mentioned:
 - Design: [What customers say about physical design]
 
 Return ONLY the structured feature analysis, no additional text."""
-
+    
+    def _show_search(self, user_query: str):
+        with st.expander("🔧 Feature Agent - Backend Process", expanded=False):
+            st.write("**Method:** Vector Similarity Search")
+            st.write("**Search Query:**")
+            st.code(f"Extract iPhone features mentioned in: {user_query}", language="text")
+    
+    def _show_extraction(self, feature_reviews: str, extraction_prompt: str, result: str):
+        with st.expander("🔧 Feature Agent - Backend Process", expanded=False):
+            st.write("**Retrieved Reviews:**")
+            st.text_area("Review Data:", feature_reviews[:300] + "...", height=100)
+            st.write("**Extraction Prompt:**")
+            st.code(extraction_prompt, language="text")
+            st.write("**Feature Analysis:**")
+            st.text_area("Extracted Features:", result, height=150)
+    
+    def execute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """Extract features using RAG vector search"""
+        
+        if show_backend:
+            self._show_search(user_query)
+        
+        # Use vector search to find feature-related reviews
+        # The shared query understanding stage already embedded the query
+        query_embedding = understanding.embedding if understanding else None
+        feature_reviews = execute_feature_search(user_query, query_embedding=query_embedding)
+        
+        extraction_prompt = self._extraction_prompt(feature_reviews, user_query)
         result = call_cortex_complete(extraction_prompt, self.model)
         
         if show_backend:
-            with st.expander("🔧 Feature Agent - Backend Process", expanded=False):
-                st.write("**Retrieved Reviews:**")
-                st.text_area("Review Data:", feature_reviews[:300] + "...", height=100)
-                st.write("**Extraction Prompt:**")
-                st.code(extraction_prompt, language="text")
-                st.write("**Feature Analysis:**")
-                st.text_area("Extracted Features:", result, height=150)
-        
-        return result
\ No newline at end of file
+            self._show_extraction(feature_reviews, extraction_prompt, result)
+        
+        return result
+    
+    async def aexecute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """execute() on the event loop; the vector search runs in a worker thread"""
+        
+        query_embedding = understanding.embedding if understanding else None
+        feature_reviews = await asyncio.to_thread(execute_feature_search, user_query, query_embedding=query_embedding)
+        
+        extraction_prompt = self._extraction_prompt(feature_reviews, user_query)
+        result = await acall_cortex_complete(extraction_prompt, self.model)
+        
+        if show_backend:
+            self._show_search(user_query)
+            self._show_extraction(feature_reviews, extraction_prompt, result)
+        
+        return result
@@ -1,7 +1,8 @@
 import streamlit as st
+import asyncio
 import requests
 import os
-from utils.snowflake_connection import call_cortex_complete
+from utils.snowflake_connection import call_cortex_complete, acall_cortex_complete
 
 class NewsAgent:
     def __init__(self):
@@ -9,12 +10,12 @@ class NewsAgent:
         self.icon = "📰"
         self.model = "mixtral-8x7b"
         self.serpapi_key = os.getenv("SERPAPI_API_KEY")
+        self.serpapi_base_url = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com").rstrip("/")
+        self.timeout = float(os.getenv("SERPAPI_TIMEOUT_S", "10"))
         
-    def execute(self, user_query: str, show_backend: bool = False) -> str:
-        """Fetch recent iPhone news using SerpAPI"""
-        
+    def _search_prompt(self, user_query: str) -> str:
         # Extract focused search terms (2-3 keywords max)
-        search_prompt = f"""Extract 2-3 core search phrases only.
+        return f"""Extract 2-3 core search phrases only.
 
 User query: {user_query}
 
@@ -22,41 +23,73 @@ Return ONLY 2-3 main key phrases separated by spaces. Be concise.
 Example: "phone camera quality" or "phone battery life"
 
 Your output:"""
+    
+    def _analysis_prompt(self, news_data: str, user_query: str) -> str:
+        return f"""Summarize this iPhone news briefly.
+
+News data: {news_data}
+User query: {user_query}
+
+Provide concise summary:
+- Recent Updates: [Key news points]
+- Relevance: [Connection to user query]
+
+Return ONLY the summary, no additional text."""
+    
+    def _show_search(self, search_terms: str):
+        with st.expander("🔧 News Agent - Backend Process", expanded=False):
+            st.write("**Step 1: Search Term Extraction**")
+            st.write(f"Extracted terms: {search_terms}")
+            st.write("**Step 2: SerpAPI Call**")
+            st.code(f"Query: iPhone {search_terms} news")
+    
+    def _show_analysis(self, news_data: str, result: str):
+        with st.expander("🔧 News Agent - Backend Process", expanded=False):
+            st.write("**Raw News Data:**")
+            st.text_area("SerpAPI Results:", news_data[:300] + "...", height=100)
+            st.write("**News Analysis:**")
+            st.text_area("Analysis:", result, height=150)
+    
+    def execute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """Fetch recent iPhone news using SerpAPI"""
         
-        search_terms = call_cortex_complete(search_prompt, self.model)
+        if understanding and understanding.news_phrases:
+            search_terms = understanding.news_phrases
+        else:
+            search_terms = call_cortex_complete(self._search_prompt(user_query), self.model)
         # Limit to 50 characters and strip whitespace
         search_terms = search_terms.strip()[:50]
         
         if show_backend:
-            with st.expander("🔧 News Agent - Backend Process", expanded=False):
-                st.write("**Step 1: Search Term Extraction**")
-                st.write(f"Extracted terms: {search_terms}")
-                st.write("**Step 2: SerpAPI Call**")
-                st.code(f"Query: iPhone {search_terms} news")
+            self._show_search(search_terms)
         
         # Fetch news from SerpAPI
         news_data = self._fetch_news(search_terms)
         
         # Analyze news with LLM
-        analysis_prompt = f"""Summarize this iPhone news briefly.
-
-News data: {news_data}
-User query: {user_query}
-
-Provide concise summary:
-- Recent Updates: [Key news points]
-- Relevance: [Connection to user query]
-
-Return ONLY the summary, no additional text."""
-
-        result = call_cortex_complete(analysis_prompt, self.model)
+        result = call_cortex_complete(self._analysis_prompt(news_data, user_query), self.model)
+        
+        if show_backend:
+            self._show_analysis(news_data, result)
+        
+        return result
+    
+    async def aexecute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """execute() on the event loop; the SerpAPI request runs in a worker thread"""
+        
+        if understanding and understanding.news_phrases:
+            search_terms = understanding.news_phrases
+        else:
+            search_terms = await acall_cortex_complete(self._search_prompt(user_query), self.model)
+        search_terms = search_terms.strip()[:50]
+        
+        # A cancelled task leaves the request to finish in its thread, bounded by SERPAPI_TIMEOUT_S
+        news_data = await asyncio.to_thread(self._fetch_news, search_terms)
+        result = await acall_cortex_complete(self._analysis_prompt(news_data, user_query), self.model)
         
         if show_backend:
-            with st.expander("🔧 News Agent - Backend Process", expanded=False):
-                st.write("**Raw News Data:**")
-                st.text_area("SerpAPI Results:", news_data[:300] + "...", height=100)
-                st.write("**News Analysis:**")
-                st.text_area("Analysis:", result, height=150)
+            self._show_search(search_terms)
+            self._show_analysis(news_data, result)
         
         return result
     
@@ -75,7 +108,7 @@ Return ONLY the summary, no additional text."""
                 "hl": "en"
             }
             
-            response = requests.get("https://serpapi.com/search", params=params)
+            response = requests.get(f"{self.serpapi_base_url}/search", params=params, timeout=self.timeout)
             
             if response.status_code != 200:
                 return f"SerpAPI Error: {response.status_code}"
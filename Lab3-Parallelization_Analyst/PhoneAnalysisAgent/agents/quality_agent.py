@@ -1,15 +1,37 @@
+import asyncio
+import json
+import os
 import streamlit as st
-from utils.snowflake_connection import execute_cortex_search_quality, call_cortex_complete
+from utils.snowflake_connection import execute_cortex_search_quality, call_cortex_complete, acall_cortex_complete
+from utils.step_graph import Step, arun_step_graph, critical_path_s, run_step_graph, serial_time_s, then
+
+FUSED_FIELDS = ('categories', 'severity', 'frequency')
+
+STEP_TITLES = [
+    ('problems', "Step 1: Problem Identification"),
+    ('search', "Step 2: Cortex Search Retrieval"),
+    ('fused', "Steps 3-5: Fused Analysis"),
+    ('categories', "Step 3: Issue Categorization"),
+    ('severity', "Step 4: Severity Assessment"),
+    ('frequency', "Step 5: Frequency Analysis"),
+    ('report', "Step 6: Final Synthesis")
+]
+
+RESULT_LABELS = {
+    'categories': "Categorized Problems:",
+    'severity': "Severity Ratings:",
+    'frequency': "Frequency Patterns:"
+}
 
 class QualityAgent:
-    def __init__(self):
+    def __init__(self, fused: bool = None):
         self.name = "Quality Issues Specialist"
         self.icon = "⚠️"
         self.model = "llama4-maverick"
+        # Merge steps 3-5 into one structured-output call
+        self.fused = fused if fused is not None else os.getenv("QUALITY_FUSED_STEPS", "false").lower() == "true"
         
-    def execute(self, user_query: str, show_backend: bool = False) -> str:
-        """Detect quality issues using Chain of Thought with Cortex Search"""
-        
+    def _identify_problems(self, user_query: str, complete=call_cortex_complete) -> str:
         # Step 1: Identify specific problems to investigate
         step1_prompt = f"""You are analyzing quality issues. What specific problems should we look for?
 
@@ -18,23 +40,9 @@ User query: {user_query}
 List 3-5 specific quality problems or defects to investigate.
 Return ONLY the problem keywords separated by commas."""
 
-        problem_keywords = call_cortex_complete(step1_prompt, self.model)
-        
-        if show_backend:
-            with st.expander("🔧 Step 1: Problem Identification", expanded=False):
-                st.write("**Problems to investigate:**", problem_keywords)
-        
-        # Step 2: Cortex Search for relevant problem reviews
-        search_results = execute_cortex_search_quality(problem_keywords)
-        
-        if show_backend:
-            with st.expander("🔧 Step 2: Cortex Search Retrieval", expanded=False):
-                st.code(f"""SNOWFLAKE.CORTEX.SEARCH_PREVIEW(
-    'LAB_DB.PUBLIC.LAB3_CORTEX_SEARCH',
-    '{{"query": "{problem_keywords}", "limit": 10}}'
-)""", language="sql")
-                st.text_area("Retrieved Reviews:", search_results[:300] + "...", height=100)
-        
+        return complete(step1_prompt, self.model)
+    
+    def _categorize(self, search_results: str, complete=call_cortex_complete) -> str:
         # Step 3: Categorize problems
         step3_prompt = f"""Categorize these iPhone problems by type.
 
@@ -48,12 +56,9 @@ Group problems into categories:
 
 Return ONLY the categorized problems."""
 
-        categorized_problems = call_cortex_complete(step3_prompt, self.model)
-        
-        if show_backend:
-            with st.expander("🔧 Step 3: Issue Categorization", expanded=False):
-                st.text_area("Categorized Problems:", categorized_problems, height=120)
-        
+        return complete(step3_prompt, self.model)
+    
+    def _assess_severity(self, categorized_problems: str, complete=call_cortex_complete) -> str:
         # Step 4: Assess severity
         step4_prompt = f"""Assess severity of each problem category.
 
@@ -66,12 +71,9 @@ Rate each category:
 
 Return ONLY severity assessment."""
 
-        severity_assessment = call_cortex_complete(step4_prompt, self.model)
-        
-        if show_backend:
-            with st.expander("🔧 Step 4: Severity Assessment", expanded=False):
-                st.text_area("Severity Ratings:", severity_assessment, height=100)
-        
+        return complete(step4_prompt, self.model)
+    
+    def _analyze_frequency(self, categorized_problems: str, search_results: str, complete=call_cortex_complete) -> str:
         # Step 5: Analyze frequency
         step5_prompt = f"""Analyze how often each problem appears.
 
@@ -81,20 +83,44 @@ Reviews analyzed: {search_results}
 Determine frequency pattern.
 Return ONLY frequency analysis."""
 
-        frequency_analysis = call_cortex_complete(step5_prompt, self.model)
-        
-        if show_backend:
-            with st.expander("🔧 Step 5: Frequency Analysis", expanded=False):
-                st.text_area("Frequency Patterns:", frequency_analysis, height=100)
-        
-        # Step 6: Final synthesis
-        final_prompt = f"""Synthesize complete quality analysis.
+        return complete(step5_prompt, self.model)
+    
+    def _fused_analysis(self, search_results: str, complete=call_cortex_complete) -> dict:
+        """Steps 3-5 in one structured-output call; None when the response is not the JSON object"""
+        fused_prompt = f"""Analyze the quality problems in these iPhone reviews.
+
+Reviews: {search_results}
+
+1. Categorize the problems by type (Hardware, Software, Design, Performance Issues).
+2. Rate the severity of each category: Critical (product-breaking), Moderate (annoying but usable)
+   or Minor (cosmetic/rare).
+3. Determine how often each problem appears in the reviews.
+
+Return ONLY a JSON object with three string fields, no additional text:
+{{"categories": "<categorized problems>", "severity": "<severity assessment>", "frequency": "<frequency analysis>"}}"""
+
+        return then(complete(fused_prompt, self.model), self._parse_fused)
+    
+    def _parse_fused(self, text: str) -> dict:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict) or not all(data.get(key) for key in FUSED_FIELDS):
+            return None
+        return {key: str(data[key]).strip() for key in FUSED_FIELDS}
+    
+    def _final_prompt(self, results: dict) -> str:
+        return f"""Synthesize complete quality analysis.
 
 Chain of thought results:
-- Problems identified: {problem_keywords}
-- Categories: {categorized_problems}
-- Severity: {severity_assessment}
-- Frequency: {frequency_analysis}
+- Problems identified: {results['problems']}
+- Categories: {results['categories']}
+- Severity: {results['severity']}
+- Frequency: {results['frequency']}
 
 Create final quality report:
 - Common Problems: [Main issues]
@@ -103,12 +129,90 @@ Create final quality report:
 - Recommendations: [What needs attention]
 
 Return ONLY the structured quality report."""
-
-        result = call_cortex_complete(final_prompt, self.model)
+    
+    def _steps(self, user_query: str, understanding=None, complete=call_cortex_complete,
+               search=execute_cortex_search_quality) -> dict:
+        """
+        Chain of thought as a dependency graph; severity and frequency only need the categories and reviews
+
+        complete and search are the blocking calls for run_step_graph, or coroutine
+        functions for arun_step_graph.
+        """
+        if understanding and understanding.problems:
+            problems = ", ".join(understanding.problems)
+            identify = lambda r: problems
+        else:
+            identify = lambda r: self._identify_problems(user_query, complete)
+        steps = {
+            'problems': Step((), identify),
+            # Step 2: Cortex Search for relevant problem reviews
+            'search': Step(('problems',), lambda r: search(r['problems'])),
+            'categories': Step(('search',), lambda r: self._categorize(r['search'], complete)),
+            'severity': Step(('categories',), lambda r: self._assess_severity(r['categories'], complete)),
+            'frequency': Step(('categories', 'search'),
+                              lambda r: self._analyze_frequency(r['categories'], r['search'], complete)),
+            # Step 6: Final synthesis
+            'report': Step(('problems', 'categories', 'severity', 'frequency'),
+                           lambda r: complete(self._final_prompt(r), self.model))
+        }
+        if self.fused:
+            # Steps 3-5 read the fused answer and only make their own call when it could not be parsed
+            steps['fused'] = Step(('search',), lambda r: self._fused_analysis(r['search'], complete))
+            for key in FUSED_FIELDS:
+                deps, run = steps[key]
+                steps[key] = Step(('fused',) + deps,
+                                  lambda r, key=key, run=run: r['fused'][key] if r['fused'] else run(r))
+        return steps
+    
+    def _show_steps(self, results: dict, timings: dict):
+        """Backend expanders in step order, each with its start offset and duration"""
+        fused = bool(results.get('fused'))
+        for key, title in STEP_TITLES:
+            if key not in timings or (fused and key in FUSED_FIELDS):
+                continue
+            timing = timings[key]
+            with st.expander(f"🔧 {title} ({timing['duration']:.2f}s)", expanded=False):
+                st.caption(f"Started at +{timing['start']:.2f}s, finished at +{timing['end']:.2f}s")
+                if key == 'problems':
+                    st.write("**Problems to investigate:**", results['problems'])
+                elif key == 'search':
+                    st.code(f"""SNOWFLAKE.CORTEX.SEARCH_PREVIEW(
+    'LAB_DB.PUBLIC.LAB3_CORTEX_SEARCH',
+    '{{"query": "{results['problems']}", "limit": 10}}'
+)""", language="sql")
+                    st.text_area("Retrieved Reviews:", results['search'][:300] + "...", height=100)
+                elif key == 'fused':
+                    st.write("**Fused analysis:**", "parsed" if fused else "unparseable, ran steps 3-5 separately")
+                    for field in FUSED_FIELDS:
+                        st.text_area(RESULT_LABELS[field], results[field], height=100)
+                elif key == 'report':
+                    st.code(self._final_prompt(results), language="text")
+                    st.text_area("Final Quality Report:", results['report'], height=200)
+                else:
+                    st.text_area(RESULT_LABELS[key], results[key], height=120 if key == 'categories' else 100)
+        
+        with st.expander("🔧 Quality Agent - Step Timeline", expanded=False):
+            st.write(f"**Critical path:** {critical_path_s(timings):.2f}s "
+                     f"(the same steps run serially: {serial_time_s(timings):.2f}s)")
+    
+    def execute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """Detect quality issues using Chain of Thought with Cortex Search"""
+        
+        results, timings = run_step_graph(self._steps(user_query, understanding))
+        
+        if show_backend:
+            self._show_steps(results, timings)
+        
+        return results['report']
+    
+    async def aexecute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """execute() on the event loop; cancelling it cancels the running Cortex queries"""
+        
+        steps = self._steps(user_query, understanding, complete=acall_cortex_complete,
+                            search=lambda query: asyncio.to_thread(execute_cortex_search_quality, query))
+        results, timings = await arun_step_graph(steps)
         
         if show_backend:
-            with st.expander("🔧 Step 6: Final Synthesis", expanded=False):
-                st.code(final_prompt, language="text")
-                st.text_area("Final Quality Report:", result, height=200)
+            self._show_steps(results, timings)
         
-        return result
\ No newline at end of file
+        return results['report']
@@ -1,5 +1,10 @@
+import asyncio
+import json
 import streamlit as st
-from utils.snowflake_connection import execute_sentiment_analysis, call_cortex_complete
+from utils.snowflake_connection import (
+    execute_sentiment_analysis, call_cortex_complete, acall_cortex_complete, keyword_where_clause
+)
+from utils.sentiment_store import sentiment_score_source
 
 class SentimentAgent:
     def __init__(self):
@@ -7,11 +12,8 @@ class SentimentAgent:
         self.icon = "😊"
         self.model = "claude-3-5-sonnet"
         
-    def execute(self, user_query: str, show_backend: bool = False) -> str:
-        """Execute sentiment analysis using Snowflake SENTIMENT() function"""
-        
-        # Step 1: Extract keywords from user query using LLM
-        keyword_extraction_prompt = f"""You are a Keyword Extraction Specialist. Extract iPhone-related keywords from this query.
+    def _keyword_prompt(self, user_query: str) -> str:
+        return f"""You are a Keyword Extraction Specialist. Extract iPhone-related keywords from this query.
 
 User query: {user_query}
 
@@ -20,37 +22,81 @@ Return ONLY the keywords separated by commas, no additional text.
 
 Example: "battery, performance, charging, life"
 """
+    
+    def _keyword_list(self, keywords: str) -> list:
+        return [k.strip() for k in keywords.split(',') if k.strip()]
+    
+    def _show_keywords(self, keyword_extraction_prompt: str, keyword_list: list, shared: bool):
+        with st.expander("🔧 Sentiment Agent - Step 1: Keyword Extraction", expanded=False):
+            if shared:
+                st.write("**Source:** shared query understanding")
+            else:
+                st.write("**Keyword Extraction Prompt:**")
+                st.code(keyword_extraction_prompt, language="text")
+            st.write(f"**Extracted Keywords:** {keyword_list}")
+    
+    def _show_sentiment(self, user_query: str, keyword_list: list, result: str):
+        with st.expander("🔧 Sentiment Agent - Step 2: Sentiment Analysis", expanded=False):
+            st.write("**Sentiment Query (scores precomputed per review in the sentiment store):**")
+            where_clause, params = keyword_where_clause(keyword_list or [user_query])
+            source, score = sentiment_score_source()
+            st.code(f"""
+WITH scored AS (
+    SELECT {score} AS sentiment_score
+    FROM {source}
+    {where_clause or "-- no review matches the keywords"}
+)
+SELECT
+    CASE
+        WHEN sentiment_score > 0.3 THEN 'Positive'
+        WHEN sentiment_score < -0.3 THEN 'Negative'
+        ELSE 'Neutral'
+    END AS SENTIMENT_CATEGORY,
+    COUNT(*) AS REVIEW_COUNT
+FROM scored
+GROUP BY SENTIMENT_CATEGORY
+""", language="sql")
+            if params:
+                st.write(f"**Review IDs from the local keyword index:** {len(json.loads(params['ids']))}")
+            st.write("**Sentiment Results:**")
+            st.text_area("Analysis Output:", result, height=150)
+    
+    def execute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """Execute sentiment analysis using Snowflake SENTIMENT() function"""
         
-        keywords = call_cortex_complete(keyword_extraction_prompt, self.model)
-        keyword_list = [k.strip() for k in keywords.split(',') if k.strip()]
+        # Step 1: Extract keywords from user query using LLM (skipped when the shared stage found them)
+        keyword_extraction_prompt = self._keyword_prompt(user_query)
+        shared = bool(understanding and understanding.keywords)
+        if shared:
+            keyword_list = understanding.keywords
+        else:
+            keyword_list = self._keyword_list(call_cortex_complete(keyword_extraction_prompt, self.model))
         
         if show_backend:
-            with st.expander("🔧 Sentiment Agent - Step 1: Keyword Extraction", expanded=False):
-                st.write("**Keyword Extraction Prompt:**")
-                st.code(keyword_extraction_prompt, language="text")
-                st.write(f"**Extracted Keywords:** {keyword_list}")
+            self._show_keywords(keyword_extraction_prompt, keyword_list, shared)
         
         # Step 2: Execute sentiment analysis with multiple keywords
         result = execute_sentiment_analysis(user_query, keyword_list)
         
         if show_backend:
-            with st.expander("🔧 Sentiment Agent - Step 2: Sentiment Analysis", expanded=False):
-                st.write("**Snowflake SENTIMENT() Query:**")
-                ilike_conditions = " OR ".join([f"REVIEWDESCRIPTION ILIKE '%{kw}%'" for kw in keyword_list])
-                st.code(f"""
-SELECT 
-    SNOWFLAKE.CORTEX.SENTIMENT(REVIEWDESCRIPTION) as sentiment_score,
-    CASE 
-        WHEN SNOWFLAKE.CORTEX.SENTIMENT(REVIEWDESCRIPTION) > 0.3 THEN 'Positive'
-        WHEN SNOWFLAKE.CORTEX.SENTIMENT(REVIEWDESCRIPTION) < -0.3 THEN 'Negative'
-        ELSE 'Neutral'
-    END as sentiment_category,
-    COUNT(*) as review_count
-FROM LAB_DB.PUBLIC.IPHONE_TABLE
-WHERE {ilike_conditions}
-GROUP BY sentiment_score, sentiment_category
-""", language="sql")
-                st.write("**Sentiment Results:**")
-                st.text_area("Analysis Output:", result, height=150)
+            self._show_sentiment(user_query, keyword_list, result)
+        
+        return result
+    
+    async def aexecute(self, user_query: str, show_backend: bool = False, understanding=None) -> str:
+        """execute() on the event loop; the warehouse query runs in a worker thread"""
+        
+        keyword_extraction_prompt = self._keyword_prompt(user_query)
+        shared = bool(understanding and understanding.keywords)
+        if shared:
+            keyword_list = understanding.keywords
+        else:
+            keyword_list = self._keyword_list(await acall_cortex_complete(keyword_extraction_prompt, self.model))
+        
+        result = await asyncio.to_thread(execute_sentiment_analysis, user_query, keyword_list)
+        
+        if show_backend:
+            self._show_keywords(keyword_extraction_prompt, keyword_list, shared)
+            self._show_sentiment(user_query, keyword_list, result)
         
-        return result
\ No newline at end of file
+        return result
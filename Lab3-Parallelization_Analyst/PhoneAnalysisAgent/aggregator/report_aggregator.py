@@ -1,14 +1,28 @@
 import streamlit as st
 from utils.snowflake_connection import call_cortex_complete
 
+SECTION_LABELS = {
+    'sentiment': "Sentiment Analysis",
+    'features': "Feature Extraction",
+    'news': "News Context",
+    'quality': "Quality Issues"
+}
+
 class ReportAggregator:
     def __init__(self):
         self.name = "Report Synthesis Specialist"
         self.icon = "📊"
         self.model = "claude-3-5-sonnet"
         
-    def aggregate(self, parallel_results: dict, user_query: str, show_backend: bool = False) -> str:
-        """Aggregate all parallel agent results into comprehensive report"""
+    def aggregate(self, parallel_results: dict, user_query: str, show_backend: bool = False,
+                  timed_out: list = None) -> str:
+        """
+        Aggregate all parallel agent results into comprehensive report
+
+        Sections listed in timed_out (result keys) had no result before their
+        agent's deadline; the report says so instead of filling them in.
+        """
+        timed_out = timed_out or []
         
         aggregation_prompt = f"""You are a Report Synthesis Specialist. Combine these parallel analyses into a comprehensive iPhone review report.
 
@@ -19,7 +33,7 @@ Parallel Analysis Results:
 - Feature Extraction: {parallel_results.get('features', 'N/A')}
 - News Context: {parallel_results.get('news', 'N/A')}
 - Quality Issues: {parallel_results.get('quality', 'N/A')}
-
+{self._timed_out_instruction(timed_out)}
 Create comprehensive report with:
 - Executive Summary: [Overall findings]
 - Sentiment Overview: [Key sentiment insights]
@@ -43,9 +57,26 @@ Return ONLY the comprehensive report, no additional text."""
         with st.spinner(f"{self.icon} Aggregator synthesizing final report..."):
             final_report = call_cortex_complete(aggregation_prompt, self.model)
         
+        if timed_out:
+            final_report += "\n\n" + self._timed_out_note(timed_out)
+        
         if show_backend:
             with st.expander("🔧 Aggregator - Backend Process", expanded=False):
                 st.write("**Final Comprehensive Report:**")
                 st.text_area("Aggregated Report:", final_report, height=250)
         
-        return final_report
\ No newline at end of file
+        return final_report
+    
+    def _timed_out_instruction(self, timed_out: list) -> str:
+        if not timed_out:
+            return ""
+        sections = ", ".join(SECTION_LABELS[key] for key in timed_out)
+        return (f"\nTimed out (no data): {sections}. Say in the matching report sections that this analysis "
+                f"timed out instead of guessing its findings.\n")
+    
+    def _timed_out_note(self, timed_out: list) -> str:
+        return "⏱️ Timed out, not included in this report: " + ", ".join(SECTION_LABELS[key] for key in timed_out)
+    
+    def unavailable_report(self, timed_out: list) -> str:
+        """Report for runs where too few agents finished to synthesize anything"""
+        return "Not enough analyses finished before their deadlines to build a report.\n\n" + self._timed_out_note(timed_out)
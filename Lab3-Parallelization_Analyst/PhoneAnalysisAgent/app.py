@@ -35,8 +35,9 @@ SERPAPI_API_KEY=your_serpapi_key
         st.header("⚙️ Execution Settings")
         execution_mode = st.radio(
             "Execution Mode:",
-            ["Sequential", "Parallel"],
-            help="Sequential runs agents one by one. Parallel runs all simultaneously."
+            ["Sequential", "Parallel", "Async (deadlines)"],
+            help="Sequential runs agents one by one. Parallel runs all simultaneously. "
+                 "Async runs them on asyncio and reports agents that miss their deadline as timed out."
         )
         
         show_backend = st.toggle("Show Backend Process", True)
@@ -85,14 +86,16 @@ SERPAPI_API_KEY=your_serpapi_key
     if analyze_button and user_query:
         st.markdown("---")
         
-        is_parallel = (execution_mode == "Parallel")
+        is_parallel = (execution_mode != "Sequential")
+        use_async = (execution_mode == "Async (deadlines)")
         
-        st.subheader(f"{'⚡ Parallel' if is_parallel else '🔄 Sequential'} Execution Mode")
+        mode_label = '⏱️ Async' if use_async else '⚡ Parallel' if is_parallel else '🔄 Sequential'
+        st.subheader(f"{mode_label} Execution Mode")
         
         chain = ParallelChain()
         
         start_time = time.time()
-        results = chain.execute_analysis(user_query, is_parallel, show_backend)
+        results = chain.execute_analysis(user_query, is_parallel, show_backend, use_async)
         total_time = time.time() - start_time
         
         st.session_state.results = results
@@ -103,6 +106,8 @@ SERPAPI_API_KEY=your_serpapi_key
         }
         
         st.success(f"✅ Analysis completed in {total_time:.2f} seconds")
+        if results.get('timed_out'):
+            st.warning(f"⏱️ Timed out: {', '.join(results['timed_out'])}")
         
         if st.session_state.execution_times.get('agent_times'):
             st.write("**Individual Agent Times:**")
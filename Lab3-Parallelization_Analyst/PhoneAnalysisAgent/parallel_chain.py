@@ -1,5 +1,8 @@
 import streamlit as st
+import asyncio
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 from langchain.schema.runnable import RunnableParallel, RunnableLambda
 from agents.sentiment_agent import SentimentAgent
@@ -7,6 +10,7 @@ from agents.feature_agent import FeatureAgent
 from agents.news_agent import NewsAgent
 from agents.quality_agent import QualityAgent
 from aggregator.report_aggregator import ReportAggregator
+from utils.query_understanding import SHARED_QUERY_UNDERSTANDING, UNDERSTANDING_PROMPT, understand_query
 
 class ParallelChain:
     def __init__(self):
@@ -15,18 +19,77 @@ class ParallelChain:
         self.news_agent = NewsAgent()
         self.quality_agent = QualityAgent()
         self.aggregator = ReportAggregator()
+        self.shared_understanding = SHARED_QUERY_UNDERSTANDING
+        # Async mode: seconds each agent may run before its section is reported as timed out
+        default_deadline = float(os.getenv("AGENT_DEADLINE_S", "60"))
+        self.deadlines = {
+            name: float(os.getenv(f"AGENT_DEADLINE_{name.upper()}_S", default_deadline))
+            for name in ['Sentiment', 'Features', 'News', 'Quality']
+        }
+        # Fewer completed sections than this skip the LLM aggregation
+        self.min_completed_agents = int(os.getenv("MIN_COMPLETED_AGENTS", "1"))
+        # Async mode: past this the agents extract their own inputs instead of waiting
+        self.understanding_deadline = float(os.getenv("UNDERSTANDING_DEADLINE_S", "10"))
         
-    def execute_analysis(self, user_query: str, is_parallel: bool = True, show_backend: bool = False):
-        """Execute analysis in parallel or sequential mode"""
+    def execute_analysis(self, user_query: str, is_parallel: bool = True, show_backend: bool = False,
+                         use_async: bool = False):
+        """Execute analysis in parallel, asyncio (parallel with per-agent deadlines) or sequential mode"""
         
         agent_times = {}
         
-        if is_parallel:
-            return self._execute_parallel(user_query, show_backend, agent_times)
+        # One structured call feeds every agent instead of a keyword/phrase extraction per agent
+        understanding_start = time.time()
+        deadline = self.understanding_deadline if is_parallel and use_async else None
+        understanding = self._understand_query(user_query, show_backend, deadline)
+        understanding_time = time.time() - understanding_start
+        
+        if is_parallel and use_async:
+            result = self._execute_async(user_query, show_backend, agent_times, understanding)
+        elif is_parallel:
+            result = self._execute_parallel(user_query, show_backend, agent_times, understanding)
+        else:
+            result = self._execute_sequential(user_query, show_backend, agent_times, understanding)
+        result['understanding_time'] = understanding_time
+        result['total_time'] += understanding_time
+        return result
+    
+    def _understand_query(self, user_query: str, show_backend: bool, deadline: float = None):
+        """Shared keywords, problem terms, news phrases and embedding (None when disabled or late)"""
+        if not self.shared_understanding:
+            return None
+        
+        if deadline is None:
+            understanding = understand_query(user_query)
         else:
-            return self._execute_sequential(user_query, show_backend, agent_times)
+            # Not a with block: leaving it would wait for a late call
+            executor = ThreadPoolExecutor(max_workers=1)
+            future = executor.submit(understand_query, user_query)
+            executor.shutdown(wait=False)
+            try:
+                understanding = future.result(timeout=deadline)
+            except FutureTimeoutError:
+                # The late result is still memoized for the next run of this query
+                if show_backend:
+                    st.caption(f"🧠 Shared query understanding exceeded {deadline:g}s; "
+                               "agents extract their own inputs")
+                return None
+        
+        if show_backend:
+            with st.expander("🧠 Shared Query Understanding", expanded=False):
+                st.write("**Source:** memoized" if understanding.cached else "**Understanding Prompt:**")
+                if not understanding.cached:
+                    st.code(UNDERSTANDING_PROMPT.format(user_query=user_query), language="text")
+                st.write(f"**Keywords (Sentiment):** {understanding.keywords}")
+                st.write(f"**Problem terms (Quality):** {understanding.problems}")
+                st.write(f"**News phrases (News):** {understanding.news_phrases}")
+                dimensions = len(understanding.embedding) if understanding.embedding else 0
+                st.write(f"**Query embedding (Features):** {dimensions} dimensions")
+                if not understanding.complete:
+                    st.caption("Agents make their own extraction call for any empty field")
+        
+        return understanding
     
-    def _execute_parallel(self, user_query: str, show_backend: bool, agent_times: dict):
+    def _execute_parallel(self, user_query: str, show_backend: bool, agent_times: dict, understanding=None):
         """Execute all agents in parallel using LangChain RunnableParallel"""
         
         st.write("⚡ **Running 4 agents in parallel...**")
@@ -61,7 +124,7 @@ class ParallelChain:
         )
         
         parallel_start = time.time()
-        parallel_results = parallel_runnable.invoke({"query": user_query})
+        parallel_results = parallel_runnable.invoke({"query": user_query, "understanding": understanding})
         parallel_time = time.time() - parallel_start
         
         st.write("**Agent Execution Timeline:**")
@@ -104,7 +167,105 @@ class ParallelChain:
             'total_time': parallel_time + agg_time
         }
     
-    def _execute_sequential(self, user_query: str, show_backend: bool, agent_times: dict):
+    def _execute_async(self, user_query: str, show_backend: bool, agent_times: dict, understanding=None):
+        """Execute all agents as asyncio tasks; an agent past its deadline is cancelled and its section marked"""
+        
+        st.write("⏱️ **Running 4 agents on asyncio with per-agent deadlines...**")
+        
+        progress_cols = st.columns(4)
+        status_placeholders = {}
+        for i, agent_name in enumerate(['Sentiment', 'Features', 'News', 'Quality']):
+            with progress_cols[i]:
+                status_placeholders[agent_name] = st.empty()
+                status_placeholders[agent_name].info(f"⏳ {agent_name} (≤ {self.deadlines[agent_name]:.0f}s)")
+        
+        parallel_start = time.time()
+        # Not asyncio.run: its shutdown joins the worker threads, so one hung blocking call
+        # (SerpAPI, warehouse SQL) would hold the report past the deadlines
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(thread_name_prefix="agent"))
+        try:
+            outcomes = loop.run_until_complete(self._arun_agents(user_query, show_backend, understanding))
+        finally:
+            loop.close()
+        parallel_time = time.time() - parallel_start
+        
+        results, execution_tracking, timed_out = {}, {}, []
+        for key, agent_name, result, tracking in outcomes:
+            results[key] = result
+            execution_tracking[agent_name] = tracking
+            agent_times[agent_name] = tracking['duration']
+            if tracking['status'] == 'timed_out':
+                timed_out.append(key)
+                status_placeholders[agent_name].warning(f"⏱️ {agent_name} timed out")
+            elif tracking['status'] == 'failed':
+                status_placeholders[agent_name].error(f"❌ {agent_name}")
+            else:
+                status_placeholders[agent_name].success(f"✅ {agent_name}")
+        
+        st.write("**Agent Execution Timeline:**")
+        timing_cols = st.columns(4)
+        for i, agent_name in enumerate(['Sentiment', 'Features', 'News', 'Quality']):
+            tracking = execution_tracking[agent_name]
+            with timing_cols[i]:
+                st.metric(label="Duration", value=f"{tracking['duration']:.2f}s")
+                st.caption(f"Start: {tracking['start']}")
+                st.caption(f"End: {tracking['end']}")
+        
+        st.write(f"⏱️ **Total async execution: {parallel_time:.2f} seconds**")
+        
+        st.markdown("---")
+        st.write("📊 **Step 5: Aggregating Results**")
+        
+        agg_start = time.time()
+        completed = len(results) - len(timed_out)
+        if completed >= self.min_completed_agents:
+            final_report = self.aggregator.aggregate(results, user_query, show_backend, timed_out=timed_out)
+        else:
+            final_report = self.aggregator.unavailable_report(timed_out)
+        agg_time = time.time() - agg_start
+        
+        st.success(f"✅ Aggregator completed in {agg_time:.2f}s")
+        
+        return {
+            **results,
+            'final_report': final_report,
+            'agent_times': agent_times,
+            'execution_tracking': execution_tracking,
+            'timed_out': timed_out,
+            'total_time': parallel_time + agg_time
+        }
+    
+    async def _arun_agents(self, user_query: str, show_backend: bool, understanding) -> list:
+        """(result key, agent name, result, tracking) per agent, each bounded by its deadline"""
+        agents = [
+            ('sentiment', 'Sentiment', self.sentiment_agent),
+            ('features', 'Features', self.feature_agent),
+            ('news', 'News', self.news_agent),
+            ('quality', 'Quality', self.quality_agent)
+        ]
+        
+        async def run(key, agent_name, agent):
+            start = time.time()
+            start_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+            deadline = self.deadlines[agent_name]
+            try:
+                # wait_for cancels the agent at the deadline, which cancels its running Cortex queries
+                result = await asyncio.wait_for(agent.aexecute(user_query, show_backend, understanding), deadline)
+                status = 'completed'
+            except asyncio.TimeoutError:
+                result = f"[Timed out: no result within the {deadline:g}s deadline]"
+                status = 'timed_out'
+            except Exception as e:
+                result = f"Error: {e}"
+                status = 'failed'
+            end_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+            tracking = {'start': start_time, 'end': end_time, 'duration': time.time() - start, 'status': status}
+            return key, agent_name, result, tracking
+        
+        return await asyncio.gather(*(run(*agent) for agent in agents))
+    
+    def _execute_sequential(self, user_query: str, show_backend: bool, agent_times: dict, understanding=None):
         """Execute all agents sequentially for comparison"""
         
         st.write("🔄 **Running agents sequentially...**")
@@ -115,7 +276,7 @@ class ParallelChain:
         st.write("**Step 1: Sentiment Analysis Agent**")
         start = time.time()
         start_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        results['sentiment'] = self.sentiment_agent.execute(user_query, show_backend)
+        results['sentiment'] = self.sentiment_agent.execute(user_query, show_backend, understanding)
         end_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
         duration = time.time() - start
         agent_times['Sentiment'] = duration
@@ -125,7 +286,7 @@ class ParallelChain:
         st.write("**Step 2: Feature Extraction Agent**")
         start = time.time()
         start_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        results['features'] = self.feature_agent.execute(user_query, show_backend)
+        results['features'] = self.feature_agent.execute(user_query, show_backend, understanding)
         end_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
         duration = time.time() - start
         agent_times['Features'] = duration
@@ -135,7 +296,7 @@ class ParallelChain:
         st.write("**Step 3: News Context Agent**")
         start = time.time()
         start_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        results['news'] = self.news_agent.execute(user_query, show_backend)
+        results['news'] = self.news_agent.execute(user_query, show_backend, understanding)
         end_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
         duration = time.time() - start
         agent_times['News'] = duration
@@ -145,7 +306,7 @@ class ParallelChain:
         st.write("**Step 4: Quality Analysis Agent**")
         start = time.time()
         start_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        results['quality'] = self.quality_agent.execute(user_query, show_backend)
+        results['quality'] = self.quality_agent.execute(user_query, show_backend, understanding)
         end_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
         duration = time.time() - start
         agent_times['Quality'] = duration
@@ -175,7 +336,7 @@ class ParallelChain:
         start = time.time()
         start_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
         
-        result = agent.execute(input_data['query'], show_backend)
+        result = agent.execute(input_data['query'], show_backend, input_data.get('understanding'))
         
         end_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
         duration = time.time() - start
@@ -0,0 +1,280 @@
+"""
+Local inverted index over IPHONE_TABLE review text
+
+Review descriptions are tokenized and case-folded; every term maps to a
+sorted array of local document numbers (postings). Keyword filters resolve
+to review IDs in-process, so Snowflake only receives ID-keyed fetches
+instead of ILIKE '%kw%' scans over the whole table:
+
+    python -m utils.keyword_index --sync           # incremental past the watermark (full on first run)
+    python -m utils.keyword_index --sync --full    # rebuild
+
+KEYWORD_INDEX_ID_COLUMN must name a real key column of the table: the fetches
+filter on it, and a re-exported (edited) review replaces its old document.
+A running app picks up a sync from another process on its next query.
+
+A keyword matches every term it is a prefix of, so "overheat" also finds
+"overheating", close to the substring behaviour of ILIKE. Multi-word
+keywords require all of their tokens.
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import threading
+import warnings
+from array import array
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "local" resolves keyword filters with this index; "warehouse" keeps the ILIKE scans
+KEYWORD_SEARCH_BACKEND = os.getenv("KEYWORD_SEARCH_BACKEND", "warehouse").lower()
+KEYWORD_INDEX_DIR = os.getenv("KEYWORD_INDEX_DIR", ".keyword_index")
+# Monotonic column for incremental syncs; empty re-exports the table each sync
+WATERMARK_COLUMN = os.getenv("KEYWORD_INDEX_WATERMARK_COLUMN", "")
+# Key column used for the ID-keyed fetches; required, since a computed id (e.g. a
+# content hash) would make every fetch hash the whole table again
+ID_COLUMN = os.getenv("KEYWORD_INDEX_ID_COLUMN", "")
+
+REVIEW_TABLE = "LAB_DB.PUBLIC.IPHONE_TABLE"
+FETCH_BATCH = 1000
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list:
+    return TOKEN_PATTERN.findall((text or "").casefold())
+
+def ids_param(review_ids: list) -> str:
+    """Bind value for the IN (SELECT ... FLATTEN(PARSE_JSON(...))) filter"""
+    return json.dumps(list(review_ids))
+
+ID_FILTER = "IN (SELECT VALUE::STRING FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%(ids)s))))"
+
+class KeywordIndex:
+    """Term -> sorted document number postings, plus review id and rating per document"""
+
+    def __init__(self, directory: str = KEYWORD_INDEX_DIR):
+        self.directory = directory
+        self.postings = {}
+        self.terms = []
+        self.docs = {'ids': [], 'ratings': [], 'deleted': []}
+        self.state = {'watermark': None, 'documents': 0}
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self.load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def available(self) -> bool:
+        return bool(self.docs['ids'])
+
+    def _state_mtime(self):
+        try:
+            return os.stat(self._path("state.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Reload when another process has synced since the last load"""
+        if self._state_mtime() != self._loaded_mtime:
+            self.load()
+
+    def load(self):
+        """Read the postings written by the last sync"""
+        # state.json is replaced last, so a changed mtime means a sync finished while reading
+        mtime = self._state_mtime()
+        while mtime is not None:
+            self._read()
+            with self._lock:
+                self._loaded_mtime = mtime
+            current = self._state_mtime()
+            if current == mtime:
+                break
+            mtime = current
+
+    def _read(self):
+        with open(self._path("state.json"), encoding="utf-8") as f:
+            state = json.load(f)
+        with open(self._path("docs.json"), encoding="utf-8") as f:
+            docs = json.load(f)
+        with open(self._path("terms.json"), encoding="utf-8") as f:
+            offsets = json.load(f)
+        data = array('I')
+        with open(self._path("postings.bin"), "rb") as f:
+            data.frombytes(f.read())
+        postings = {term: data[start:start + count] for term, (start, count) in offsets.items()}
+        with self._lock:
+            self.state, self.docs, self.postings = state, docs, postings
+            self.terms = sorted(postings)
+
+    def _save(self):
+        """Write all files beside the old ones and swap them in"""
+        os.makedirs(self.directory, exist_ok=True)
+        data, offsets = array('I'), {}
+        for term in self.terms:
+            offsets[term] = (len(data), len(self.postings[term]))
+            data.extend(self.postings[term])
+        with open(self._path("postings.tmp.bin"), "wb") as f:
+            f.write(data.tobytes())
+        for name, content in (("terms", offsets), ("docs", self.docs)):
+            with open(self._path(f"{name}.tmp.json"), "w", encoding="utf-8") as f:
+                json.dump(content, f)
+        os.replace(self._path("postings.tmp.bin"), self._path("postings.bin"))
+        os.replace(self._path("terms.tmp.json"), self._path("terms.json"))
+        os.replace(self._path("docs.tmp.json"), self._path("docs.json"))
+        with open(self._path("state.tmp.json"), "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(self._path("state.tmp.json"), self._path("state.json"))
+        self._loaded_mtime = self._state_mtime()
+
+    def sync(self, conn, full: bool = False, watermark_column: str = WATERMARK_COLUMN,
+             id_column: str = ID_COLUMN) -> dict:
+        """
+        Index reviews from Snowflake; incremental syncs only fetch rows past the stored watermark
+
+        Re-exported ids replace their old document, which is tombstoned until the next full sync.
+        """
+        if not id_column:
+            raise ValueError("Set KEYWORD_INDEX_ID_COLUMN to the review table's key column")
+        incremental = bool(watermark_column) and not full and self.available
+        watermark_select = f"{watermark_column} AS WATERMARK" if watermark_column else "NULL AS WATERMARK"
+        where = "WHERE REVIEWDESCRIPTION IS NOT NULL"
+        params = {}
+        if incremental and self.state.get('watermark') is not None:
+            where += f" AND {watermark_column} > %(watermark)s"
+            params['watermark'] = self.state['watermark']
+        order = f"ORDER BY {watermark_column}" if watermark_column else ""
+
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {id_column} AS REVIEW_ID, REVIEWTITLE, RATINGSCORE, REVIEWDESCRIPTION, {watermark_select}
+            FROM {REVIEW_TABLE}
+            {where}
+            {order}
+        """, params or None)
+
+        with self._lock:
+            if not incremental:
+                self.postings, self.docs = {}, {'ids': [], 'ratings': [], 'deleted': []}
+                self.state = {'watermark': None, 'documents': 0}
+            live = {review_id: doc for doc, review_id in enumerate(self.docs['ids'])
+                    if not self.docs['deleted'][doc]}
+            watermark, fetched = self.state.get('watermark'), 0
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH)
+                if not rows:
+                    break
+                for review_id, _, rating, text, row_watermark in rows:
+                    review_id = str(review_id)
+                    if review_id in live:
+                        self.docs['deleted'][live[review_id]] = True
+                    doc = len(self.docs['ids'])
+                    live[review_id] = doc
+                    self.docs['ids'].append(review_id)
+                    self.docs['ratings'].append(rating)
+                    self.docs['deleted'].append(False)
+                    # Document numbers only grow, so appending keeps every postings array sorted
+                    for term in set(tokenize(text)):
+                        self.postings.setdefault(term, array('I')).append(doc)
+                    if row_watermark is not None:
+                        watermark = str(row_watermark)
+                    fetched += 1
+            self.terms = sorted(self.postings)
+            self.state = {'watermark': watermark, 'documents': len(live)}
+            if fetched or not incremental:
+                self._save()
+        return {'fetched': fetched, 'documents': len(live), 'terms': len(self.terms), 'watermark': watermark}
+
+    def _term_docs(self, token: str) -> set:
+        """Documents containing any term that starts with token"""
+        docs = set()
+        start = bisect.bisect_left(self.terms, token)
+        for term in self.terms[start:]:
+            if not term.startswith(token):
+                break
+            docs.update(self.postings[term])
+        return docs
+
+    def _keyword_docs(self, keyword: str) -> set:
+        tokens = tokenize(keyword)
+        if not tokens:
+            return set()
+        # Intersect from the rarest token so the working set stays small
+        matches = sorted((self._term_docs(token) for token in tokens), key=len)
+        docs = matches[0]
+        for other in matches[1:]:
+            docs &= other
+        return docs
+
+    def match(self, keywords: list, mode: str = "or", max_rating: float = None) -> list:
+        """
+        Documents matching any ("or") or all ("and") keywords, oldest first
+
+        Args:
+            keywords: Keywords or phrases (every token of a phrase must match)
+            max_rating: Keep only reviews rated at or below this value
+        """
+        with self._lock:
+            sets = [self._keyword_docs(keyword) for keyword in keywords if keyword.strip()]
+            if not sets:
+                return []
+            docs = set.union(*sets) if mode == "or" else set.intersection(*sets)
+            ratings, deleted = self.docs['ratings'], self.docs['deleted']
+            return sorted(
+                doc for doc in docs
+                if not deleted[doc]
+                and (max_rating is None or (ratings[doc] is not None and ratings[doc] <= max_rating))
+            )
+
+    def review_ids(self, docs: list) -> list:
+        return [self.docs['ids'][doc] for doc in docs]
+
+    def rating(self, doc: int):
+        return self.docs['ratings'][doc]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_keyword_index() -> KeywordIndex:
+    """Get the process-wide keyword index, reloaded after a sync"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KeywordIndex()
+    _index.refresh()
+    return _index
+
+def use_keyword_index() -> bool:
+    if KEYWORD_SEARCH_BACKEND != "local":
+        return False
+    if not ID_COLUMN:
+        warnings.warn("KEYWORD_SEARCH_BACKEND=local needs KEYWORD_INDEX_ID_COLUMN; using ILIKE scans")
+        return False
+    return get_keyword_index().available
+
+if __name__ == "__main__":
+    from utils.snowflake_connection import get_snowflake_connection
+
+    parser = argparse.ArgumentParser(description="Sync IPHONE_TABLE review text into the local keyword index")
+    parser.add_argument("--sync", action="store_true", help="Fetch new rows from Snowflake")
+    parser.add_argument("--full", action="store_true", help="Rebuild instead of fetching rows past the watermark")
+    args = parser.parse_args()
+
+    if args.sync and not ID_COLUMN:
+        raise SystemExit("Set KEYWORD_INDEX_ID_COLUMN to the review table's key column")
+
+    index = get_keyword_index()
+    if args.sync:
+        conn = get_snowflake_connection()
+        if not conn:
+            raise SystemExit("Connection failed")
+        try:
+            print(index.sync(conn, full=args.full))
+        finally:
+            conn.close()
+    print(f"{index.state.get('documents', 0)} reviews, {len(index.terms)} terms indexed in {index.directory} "
+          f"(watermark {index.state.get('watermark')})")
@@ -0,0 +1,124 @@
+"""
+Shared query understanding for the Lab3 analysis agents
+
+One structured COMPLETE call extracts the review keywords (Sentiment), the
+problem terms (Quality) and the news search phrases (News); the query
+embedding (Features) is computed alongside it. Results are memoized per
+normalized query, so a repeated analysis makes no extra calls.
+"""
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from utils.snowflake_connection import call_cortex_complete, get_query_embedding
+
+load_dotenv()
+
+SHARED_QUERY_UNDERSTANDING = os.getenv("SHARED_QUERY_UNDERSTANDING", "true").lower() == "true"
+QUERY_UNDERSTANDING_MODEL = os.getenv("QUERY_UNDERSTANDING_MODEL", "claude-3-5-sonnet")
+QUERY_UNDERSTANDING_CACHE_SIZE = int(os.getenv("QUERY_UNDERSTANDING_CACHE_SIZE", "256"))
+
+UNDERSTANDING_PROMPT = """You are a Query Understanding Specialist for iPhone review analysis.
+
+User query: {user_query}
+
+Extract:
+- keywords: 3-5 relevant keywords for searching iPhone reviews
+- problems: 3-5 specific quality problems or defects to investigate
+- news_phrases: 2-3 core search phrases for recent news, separated by spaces (e.g. "phone battery life")
+
+Return ONLY a JSON object, no additional text:
+{{"keywords": [<keyword strings>], "problems": [<problem strings>], "news_phrases": "<phrases>"}}"""
+
+@dataclass
+class QueryUnderstanding:
+    """
+    Per-query inputs shared by the agents
+
+    A field is empty when extraction failed; the agent then makes its own call.
+    """
+    query: str
+    keywords: list = field(default_factory=list)
+    problems: list = field(default_factory=list)
+    news_phrases: str = ""
+    embedding: list = None
+    cached: bool = False
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.keywords and self.problems and self.news_phrases and self.embedding)
+
+def normalize_query(user_query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different phrasings share one entry"""
+    return " ".join(user_query.casefold().split()).rstrip("?!. ")
+
+def _as_list(value) -> list:
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def parse_understanding(text: str) -> dict:
+    """Keywords, problems and news phrases from the structured response (empty when unparseable)"""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    phrases = data.get('news_phrases', "")
+    if isinstance(phrases, list):
+        phrases = " ".join(str(phrase) for phrase in phrases)
+    return {
+        'keywords': _as_list(data.get('keywords')),
+        'problems': _as_list(data.get('problems')),
+        'news_phrases': str(phrases).strip()[:50]
+    }
+
+def _embed(user_query: str):
+    try:
+        return get_query_embedding(user_query)
+    except Exception:
+        return None
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def understand_query(user_query: str, model: str = QUERY_UNDERSTANDING_MODEL) -> QueryUnderstanding:
+    """
+    Extract all agent inputs for a query in one structured call, memoized per normalized query
+
+    Only complete results are memoized, so a failed extraction is retried next time.
+    """
+    key = normalize_query(user_query)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            hit = _cache[key]
+            return QueryUnderstanding(user_query, list(hit.keywords), list(hit.problems),
+                                      hit.news_phrases, hit.embedding, cached=True)
+
+    # The embedding is independent of the LLM call, so both round trips overlap
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        embedding = executor.submit(_embed, user_query)
+        response = call_cortex_complete(UNDERSTANDING_PROMPT.format(user_query=user_query), model)
+        understanding = QueryUnderstanding(user_query, **parse_understanding(response), embedding=embedding.result())
+
+    if understanding.complete:
+        with _cache_lock:
+            _cache[key] = understanding
+            while len(_cache) > QUERY_UNDERSTANDING_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return understanding
+
+def clear_query_understanding_cache():
+    with _cache_lock:
+        _cache.clear()
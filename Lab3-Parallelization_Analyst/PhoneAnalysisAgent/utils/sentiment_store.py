@@ -0,0 +1,109 @@
+"""
+Per-review sentiment scores materialized in a side table
+
+SNOWFLAKE.CORTEX.SENTIMENT runs once per distinct review text. Rows are keyed
+by SHA1(REVIEWDESCRIPTION), so a new or edited review gets a new hash and is
+scored by the next refresh, while unchanged reviews are never scored again:
+
+    python -m utils.sentiment_store --refresh          # score reviews not in the table yet
+    python -m utils.sentiment_store --refresh --prune  # also drop hashes no longer in IPHONE_TABLE
+
+Requests join against the table and only aggregate. Reviews added since the
+last refresh are scored inline, so results stay complete in between.
+"""
+import argparse
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SENTIMENT_STORE_ENABLED = os.getenv("SENTIMENT_STORE_ENABLED", "true").lower() == "true"
+SENTIMENT_TABLE = os.getenv("SENTIMENT_TABLE", "LAB_DB.PUBLIC.IPHONE_REVIEW_SENTIMENT")
+REVIEW_TABLE = "LAB_DB.PUBLIC.IPHONE_TABLE"
+REVIEW_HASH = "SHA1(REVIEWDESCRIPTION)"
+
+CREATE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {SENTIMENT_TABLE} (
+    REVIEW_HASH STRING NOT NULL PRIMARY KEY,
+    SENTIMENT_SCORE FLOAT NOT NULL,
+    COMPUTED_AT TIMESTAMP_NTZ NOT NULL
+)
+"""
+
+# Only reviews whose hash is missing reach SENTIMENT(); grouping by hash scores duplicate texts once
+REFRESH_SQL = f"""
+MERGE INTO {SENTIMENT_TABLE} s
+USING (
+    SELECT {REVIEW_HASH} AS REVIEW_HASH, ANY_VALUE(REVIEWDESCRIPTION) AS REVIEWDESCRIPTION
+    FROM {REVIEW_TABLE} t
+    WHERE REVIEWDESCRIPTION IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM {SENTIMENT_TABLE} e WHERE e.REVIEW_HASH = {REVIEW_HASH})
+    GROUP BY 1
+) n
+ON s.REVIEW_HASH = n.REVIEW_HASH
+WHEN NOT MATCHED THEN INSERT (REVIEW_HASH, SENTIMENT_SCORE, COMPUTED_AT)
+    VALUES (n.REVIEW_HASH, SNOWFLAKE.CORTEX.SENTIMENT(n.REVIEWDESCRIPTION), CURRENT_TIMESTAMP())
+"""
+
+PRUNE_SQL = f"""
+DELETE FROM {SENTIMENT_TABLE}
+WHERE REVIEW_HASH NOT IN (SELECT {REVIEW_HASH} FROM {REVIEW_TABLE} WHERE REVIEWDESCRIPTION IS NOT NULL)
+"""
+
+_table_ready = False
+
+def ensure_sentiment_table(cursor):
+    """Create the side table once per process"""
+    global _table_ready
+    if not _table_ready:
+        cursor.execute(CREATE_SQL)
+        _table_ready = True
+
+def sentiment_score_source() -> tuple:
+    """
+    FROM/JOIN clause and score expression for sentiment queries over REVIEW_TABLE t
+
+    With the store enabled, stored scores are used and only unscored reviews
+    call SENTIMENT(); otherwise every matching row is scored inline.
+    """
+    if SENTIMENT_STORE_ENABLED:
+        source = f"{REVIEW_TABLE} t LEFT JOIN {SENTIMENT_TABLE} s ON s.REVIEW_HASH = SHA1(t.REVIEWDESCRIPTION)"
+        return source, "COALESCE(s.SENTIMENT_SCORE, SNOWFLAKE.CORTEX.SENTIMENT(t.REVIEWDESCRIPTION))"
+    return f"{REVIEW_TABLE} t", "SNOWFLAKE.CORTEX.SENTIMENT(t.REVIEWDESCRIPTION)"
+
+def refresh_sentiment_store(conn, prune: bool = False) -> dict:
+    """Score reviews missing from the side table; optionally drop hashes of deleted or edited reviews"""
+    cursor = conn.cursor()
+    ensure_sentiment_table(cursor)
+    cursor.execute(REFRESH_SQL)
+    row = cursor.fetchone()
+    stats = {'scored': row[0] if row else 0, 'pruned': 0}
+    if prune:
+        cursor.execute(PRUNE_SQL)
+        row = cursor.fetchone()
+        stats['pruned'] = row[0] if row else 0
+    cursor.execute(f"SELECT COUNT(*) FROM {SENTIMENT_TABLE}")
+    stats['rows'] = cursor.fetchone()[0]
+    return stats
+
+if __name__ == "__main__":
+    from utils.snowflake_connection import get_snowflake_connection
+
+    parser = argparse.ArgumentParser(description="Maintain the per-review sentiment side table")
+    parser.add_argument("--refresh", action="store_true", help="Score reviews that are not in the table yet")
+    parser.add_argument("--prune", action="store_true", help="Delete scores for reviews that no longer exist")
+    args = parser.parse_args()
+
+    conn = get_snowflake_connection()
+    if not conn:
+        raise SystemExit("Connection failed")
+    try:
+        if args.refresh or args.prune:
+            print(refresh_sentiment_store(conn, prune=args.prune))
+        else:
+            cursor = conn.cursor()
+            ensure_sentiment_table(cursor)
+            cursor.execute(f"SELECT COUNT(*), MAX(COMPUTED_AT) FROM {SENTIMENT_TABLE}")
+            print("Scored reviews: {}, last refresh: {}".format(*cursor.fetchone()))
+    finally:
+        conn.close()
@@ -1,9 +1,23 @@
 import snowflake.connector
+import asyncio
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.retrieval import FEATURE_FETCH_SIZE, FEATURE_CONTEXT_TOKENS, ReviewHit, pack_context
+from utils.sentiment_store import SENTIMENT_STORE_ENABLED, ensure_sentiment_table, sentiment_score_source
+from utils.keyword_index import ID_COLUMN, ID_FILTER, get_keyword_index, ids_param, use_keyword_index
 
 load_dotenv()
 
+EMBED_MODEL = 'snowflake-arctic-embed-l-v2.0'
+# acall_cortex_complete checks on a submitted query after 20 ms, backing off to this interval
+ASYNC_POLL_INTERVAL_S = float(os.getenv("ASYNC_POLL_INTERVAL_S", "0.5"))
+
+# Connection setup, query submission, cancels and logouts for acall_cortex_complete.
+# Kept off the event loop and its executor, so closing the loop never waits for them.
+_background = ThreadPoolExecutor(thread_name_prefix="cortex_async")
+
 def get_snowflake_connection():
     """Get Snowflake connection using PAT token"""
     try:
@@ -45,8 +59,127 @@ def call_cortex_complete(prompt: str, model: str = 'claude-3-5-sonnet') -> str:
     finally:
         conn.close()
 
+async def acall_cortex_complete(prompt: str, model: str = 'claude-3-5-sonnet') -> str:
+    """
+    Cortex Complete without blocking the event loop
+
+    The query is submitted with execute_async and polled; cancelling the
+    awaiting task (e.g. on a deadline) cancels the query in Snowflake too.
+    Connects, cancels and logouts run on a background pool, so a cancelled
+    call returns at once instead of waiting for those round trips.
+    """
+    connecting = _background.submit(get_snowflake_connection)
+    try:
+        conn = await asyncio.wrap_future(connecting)
+    except asyncio.CancelledError:
+        # The connection may still open after the caller gave up; log it out when it does
+        connecting.add_done_callback(lambda future: _background.submit(_close_opened, future))
+        raise
+    if not conn:
+        return "Connection failed"
+    
+    cursor = conn.cursor()
+    escaped_prompt = prompt.replace("'", "''")
+    
+    query = f"""
+    SELECT SNOWFLAKE.CORTEX.COMPLETE(
+        '{model}',
+        '{escaped_prompt}'
+    ) as result
+    """
+    
+    submitting = _background.submit(cursor.execute_async, query)
+    abandoned = False
+    try:
+        await asyncio.wrap_future(submitting)
+        query_id = cursor.sfqid
+        interval = min(0.02, ASYNC_POLL_INTERVAL_S)
+        while conn.is_still_running(await asyncio.to_thread(conn.get_query_status_throw_if_error, query_id)):
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, ASYNC_POLL_INTERVAL_S)
+        await asyncio.to_thread(cursor.get_results_from_sfqid, query_id)
+        result = cursor.fetchone()
+        return result[0] if result else "No result"
+    except asyncio.CancelledError:
+        # Stop paying for a result nobody waits for any more, once the submission (possibly
+        # still in flight) has returned a query id
+        abandoned = True
+        submitting.add_done_callback(lambda future: _background.submit(_abandon_query, conn, cursor, future))
+        raise
+    except Exception as e:
+        return f"Error: {e}"
+    finally:
+        if not abandoned:
+            _background.submit(conn.close)
+
+def _close_opened(connecting):
+    conn = None if connecting.cancelled() or connecting.exception() else connecting.result()
+    if conn:
+        conn.close()
+
+def _abandon_query(conn, cursor, submitting):
+    """Cancel a query whose caller was cancelled, then log out"""
+    try:
+        if not submitting.cancelled() and not submitting.exception() and cursor.sfqid:
+            _cancel_query(conn, cursor.sfqid)
+    finally:
+        conn.close()
+
+def _cancel_query(conn, query_id: str):
+    try:
+        conn.cursor().execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,))
+    except Exception as e:
+        print(f"Cancel failed for query {query_id}: {e}")
+
+def _parse_vector(value) -> list:
+    """VECTOR results arrive as a list or as a JSON array string depending on the connector"""
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+def get_query_embedding(query_text: str) -> list:
+    """Embed a query with EMBED_TEXT_1024"""
+    conn = get_snowflake_connection()
+    if not conn:
+        raise ConnectionError("Connection failed")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_1024(%s, %s) AS query_embedding",
+            (EMBED_MODEL, query_text)
+        )
+        return _parse_vector(cursor.fetchone()[0])
+    finally:
+        conn.close()
+
+def keyword_where_clause(keywords: list, column: str = "t.REVIEWDESCRIPTION", max_rating: float = None,
+                         limit: int = None) -> tuple:
+    """
+    WHERE clause and bind params for reviews matching any of the keywords
+
+    With the local keyword index the keywords resolve to review ids in-process
+    and Snowflake only fetches those ids; otherwise each keyword is an ILIKE
+    scan. Returns (None, None) when the index finds no matching review.
+
+    Args:
+        max_rating: Keep only reviews rated at or below this value
+        limit: With the index, keep only the lowest rated matches
+    """
+    if use_keyword_index():
+        index = get_keyword_index()
+        docs = index.match(keywords, mode="or", max_rating=max_rating)
+        if not docs:
+            return None, None
+        if limit:
+            docs = sorted(docs, key=index.rating)[:limit]
+        return f"WHERE {ID_COLUMN} {ID_FILTER}", {'ids': ids_param(index.review_ids(docs))}
+
+    escaped_keywords = [kw.replace("'", "''") for kw in keywords]
+    ilike_conditions = " OR ".join([f"{column} ILIKE '%{kw}%'" for kw in escaped_keywords])
+    if max_rating is not None:
+        return f"WHERE ({ilike_conditions}) AND RATINGSCORE <= {float(max_rating)}", None
+    return f"WHERE {ilike_conditions}", None
+
 def execute_sentiment_analysis(query_text: str, keywords: list = None) -> str:
-    """Execute sentiment analysis using Snowflake SENTIMENT() with multiple keywords"""
+    """Aggregate per-review sentiment (precomputed in the sentiment store) for reviews matching the keywords"""
     conn = get_snowflake_connection()
     if not conn:
         return "Connection failed"
@@ -54,39 +187,42 @@ def execute_sentiment_analysis(query_text: str, keywords: list = None) -> str:
     try:
         cursor = conn.cursor()
         
-        if keywords and len(keywords) > 0:
-            escaped_keywords = [kw.replace("'", "''") for kw in keywords]
-            ilike_conditions = " OR ".join([f"REVIEWDESCRIPTION ILIKE '%{kw}%'" for kw in escaped_keywords])
-            where_clause = f"WHERE {ilike_conditions}"
-        else:
-            escaped_query = query_text.replace("'", "''")
-            where_clause = f"WHERE REVIEWDESCRIPTION ILIKE '%{escaped_query}%'"
+        where_clause, params = keyword_where_clause(keywords if keywords else [query_text])
+        if where_clause is None:
+            return "No sentiment data found"
+        
+        if SENTIMENT_STORE_ENABLED:
+            ensure_sentiment_table(cursor)
+        source, score = sentiment_score_source()
         
+        # Each matching review is scored at most once (stored scores need no inference)
         sentiment_query = f"""
-        SELECT 
-            SNOWFLAKE.CORTEX.SENTIMENT(REVIEWDESCRIPTION) as sentiment_score,
-            CASE 
-                WHEN SNOWFLAKE.CORTEX.SENTIMENT(REVIEWDESCRIPTION) > 0.3 THEN 'Positive'
-                WHEN SNOWFLAKE.CORTEX.SENTIMENT(REVIEWDESCRIPTION) < -0.3 THEN 'Negative'
+        WITH scored AS (
+            SELECT {score} AS sentiment_score
+            FROM {source}
+            {where_clause}
+        )
+        SELECT
+            CASE
+                WHEN sentiment_score > 0.3 THEN 'Positive'
+                WHEN sentiment_score < -0.3 THEN 'Negative'
                 ELSE 'Neutral'
-            END as sentiment_category,
-            COUNT(*) as review_count
-        FROM LAB_DB.PUBLIC.IPHONE_TABLE
-        {where_clause}
-        GROUP BY sentiment_score, sentiment_category
-        ORDER BY review_count DESC
-        LIMIT 20
+            END AS SENTIMENT_CATEGORY,
+            COUNT(*) AS REVIEW_COUNT
+        FROM scored
+        GROUP BY SENTIMENT_CATEGORY
         """
         
-        cursor.execute(sentiment_query)
+        cursor.execute(sentiment_query, params)
         results = cursor.fetchall()
         
         if not results:
             return "No sentiment data found"
         
-        positive = sum(r[2] for r in results if r[1] == 'Positive')
-        negative = sum(r[2] for r in results if r[1] == 'Negative')
-        neutral = sum(r[2] for r in results if r[1] == 'Neutral')
+        counts = dict(results)
+        positive = counts.get('Positive', 0)
+        negative = counts.get('Negative', 0)
+        neutral = counts.get('Neutral', 0)
         total = positive + negative + neutral
         
         if total > 0:
@@ -103,50 +239,77 @@ def execute_sentiment_analysis(query_text: str, keywords: list = None) -> str:
     finally:
         conn.close()
 
-def execute_feature_search(query_text: str) -> str:
-    """Execute feature search using vector similarity"""
+def search_reviews(query_text: str, fetch_size: int = FEATURE_FETCH_SIZE, min_score: float = 0.3,
+                   min_rating: float = None, max_rating: float = None, query_embedding: list = None) -> list:
+    """
+    Retrieve the reviews most similar to a query as ReviewHit rows
+
+    Rating filters are applied before scoring; results are ordered by similarity.
+    A precomputed query_embedding is bound as-is instead of embedding query_text again.
+    """
     conn = get_snowflake_connection()
     if not conn:
-        return "Connection failed"
-    
+        raise ConnectionError("Connection failed")
+
+    params = {'min_score': min_score, 'fetch_size': fetch_size}
+    if query_embedding is not None:
+        embed_expression = "PARSE_JSON(%(embedding)s)::ARRAY::VECTOR(FLOAT, 1024)"
+        params['embedding'] = json.dumps(query_embedding)
+    else:
+        embed_expression = f"SNOWFLAKE.CORTEX.EMBED_TEXT_1024('{EMBED_MODEL}', %(query)s)"
+        params['query'] = query_text
+    filters = ""
+    if min_rating is not None:
+        filters += " AND RATINGSCORE >= %(min_rating)s"
+        params['min_rating'] = min_rating
+    if max_rating is not None:
+        filters += " AND RATINGSCORE <= %(max_rating)s"
+        params['max_rating'] = max_rating
+
     try:
         cursor = conn.cursor()
-        escaped_query = query_text.replace("'", "''")
-        
-        feature_query = f"""
+        cursor.execute(f"""
         WITH user_query AS (
-            SELECT SNOWFLAKE.CORTEX.EMBED_TEXT_1024('snowflake-arctic-embed-l-v2.0', '{escaped_query}') as query_embedding
+            SELECT {embed_expression} as query_embedding
         ),
-        relevant_reviews AS (
+        scored_reviews AS (
             SELECT
+                SHA1(REVIEWTITLE || '|' || REVIEWDESCRIPTION) AS REVIEW_ID,
                 REVIEWTITLE,
-                REVIEWDESCRIPTION,
                 RATINGSCORE,
                 VECTOR_COSINE_SIMILARITY(
                     REVIEW_EMBEDDINGS::VECTOR(FLOAT, 1024),
                     uq.query_embedding
-                ) AS similarity_score
+                ) AS SIMILARITY,
+                REVIEWDESCRIPTION
             FROM LAB_DB.PUBLIC.IPHONE_TABLE it
             CROSS JOIN user_query uq
-            WHERE REVIEW_EMBEDDINGS IS NOT NULL
-              AND VECTOR_COSINE_SIMILARITY(REVIEW_EMBEDDINGS::VECTOR(FLOAT, 1024), uq.query_embedding) > 0.3
-            ORDER BY similarity_score DESC
-            LIMIT 10
+            WHERE REVIEW_EMBEDDINGS IS NOT NULL{filters}
         )
-        SELECT 
-            LISTAGG(REVIEWTITLE || ' (Rating: ' || RATINGSCORE || ') - ' || REVIEWDESCRIPTION, ' | ') 
-            WITHIN GROUP (ORDER BY similarity_score DESC) as feature_reviews
-        FROM relevant_reviews
-        """
-        
-        cursor.execute(feature_query)
-        result = cursor.fetchone()
-        return result[0] if result and result[0] else "No feature-related reviews found"
-    except Exception as e:
-        return f"Feature search error: {e}"
+        SELECT REVIEW_ID, REVIEWTITLE, RATINGSCORE, SIMILARITY, REVIEWDESCRIPTION
+        FROM scored_reviews
+        WHERE SIMILARITY > %(min_score)s
+        ORDER BY SIMILARITY DESC
+        LIMIT %(fetch_size)s
+        """, params)
+        return [
+            ReviewHit(str(review_id), title, rating, float(score), text)
+            for review_id, title, rating, score, text in cursor.fetchall()
+        ]
     finally:
         conn.close()
 
+def execute_feature_search(query_text: str, token_budget: int = FEATURE_CONTEXT_TOKENS,
+                           query_embedding: list = None) -> str:
+    """Execute feature search using vector similarity, packing the best reviews into a token budget"""
+    try:
+        hits = search_reviews(query_text, query_embedding=query_embedding)
+    except ConnectionError:
+        return "Connection failed"
+    except Exception as e:
+        return f"Feature search error: {e}"
+    return pack_context(hits, token_budget) or "No feature-related reviews found"
+
 def execute_quality_search(query_text: str) -> str:
     """Get reviews for quality analysis"""
     conn = get_snowflake_connection()
@@ -155,7 +318,9 @@ def execute_quality_search(query_text: str) -> str:
     
     try:
         cursor = conn.cursor()
-        escaped_query = query_text.replace("'", "''")
+        where_clause, params = keyword_where_clause([query_text], column="REVIEWDESCRIPTION", max_rating=3, limit=10)
+        if where_clause is None:
+            return "No quality issues found"
         
         quality_query = f"""
         SELECT 
@@ -164,14 +329,13 @@ def execute_quality_search(query_text: str) -> str:
         FROM (
             SELECT REVIEWTITLE, REVIEWDESCRIPTION, RATINGSCORE
             FROM LAB_DB.PUBLIC.IPHONE_TABLE
-            WHERE REVIEWDESCRIPTION ILIKE '%{escaped_query}%'
-              AND RATINGSCORE <= 3
+            {where_clause}
             ORDER BY RATINGSCORE ASC
             LIMIT 10
         )
         """
         
-        cursor.execute(quality_query)
+        cursor.execute(quality_query, params)
         result = cursor.fetchone()
         return result[0] if result and result[0] else "No quality issues found"
     except Exception as e:
@@ -0,0 +1,120 @@
+"""
+Run an agent's steps as a dependency graph
+
+Each step names the steps it needs and a function of their results; a step
+starts as soon as its dependencies finish, so independent steps overlap:
+
+    steps = {
+        'search': Step((), lambda r: search(query)),
+        'severity': Step(('search',), lambda r: assess(r['search'])),
+        'frequency': Step(('search',), lambda r: count(r['search'])),
+    }
+    results, timings = run_step_graph(steps)
+
+arun_step_graph runs the same graph as asyncio tasks; a step may then return
+an awaitable, and cancelling the graph cancels every running step.
+"""
+import asyncio
+import inspect
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+Step = namedtuple("Step", ["deps", "run"])
+
+def run_step_graph(steps: dict, results: dict = None, max_workers: int = None) -> tuple:
+    """
+    Execute steps with maximal parallelism
+
+    Args:
+        steps: Step name -> Step(deps, run); run receives the results dict
+        results: Results already known, treated as finished steps
+        max_workers: Thread limit (defaults to the number of steps)
+
+    Returns:
+        (results, timings); timings maps each executed step to start/end
+        offsets and duration in seconds from the start of the graph
+    """
+    results = dict(results or {})
+    pending = {name: step for name, step in steps.items() if name not in results}
+    unknown = {dep for step in pending.values() for dep in step.deps} - set(steps) - set(results)
+    if unknown:
+        raise ValueError(f"Unknown step dependencies: {sorted(unknown)}")
+
+    timings = {}
+    graph_start = time.perf_counter()
+
+    def timed(name: str, step: Step):
+        start = time.perf_counter()
+        value = step.run(results)
+        end = time.perf_counter()
+        timings[name] = {'start': start - graph_start, 'end': end - graph_start, 'duration': end - start}
+        return value
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(1, len(pending))) as executor:
+        running = {}
+        while pending or running:
+            ready = [name for name, step in pending.items() if all(dep in results for dep in step.deps)]
+            for name in ready:
+                running[executor.submit(timed, name, pending.pop(name))] = name
+            if not running:
+                raise ValueError(f"Dependency cycle between steps: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                # Results are only written here, so steps never see a half-finished dependency
+                results[running.pop(future)] = future.result()
+    return results, timings
+
+async def arun_step_graph(steps: dict, results: dict = None) -> tuple:
+    """Asyncio variant of run_step_graph; awaitable step results are awaited"""
+    results = dict(results or {})
+    pending = {name: step for name, step in steps.items() if name not in results}
+    unknown = {dep for step in pending.values() for dep in step.deps} - set(steps) - set(results)
+    if unknown:
+        raise ValueError(f"Unknown step dependencies: {sorted(unknown)}")
+
+    timings = {}
+    graph_start = time.perf_counter()
+
+    async def timed(name: str, step: Step):
+        start = time.perf_counter()
+        value = step.run(results)
+        if inspect.isawaitable(value):
+            value = await value
+        end = time.perf_counter()
+        timings[name] = {'start': start - graph_start, 'end': end - graph_start, 'duration': end - start}
+        return value
+
+    running = {}
+    try:
+        while pending or running:
+            ready = [name for name, step in pending.items() if all(dep in results for dep in step.deps)]
+            for name in ready:
+                running[asyncio.ensure_future(timed(name, pending.pop(name)))] = name
+            if not running:
+                raise ValueError(f"Dependency cycle between steps: {sorted(pending)}")
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[running.pop(task)] = task.result()
+    finally:
+        for task in running:
+            task.cancel()
+        # Let cancelled steps clean up (e.g. cancel their warehouse queries) before returning
+        await asyncio.gather(*running, return_exceptions=True)
+    return results, timings
+
+def then(value, fn):
+    """Apply fn to a step result, awaiting it first when the step runs under arun_step_graph"""
+    if inspect.isawaitable(value):
+        async def apply():
+            return fn(await value)
+        return apply()
+    return fn(value)
+
+def critical_path_s(timings: dict) -> float:
+    """Wall time of the graph (the longest dependency chain)"""
+    return max((timing['end'] for timing in timings.values()), default=0.0)
+
+def serial_time_s(timings: dict) -> float:
+    """Time the same steps take when run one after another"""
+    return sum(timing['duration'] for timing in timings.values())
@@ -0,0 +1,145 @@
+"""
+A/B comparison of Lab2's two-hop answers and fused mode
+
+Runs each query through RoutingChain with the synthesizer hop (A) and with
+FUSED_ANSWERS (B), alternating which mode goes first per round. Latency is
+wall time per chain run; quality is a 1-10 score from an LLM judge that sees
+the question, the tool's analysis and the final answer:
+
+    python benchmarks/ab_fused.py                    # fake Cortex backend (judge scores are placeholders)
+    python benchmarks/ab_fused.py --live --rounds 2  # real Snowflake, using Lab2's .env
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+from run_benchmarks import BENCH_ENV, lab_context, percentile
+from fake_cortex import FakeCortexBackend, install
+
+LAB2_PATH = "Lab2-RoutingAgent_RAG/iphone_assistant"
+
+QUERIES = [
+    "What do customers say about iPhone 15 battery life?",
+    "Are there any camera quality issues with iPhone 15 Pro?",
+    "What's the latest news about iPhone 17?",
+    "Where's the nearest Apple Store from Northeastern University?"
+]
+
+MODES = {'two_hop': False, 'fused': True}
+
+JUDGE_PROMPT = """You are an Answer Quality Judge for iPhone customer support.
+
+Customer question: {question}
+
+Specialist analysis the answer must be based on: {analysis}
+
+Customer response to grade: {answer}
+
+Rate the response from 1 to 10 for faithfulness to the analysis, how directly it
+answers the question, and a friendly, clear tone.
+Return ONLY a JSON object like {{"score": 7}}, no additional text."""
+
+def judge(question: str, analysis: str, answer: str, model: str):
+    """1-10 quality score from the judge model, or None when it cannot be parsed"""
+    from snowflake_connection import call_cortex_complete
+    response = call_cortex_complete(JUDGE_PROMPT.format(question=question, analysis=analysis[:2000],
+                                                        answer=answer), model)
+    match = re.search(r'"score"\s*:\s*(\d+(?:\.\d+)?)', response)
+    return float(match.group(1)) if match else None
+
+def run_mode(query: str, fused: bool, backend=None) -> dict:
+    from routing_chain import RoutingChain
+    before = backend.snapshot() if backend else None
+    start = time.perf_counter()
+    result = RoutingChain(fused=fused).execute_routing_chain(query)
+    elapsed = time.perf_counter() - start
+    calls = backend.snapshot()['complete_calls'] - before['complete_calls'] if backend else None
+    return {'latency_s': elapsed, 'llm_calls': calls, 'result': result}
+
+def summarize(samples: list) -> dict:
+    latencies = [s['latency_s'] for s in samples]
+    scores = [s['score'] for s in samples if s['score'] is not None]
+    calls = [s['llm_calls'] for s in samples if s['llm_calls'] is not None]
+    return {
+        'runs': len(samples),
+        'p50_s': round(percentile(latencies, 50), 4),
+        'p95_s': round(percentile(latencies, 95), 4),
+        'mean_s': round(statistics.mean(latencies), 4),
+        'llm_calls_per_run': round(statistics.mean(calls), 2) if calls else None,
+        'mean_score': round(statistics.mean(scores), 2) if scores else None,
+        'fused_rate': round(sum(s['fused'] for s in samples) / len(samples), 2)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Lab2 two-hop and fused answers on latency and quality")
+    parser.add_argument("--live", action="store_true", help="Use the real Snowflake connection instead of the fake")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the queries")
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    parser.add_argument("--judge-model", default="claude-3-5-sonnet")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Fake backend delay multiplier")
+    parser.add_argument("--output", help="Write per-run samples and the summary as JSON")
+    args = parser.parse_args(argv)
+
+    env = {'ANSWER_CACHE_ENABLED': 'false'}  # a cached answer from mode A would be served to mode B
+    backend = None
+    if not args.live:
+        for key, value in BENCH_ENV.items():
+            os.environ.setdefault(key, value)
+        backend = install(FakeCortexBackend(time_scale=args.time_scale))
+    from streamlit import config, logger
+    config.get_option("logger.level")
+    logger.set_log_level("error")
+
+    samples = {mode: [] for mode in MODES}
+    pairs = []
+    with lab_context(LAB2_PATH, env):
+        for round_index in range(args.rounds):
+            order = list(MODES) if round_index % 2 == 0 else list(reversed(MODES))
+            for query in args.queries:
+                scores = {}
+                for mode in order:
+                    run = run_mode(query, MODES[mode], backend)
+                    result = run.pop('result')
+                    run.update({
+                        'query': query,
+                        'round': round_index,
+                        'tool': result['selected_tool'],
+                        'fused': result.get('fused', False),
+                        'answer': result['final_response'],
+                        'score': judge(query, result['tool_output'], result['final_response'], args.judge_model)
+                    })
+                    samples[mode].append(run)
+                    scores[mode] = run['score']
+                    print(f"  {mode:<8} {run['latency_s']:6.2f}s score {run['score']}  {query}", file=sys.stderr)
+                pairs.append(scores)
+
+    summary = {mode: summarize(runs) for mode, runs in samples.items()}
+    judged = [p for p in pairs if None not in p.values()]
+    summary['fused_vs_two_hop'] = {
+        'wins': sum(p['fused'] > p['two_hop'] for p in judged),
+        'ties': sum(p['fused'] == p['two_hop'] for p in judged),
+        'losses': sum(p['fused'] < p['two_hop'] for p in judged),
+        'p50_change': round(summary['fused']['p50_s'] / summary['two_hop']['p50_s'] - 1, 3)
+        if summary['two_hop']['p50_s'] else None
+    }
+
+    print(f"\n{'mode':<10}{'runs':>6}{'p50 s':>9}{'p95 s':>9}{'LLM/run':>9}{'score':>8}{'fused':>8}")
+    for mode in MODES:
+        s = summary[mode]
+        print(f"{mode:<10}{s['runs']:>6}{s['p50_s']:>9.3f}{s['p95_s']:>9.3f}"
+              f"{str(s['llm_calls_per_run']):>9}{str(s['mean_score']):>8}{s['fused_rate']:>8.0%}")
+    ab = summary['fused_vs_two_hop']
+    change = f"{ab['p50_change']:+.0%}" if ab['p50_change'] is not None else "-"
+    print(f"\nFused vs two-hop: p50 {change}, judge wins/ties/losses {ab['wins']}/{ab['ties']}/{ab['losses']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({'summary': summary, 'samples': samples}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Offline benchmarks for the lab chains
+
+Runs Lab1 AgentChain.execute_chain, Lab2 RoutingChain.execute_routing_chain and
+Lab3 ParallelChain.execute_analysis headlessly against the fake Cortex backend,
+reports latency and throughput, and flags regressions against a stored baseline:
+
+    python benchmarks/run_benchmarks.py                       # compare with baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline       # record a new baseline
+    python benchmarks/run_benchmarks.py --only lab2_routing --concurrency 4
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_cortex import FakeCortexBackend, install
+from stub_apis import StubApiServer
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+# Local caches start empty on every benchmark run and are filled by the warmup
+STATE_DIR = tempfile.mkdtemp(prefix="lab_benchmarks_")
+
+# SerpAPI/Google Maps stand-in for the benchmarks that exercise Lab2's HTTP layer
+STUB_APIS = StubApiServer(delay_s=0.02)
+# A SerpAPI that takes a second to answer, for Lab3's per-agent deadlines
+SLOW_NEWS_API = StubApiServer(delay_s=1.0)
+SLOW_NEWS_ENV = {'SERPAPI_API_KEY': 'stub', 'SERPAPI_BASE_URL': SLOW_NEWS_API.url}
+
+# Keep the chains offline and deterministic; explicit environment settings still win
+BENCH_ENV = {
+    'CORTEX_CACHE_ENABLED': 'false',
+    'CORTEX_STREAMING': 'false',
+    'VALIDATION_RUN_TESTS': 'false',
+    'ADAPTIVE_MODELS': 'false',
+    'MODEL_STATS_PATH': '',
+    'SERPAPI_API_KEY': '',
+    'GOOGLE_MAPS_API_KEY': '',
+    'ROUTER_DECISION_LOG': os.path.join(STATE_DIR, "router_decisions.jsonl"),
+    'EMBEDDING_CACHE_PATH': os.path.join(STATE_DIR, "embedding_cache.sqlite3"),
+    'ANSWER_CACHE_ENABLED': 'false',
+    'ANSWER_CACHE_PATH': os.path.join(STATE_DIR, "answer_cache.sqlite3")
+}
+
+def _lab1(query: str):
+    from agent_chain import AgentChain
+    return AgentChain().execute_chain(query)
+
+def _lab2(query: str):
+    from routing_chain import RoutingChain
+    return RoutingChain().execute_routing_chain(query)
+
+def _sync_vector_index():
+    from snowflake_connection import get_snowflake_connection
+    from vector_index import get_vector_index
+    get_vector_index().sync(get_snowflake_connection(), full=True)
+
+def _sync_keyword_index():
+    from utils.snowflake_connection import get_snowflake_connection
+    from utils.keyword_index import get_keyword_index
+    get_keyword_index().sync(get_snowflake_connection(), full=True)
+
+def _lab3_quality(query: str):
+    from agents.quality_agent import QualityAgent
+    return QualityAgent().execute(query)
+
+def _lab3_parallel(query: str):
+    from parallel_chain import ParallelChain
+    return ParallelChain().execute_analysis(query, is_parallel=True)
+
+def _lab3_async(query: str):
+    from parallel_chain import ParallelChain
+    return ParallelChain().execute_analysis(query, is_parallel=True, use_async=True)
+
+def _lab3_sequential(query: str):
+    from parallel_chain import ParallelChain
+    return ParallelChain().execute_analysis(query, is_parallel=False)
+
+BENCHMARKS = {
+    'lab1_chain': {
+        'path': "Lab1-PromptChaining/code_agent",
+        'run': _lab1,
+        'queries': ["Build an expense tracker with functions to add expenses, total them and print a summary"]
+    },
+    'lab2_routing': {
+        'path': "Lab2-RoutingAgent_RAG/iphone_assistant",
+        'run': _lab2,
+        'queries': [
+            "How is the iPhone 16 battery life according to reviews?",
+            "What is the latest iPhone news?",
+            "Where is the nearest Apple Store to Boston?"
+        ]
+    },
+    'lab2_local_index': {
+        'path': "Lab2-RoutingAgent_RAG/iphone_assistant",
+        'run': _lab2,
+        'setup': _sync_vector_index,
+        'env': {'RETRIEVAL_BACKEND': 'local', 'VECTOR_INDEX_DIR': os.path.join(STATE_DIR, "vector_index")},
+        'queries': ["How is the iPhone 16 battery life according to reviews?", "Do users complain about the camera?"]
+    },
+    'lab2_answer_cache': {
+        'path': "Lab2-RoutingAgent_RAG/iphone_assistant",
+        'run': _lab2,
+        'env': {'ANSWER_CACHE_ENABLED': 'true'},
+        'queries': [
+            "How is the iPhone 16 battery life according to reviews?",
+            "Where is the nearest Apple Store to Boston?"
+        ]
+    },
+    'lab2_fused': {
+        'path': "Lab2-RoutingAgent_RAG/iphone_assistant",
+        'run': _lab2,
+        'env': {'FUSED_ANSWERS': 'true'},
+        'queries': [
+            "How is the iPhone 16 battery life according to reviews?",
+            "What is the latest iPhone news?",
+            "Where is the nearest Apple Store to Boston?"
+        ]
+    },
+    'lab2_external_apis': {
+        'path': "Lab2-RoutingAgent_RAG/iphone_assistant",
+        'run': _lab2,
+        'setup': STUB_APIS.start,
+        'env': {
+            'SERPAPI_API_KEY': 'stub', 'GOOGLE_MAPS_API_KEY': 'stub',
+            'SERPAPI_BASE_URL': STUB_APIS.url, 'GOOGLE_MAPS_BASE_URL': STUB_APIS.url
+        },
+        'queries': ["What is the latest iPhone news?", "Where is the nearest Apple Store to Boston?"]
+    },
+    'lab3_parallel': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_parallel,
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_async': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_async,
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_slow_news': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_parallel,
+        'setup': SLOW_NEWS_API.start,
+        'env': SLOW_NEWS_ENV,
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_slow_news_async': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_async,
+        'setup': SLOW_NEWS_API.start,
+        'env': {**SLOW_NEWS_ENV, 'AGENT_DEADLINE_NEWS_S': '0.5'},
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_unshared': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_parallel,
+        'env': {'SHARED_QUERY_UNDERSTANDING': 'false'},
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_sequential': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_sequential,
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_quality': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_quality,
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_quality_fused': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_quality,
+        'env': {'QUALITY_FUSED_STEPS': 'true'},
+        'queries': ["iPhone 16 battery and camera"]
+    },
+    'lab3_keyword_index': {
+        'path': "Lab3-Parallelization_Analyst/PhoneAnalysisAgent",
+        'run': _lab3_parallel,
+        'setup': _sync_keyword_index,
+        'env': {
+            'KEYWORD_SEARCH_BACKEND': 'local', 'KEYWORD_INDEX_ID_COLUMN': 'REVIEWID',
+            'KEYWORD_INDEX_DIR': os.path.join(STATE_DIR, "keyword_index")
+        },
+        'queries': ["iPhone 16 battery and camera"]
+    }
+}
+
+@contextlib.contextmanager
+def lab_context(path: str, env: dict = None):
+    """Import a lab as if launched from its directory, then forget its modules"""
+    lab_dir = os.path.join(REPO_ROOT, path)
+    cwd, modules = os.getcwd(), set(sys.modules)
+    saved_env = {key: os.environ.get(key) for key in (env or {})}
+    os.environ.update(env or {})
+    os.chdir(lab_dir)
+    sys.path.insert(0, lab_dir)
+    try:
+        yield
+    finally:
+        sys.path.remove(lab_dir)
+        os.chdir(cwd)
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        # Labs reuse module names (snowflake_connection, agents, news_agent)
+        for name in set(sys.modules) - modules:
+            del sys.modules[name]
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a sequence"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_benchmark(name: str, backend: FakeCortexBackend, rounds: int, concurrency: int, warmup: int) -> dict:
+    """Time one chain over rounds x queries runs"""
+    spec = BENCHMARKS[name]
+    with lab_context(spec['path'], spec.get('env')):
+        if spec.get('setup'):
+            spec['setup']()
+        for query in spec['queries'][:warmup]:
+            spec['run'](query)
+
+        backend.reset()
+        latencies, errors = [], 0
+
+        def timed(query):
+            start = time.perf_counter()
+            spec['run'](query)
+            return time.perf_counter() - start
+
+        jobs = [query for _ in range(rounds) for query in spec['queries']]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(timed, query) for query in jobs]:
+                try:
+                    latencies.append(future.result())
+                except Exception as e:
+                    errors += 1
+                    print(f"  {name}: run failed: {e}", file=sys.stderr)
+        wall = time.perf_counter() - start
+
+    stats = backend.snapshot()
+    runs = len(jobs)
+    return {
+        'runs': runs,
+        'errors': errors,
+        'concurrency': concurrency,
+        'p50_s': round(percentile(latencies, 50), 4),
+        'p95_s': round(percentile(latencies, 95), 4),
+        'max_s': round(max(latencies), 4) if latencies else 0.0,
+        'throughput_rps': round(runs / wall, 3) if wall else 0.0,
+        'complete_calls_per_run': round(stats['complete_calls'] / runs, 2),
+        'sql_calls_per_run': round(stats['sql_calls'] / runs, 2),
+        'connections_per_run': round(stats['connections'] / runs, 2),
+        'prompt_tokens_per_run': int(stats['prompt_tokens'] / runs),
+        'simulated_cortex_s_per_run': round(stats['simulated_s'] / runs, 3)
+    }
+
+# Metrics compared against the baseline: name -> True when higher is worse
+CHECKED_METRICS = {
+    'p50_s': True,
+    'p95_s': True,
+    'throughput_rps': False,
+    'complete_calls_per_run': True,
+    'sql_calls_per_run': True,
+    'prompt_tokens_per_run': True
+}
+# Latency changes below this are scheduler noise (cache hits take a few milliseconds)
+MIN_LATENCY_CHANGE_S = 0.02
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that moved the wrong way by more than the tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric, higher_is_worse in CHECKED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if metric.endswith("_s") and abs(new - old) < MIN_LATENCY_CHANGE_S:
+                continue
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append(f"{name}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def print_report(results: dict, baseline: dict):
+    previous = baseline.get('results', {}) if baseline else {}
+    print(f"\n{'benchmark':<22}{'runs':>6}{'p50 s':>9}{'p95 s':>9}{'runs/s':>9}{'LLM/run':>9}{'SQL/run':>9}  vs baseline p50")
+    for name, r in results.items():
+        old = previous.get(name, {}).get('p50_s')
+        delta = f"{(r['p50_s'] - old) / old:+.0%}" if old else "-"
+        print(f"{name:<22}{r['runs']:>6}{r['p50_s']:>9.3f}{r['p95_s']:>9.3f}{r['throughput_rps']:>9.2f}"
+              f"{r['complete_calls_per_run']:>9}{r['sql_calls_per_run']:>9}  {delta}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the lab chains against a fake Cortex backend")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over each benchmark's queries")
+    parser.add_argument("--concurrency", type=int, default=1, help="Chain runs in flight at once")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before measuring")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Multiplier on simulated Cortex delays")
+    parser.add_argument("--mode", choices=["canned", "echo"], default="canned", help="Fake response style")
+    parser.add_argument("--profiles", help="JSON file with per-model latency overrides")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change before flagging")
+    parser.add_argument("--output", help="Write the results JSON here")
+    args = parser.parse_args(argv)
+
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    # Streamlit runs in bare mode and warns about the missing script context on every call
+    from streamlit import config, logger
+    config.get_option("logger.level")  # parse the config first so it does not reset the level
+    logger.set_log_level("error")
+    profiles = None
+    if args.profiles:
+        with open(args.profiles, encoding="utf-8") as f:
+            profiles = json.load(f)
+    backend = install(FakeCortexBackend(mode=args.mode, time_scale=args.time_scale, profiles=profiles, seed=args.seed))
+
+    run_config = {'rounds': args.rounds, 'concurrency': args.concurrency, 'time_scale': args.time_scale,
+                  'mode': args.mode}
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = run_benchmark(name, backend, args.rounds, args.concurrency, args.warmup)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    report = {'config': run_config, 'results': results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # --only updates those benchmarks and keeps the rest of a compatible baseline
+        if baseline.get('config') == run_config:
+            report['results'] = {**baseline.get('results', {}), **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    missing = [name for name in results if name not in baseline.get('results', {})]
+    if baseline and missing:
+        print(f"\nNo baseline for {', '.join(missing)} (not compared)")
+    if baseline and baseline.get('config') != run_config:
+        print(f"\nBaseline was recorded with {baseline.get('config')}; comparing anyway")
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nNo regressions" if baseline else "\nNo baseline to compare against (use --save-baseline)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Local stand-in for the SerpAPI and Google Maps endpoints Lab2 calls
+
+Serves canned JSON for /search, the Places text search and Directions with a
+fixed delay, optionally failing every n-th request with 503 to exercise
+retries. Point the lab at it with SERPAPI_BASE_URL / GOOGLE_MAPS_BASE_URL:
+
+    server = StubApiServer(delay_s=0.05).start()
+    os.environ["GOOGLE_MAPS_BASE_URL"] = server.url
+"""
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+STUB_NEWS = [
+    ("Apple announces iPhone 17 lineup", "The new lineup brings a thinner design and a faster chip."),
+    ("iOS 19 update rolls out", "The update improves battery life and adds new camera features."),
+    ("iPhone 17 Pro camera review", "Early reviews praise low light photos and the zoom lens."),
+    ("Apple supply chain report", "Analysts expect strong demand for the Pro models this fall."),
+    ("iPhone repair program expanded", "Apple extends repairs for overheating batteries in older models.")
+]
+
+STUB_STORES = [
+    ("Apple Boylston Street", "815 Boylston St, Boston, MA 02116"),
+    ("Apple CambridgeSide", "100 CambridgeSide Pl, Cambridge, MA 02141"),
+    ("Apple Chestnut Hill", "199 Boylston St, Chestnut Hill, MA 02467"),
+    ("Apple Derby Street", "92 Derby St, Hingham, MA 02043"),
+    ("Apple Northshore", "210 Andover St, Peabody, MA 01960"),
+    ("Apple South Shore", "250 Granite St, Braintree, MA 02184"),
+    ("Apple Burlington", "75 Middlesex Turnpike, Burlington, MA 01803"),
+    ("Apple Natick", "1245 Worcester St, Natick, MA 01760")
+]
+
+def transit_minutes(origin: str, destination: str) -> int:
+    """Deterministic 10-70 minute trip per origin/destination pair"""
+    return 10 + zlib.crc32(f"{origin}|{destination}".encode("utf-8")) % 61
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if stub.record(url.path):
+            self._send(503, {'error': "stub failure"})
+            return
+        time.sleep(stub.delay_s)
+
+        if url.path == "/search":
+            results = [{'title': title, 'snippet': snippet} for title, snippet in STUB_NEWS]
+            self._send(200, {'organic_results': results})
+        elif url.path == "/maps/api/place/textsearch/json":
+            results = [
+                {'name': name, 'formatted_address': address, 'place_id': f"stub-{i}", 'rating': 4.0 + (i % 10) / 10}
+                for i, (name, address) in enumerate(STUB_STORES[:stub.stores])
+            ]
+            self._send(200, {'status': "OK", 'results': results})
+        elif url.path == "/maps/api/directions/json":
+            origin, destination = params.get('origin', ""), params.get('destination', "")
+            minutes = transit_minutes(origin, destination)
+            leg = {
+                'duration': {'text': f"{minutes} mins", 'value': minutes * 60},
+                'distance': {'text': f"{minutes / 4:.1f} mi", 'value': minutes * 400},
+                'start_address': origin,
+                'end_address': destination,
+                'steps': [{'travel_mode': "WALKING"}, {'travel_mode': "TRANSIT"}, {'travel_mode': "WALKING"}]
+            }
+            self._send(200, {'status': "OK", 'routes': [{'legs': [leg]}]})
+        else:
+            self._send(404, {'error': "unknown path"})
+
+class StubApiServer:
+    """
+    Threaded HTTP server on 127.0.0.1 (the port is bound on construction)
+
+    Args:
+        delay_s: Sleep before every successful response
+        stores: Number of Apple Stores returned by the Places search
+        fail_every: Answer every n-th request with 503 (0 disables)
+    """
+
+    def __init__(self, delay_s: float = 0.05, stores: int = 5, fail_every: int = 0, port: int = 0):
+        self.delay_s = delay_s
+        self.stores = stores
+        self.fail_every = fail_every
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._count = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def record(self, path: str) -> bool:
+        """Count a request; True when it should fail"""
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self._count += 1
+            return bool(self.fail_every) and self._count % self.fail_every == 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()